@@ -14,6 +14,7 @@ import os
 import subprocess
 
 from app.config.config import Config
+from app.config.startup import model_warmup
 
 config_bp = Blueprint('config', __name__)
 
@@ -34,7 +35,9 @@ def get_config():
         "PORT_FORCE_ALIGNMENT": current_app.config.get("PORT_FORCE_ALIGNMENT"),
         "SHIFTS": current_app.config.get("SHIFTS"),
         "GENERATION": current_app.config.get("GENERATION"),
-        "INFERENCE": current_app.config.get("INFERENCE")
+        "INFERENCE": current_app.config.get("INFERENCE"),
+        "WARMUP": current_app.config.get("WARMUP"),
+        "INGESTION": current_app.config.get("INGESTION")
     }
 
     return jsonify(config_data)
@@ -100,3 +103,20 @@ def reset_config():
     Config.init_app(current_app, config_filename='config.json')
 
     return jsonify({"message": "Config guardada con éxito"}), 200
+
+
+@config_bp.route('/ready', methods=['GET'])
+def ready():
+    """
+    Indica que la aplicación está sirviendo peticiones y el estado de cada modelo de inferencia.
+    Con ?models=true responde 503 hasta que termina la precarga de los modelos (sección WARMUP).
+    """
+    models_ready = model_warmup.is_warm()
+    require_models = request.args.get('models', 'false').lower() == 'true'
+
+    return jsonify({
+        "ready": models_ready or not require_models,
+        "models_ready": models_ready,
+        "warmup": model_warmup.summary(),
+        "models": model_warmup.status()
+    }), 503 if require_models and not models_ready else 200
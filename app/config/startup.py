@@ -0,0 +1,152 @@
+"""
+startup.py
+
+Medición del coste del arranque y precarga opcional de modelos en segundo plano.
+
+Los modelos de inferencia se cargan de forma perezosa la primera vez que se usan, de forma que la
+aplicación puede servir los endpoints que no los necesitan (dashboards, login...) nada más arrancar.
+La sección WARMUP de la configuración indica qué modelos se precargan en un hilo en segundo plano.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+LAZY = 'lazy'
+# Estados de la precarga en conjunto
+DISABLED = 'disabled'
+RUNNING = 'running'
+FINISHED = 'finished'
+
+
+class StartupReport:
+    """
+    Tiempos de importación y carga de cada módulo o modelo durante el arranque.
+    """
+    def __init__(self):
+        self.timings = []  # (etapa, segundos)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.timings.append((name, seconds))
+
+    def report(self):
+        """
+        Escribe en el log el desglose de tiempos, de mayor a menor.
+        """
+        with self._lock:
+            timings = sorted(self.timings, key=lambda timing: timing[1], reverse=True)
+        total = sum(seconds for _, seconds in timings)
+        logging.info("Arranque: %.2f s", total)
+        for name, seconds in timings:
+            logging.info("  %-45s %7.2f s", name, seconds)
+        return timings
+
+
+class ModelWarmup:
+    """
+    Estado de los modelos que se pueden precargar. Cada módulo registra sus modelos con
+    `register`, y `start` lanza un hilo que carga los indicados en la configuración.
+    """
+    def __init__(self, report=None):
+        self.report = report
+        self.loaders = {}  # nombre -> (función de carga, función que indica si ya está cargado)
+        self.states = {}   # nombre -> estado de los modelos de la precarga
+        self.manifest = []
+        self.state = DISABLED
+        self.seconds = None   # duración total de la precarga, al terminar
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, loader, is_loaded=None):
+        self.loaders[name] = (loader, is_loaded)
+
+    def start(self, config):
+        """
+        Lanza la precarga según la configuración: {"enabled": bool, "models": [nombres]}.
+        """
+        if not config.get("enabled", False) or self._thread is not None:
+            return
+
+        self.manifest = [name for name in config.get("models", []) if name in self.loaders]
+        for name in set(config.get("models", [])) - set(self.loaders):
+            logging.warning("Modelo de precarga desconocido: %s", name)
+
+        with self._lock:
+            for name in self.manifest:
+                self.states[name] = {"state": PENDING}
+            self.state = RUNNING
+
+        self._thread = threading.Thread(target=self._run, name='model-warmup', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        warmup_start = time.perf_counter()
+        for name in self.manifest:
+            loader, _ = self.loaders[name]
+            with self._lock:
+                self.states[name] = {"state": LOADING}
+            start = time.perf_counter()
+            try:
+                loader()
+                seconds = time.perf_counter() - start
+                with self._lock:
+                    self.states[name] = {"state": READY, "load_seconds": round(seconds, 3)}
+                if self.report:
+                    self.report.add(f"warmup {name}", seconds)
+                logging.info("Modelo %s precargado en %.2f s", name, seconds)
+            except Exception as e:
+                logging.error("Error precargando el modelo %s: %s", name, e)
+                with self._lock:
+                    self.states[name] = {"state": FAILED, "error": str(e)}
+
+        with self._lock:
+            self.state = FINISHED
+            self.seconds = round(time.perf_counter() - warmup_start, 3)
+        # El informe del arranque se escribe antes de que termine la precarga: se repite con sus tiempos
+        if self.report:
+            logging.info("Precarga terminada en %.2f s", self.seconds)
+            self.report.report()
+
+    def status(self):
+        """
+        Estado de cada modelo registrado. Los que no están en la precarga aparecen como
+        'lazy' hasta que una petición los carga.
+        """
+        with self._lock:
+            states = {name: dict(state) for name, state in self.states.items()}
+
+        for name, (_, is_loaded) in self.loaders.items():
+            if name not in states:
+                states[name] = {"state": READY if is_loaded and is_loaded() else LAZY}
+
+        return states
+
+    def summary(self):
+        """Estado de la precarga en conjunto: disabled, running o finished, y su duración al terminar."""
+        with self._lock:
+            return {"state": self.state, "seconds": self.seconds, "models": list(self.manifest)}
+
+    def is_warm(self):
+        """Todos los modelos de la precarga están cargados."""
+        with self._lock:
+            return all(self.states.get(name, {}).get("state") == READY for name in self.manifest)
+
+
+# Instancias compartidas por toda la aplicación
+startup_report = StartupReport()
+model_warmup = ModelWarmup(report=startup_report)
@@ -0,0 +1,23 @@
+import logging
+from app.config.startup import FINISHED, DISABLED, READY, FAILED, ModelWarmup, StartupReport
+
+
+def test_warmup_times_reach_the_report(caplog):
+    report = StartupReport()
+    report.add("app.module_inference.audio_controller", 0.5)
+    warmup = ModelWarmup(report=report)
+    warmup.register("categorical", lambda: None)
+    warmup.register("dimensional", lambda: 1 / 0)
+    assert warmup.summary()["state"] == DISABLED
+
+    with caplog.at_level(logging.INFO):
+        warmup.start({"enabled": True, "models": ["categorical", "dimensional"]})
+        warmup._thread.join()
+
+    summary = warmup.summary()
+    assert summary["state"] == FINISHED and summary["seconds"] is not None
+    assert warmup.status()["categorical"]["state"] == READY
+    assert warmup.status()["dimensional"]["state"] == FAILED
+    assert [name for name, _ in report.timings] == ["app.module_inference.audio_controller", "warmup categorical"]
+    # El informe se vuelve a escribir al terminar, ya con la precarga
+    assert any("warmup categorical" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,109 @@
+"""
+alignment_model_cache.py
+
+Caché de los modelos de alineación de WhisperX por idioma con un presupuesto de memoria.
+Los modelos se cargan la primera vez que se pide su idioma y, cuando la memoria ocupada supera el
+presupuesto, se expulsan los usados hace más tiempo (LRU). Los idiomas fijados (por defecto 'es')
+no se expulsan nunca, de forma que unos pocos audios detectados en otro idioma no desplazan al
+modelo que se usa en casi todas las peticiones.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Presupuesto por defecto: 2 GB
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def model_bytes(model):
+    """
+    Memoria ocupada por los parámetros y buffers de un modelo de PyTorch.
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class AlignmentModelCache:
+    """
+    Caché LRU de modelos (modelo, metadatos) por idioma, segura para usar desde varios hilos.
+    """
+    def __init__(self, loader, max_bytes=DEFAULT_MAX_BYTES, pinned=("es",)):
+        self.loader = loader  # idioma -> (modelo, metadatos)
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models = OrderedDict()  # idioma -> (modelo, metadatos, tamaño)
+        self._lock = threading.Lock()
+        self._loading = {}  # idioma -> lock de carga, evita cargar dos veces el mismo modelo
+
+    def get(self, lang):
+        """
+        Devuelve (modelo, metadatos) del idioma, cargándolo si no está en memoria.
+        """
+        with self._lock:
+            if lang in self._models:
+                self._models.move_to_end(lang)
+                self.hits += 1
+                return self._models[lang][:2]
+            load_lock = self._loading.setdefault(lang, threading.Lock())
+
+        # La carga se hace fuera del lock global para no bloquear los otros idiomas
+        with load_lock:
+            with self._lock:
+                if lang in self._models:
+                    self._models.move_to_end(lang)
+                    self.hits += 1
+                    return self._models[lang][:2]
+                self.misses += 1
+
+            print(f"Cargando modelo de alineación del idioma: {lang}")
+            model, metadata = self.loader(lang)
+
+            with self._lock:
+                self._models[lang] = (model, metadata, model_bytes(model))
+                self._evict(keep=lang)
+                self._loading.pop(lang, None)
+
+        return model, metadata
+
+    def _evict(self, keep=None):
+        """Expulsa los modelos no fijados menos usados hasta respetar el presupuesto (nunca el recién cargado)."""
+        candidates = [lang for lang in self._models if lang not in self.pinned and lang != keep]
+        while candidates and self.resident_bytes() > self.max_bytes:
+            lang = candidates.pop(0)
+            del self._models[lang]
+            self.evictions += 1
+            print(f"Modelo de alineación expulsado de memoria: {lang}")
+
+    def __contains__(self, lang):
+        with self._lock:
+            return lang in self._models
+
+    def resident_bytes(self):
+        return sum(size for _, _, size in self._models.values())
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def pin(self, lang):
+        with self._lock:
+            self.pinned.add(lang)
+
+    def stats(self):
+        """
+        Devuelve los contadores de la caché.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "languages": list(self._models),
+                "pinned": sorted(self.pinned),
+                "resident_bytes": self.resident_bytes(),
+                "max_bytes": self.max_bytes,
+            }
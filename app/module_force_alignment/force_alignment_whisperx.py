@@ -2,54 +2,138 @@
 alignment_processor.py
 
 Este módulo utiliza Whisper y WhisperX para transcribir y alinear segmentos de audio palabra por palabra.
-Carga modelos dinámicamente según el idioma detectado y devuelve alineaciones temporales para cada palabra.
+Carga modelos dinámicamente según el idioma (forzado o detectado) y devuelve alineaciones temporales para cada palabra.
 
 """
 
 
+import io
+import os
+import threading
+import time
 from flask import jsonify
-import whisper
-import whisperx 
+import librosa
+from alignment_model_cache import AlignmentModelCache
 
 # Configura tu dispositivo (usa "cuda" si tienes GPU)
 device = "cpu"
 
-# Precarga del modelo ASR (base para más rapidez)
+# Frecuencia con la que trabajan Whisper y WhisperX
+SAMPLE_RATE = 16000
+LANGUAGE = "es"
+# Idioma con el que se transcribe; si es None, Whisper lo detecta en cada audio
+forced_language = LANGUAGE
+
+# Modelo ASR (base para más rapidez). Se carga en la primera petición, no al importar el módulo
 ASR_MODEL_NAME = "base"
-print("Cargando modelo ASR: {ASR_MODEL_NAME}")
-asr_model = whisper.load_model(ASR_MODEL_NAME)
+asr_model = None
+asr_model_lock = threading.Lock()
+# Whisper instala hooks en el modelo al transcribir: una sola transcripción a la vez por proceso
+asr_inference_lock = threading.Lock()
+
+
+def load_alignment_model(lang):
+    """
+    Carga el modelo de alineación de WhisperX de un idioma. whisperx se importa aquí, en el primer uso.
+    """
+    import whisperx
+    return whisperx.load_align_model(language_code=lang, device=device)
+
+
+# Modelos de alineación por idioma, con presupuesto de memoria y el español fijado
+alignment_models_cache = AlignmentModelCache(load_alignment_model, pinned=(LANGUAGE,))
+
+
+def get_asr_model():
+    """
+    Devuelve el modelo ASR, cargándolo la primera vez que se pide.
+    """
+    global asr_model
+    with asr_model_lock:
+        if asr_model is None:
+            import whisper
+            print(f"Cargando modelo ASR: {ASR_MODEL_NAME}")
+            start = time.perf_counter()
+            asr_model = whisper.load_model(ASR_MODEL_NAME)
+            print(f"Modelo ASR cargado en {time.perf_counter() - start:.1f} s")
+    return asr_model
+
+
+def get_alignment_model(lang):
+    """
+    Devuelve el modelo de alineación y sus metadatos para un idioma, cargándolo la primera vez.
+    """
+    return alignment_models_cache.get(lang)
+
+
+def configure(language=LANGUAGE, max_bytes=None, pinned=None):
+    """
+    Ajusta el idioma y la caché de modelos de alineación.
+
+    Args:
+        language: Idioma forzado de la transcripción; None para que Whisper lo detecte en cada audio.
+        max_bytes: Presupuesto de memoria de los modelos de alineación.
+        pinned: Idiomas cuyos modelos no se expulsan nunca.
+    """
+    global forced_language
+    forced_language = language
+    for lang in pinned or []:
+        alignment_models_cache.pin(lang)
+    if max_bytes is not None:
+        alignment_models_cache.set_max_bytes(max_bytes)
 
-# Diccionario para almacenar modelos de alineación por idioma
-alignment_models_cache = {}
+
+def load_models(threads=None, settings=None):
+    """
+    Carga los modelos de un proceso worker una sola vez, al arrancarlo.
+
+    Args:
+        threads: Hilos de PyTorch del proceso, para que varios workers no compitan por los mismos núcleos.
+        settings: Argumentos de `configure` para el proceso.
+    """
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    if settings:
+        configure(**settings)
+    get_asr_model()
+    for lang in alignment_models_cache.pinned:
+        get_alignment_model(lang)
 
 
-def compute_alignment(audio_path):
+def decode_audio(data):
+    """
+    Decodifica en memoria los bytes de un .wav a la señal mono float32 a 16 kHz que usan Whisper y WhisperX.
+    """
+    signal, _ = librosa.load(io.BytesIO(data), sr=SAMPLE_RATE, mono=True)
+    return signal
+
+
+def compute_alignment(audio):
     """
     Realiza transcripción y alineación palabra a palabra del audio especificado.
 
     Utiliza Whisper para transcripción automática del habla (ASR) y WhisperX para alinear cada palabra con su tiempo de inicio y fin.
+    El audio se decodifica una sola vez y la misma señal se usa en la transcripción y en el alineamiento.
 
     Args:
-        Ruta al archivo de audio.
+        Ruta al archivo de audio o señal mono float32 a 16 kHz.
 
     Returns:
         Alineamientos. Cada uno con la palabra y su tiempo de inicio y de fin.
 
     """
-    print(f"Procesando {audio_path}...")
-
-    audio = whisperx.load_audio(audio_path)
-    result = asr_model.transcribe(audio_path, language="es")
+    import whisperx
+    if isinstance(audio, (str, os.PathLike)):
+        print(f"Procesando {audio}...")
+        audio = whisperx.load_audio(audio)
+
+    model = get_asr_model()
+    with asr_inference_lock:
+        result = model.transcribe(audio, language=forced_language)
     print("Transcripción:", result)
 
-    lang = result["language"]
-    if lang not in alignment_models_cache:
-        print(f"Cragando modelo junto al idioma: {lang}")
-        model_a, metadata = whisperx.load_align_model(language_code=lang, device=device)
-        alignment_models_cache[lang] = (model_a, metadata)
-    else:
-        model_a, metadata = alignment_models_cache[lang]
-
+    model_a, metadata = get_alignment_model(forced_language or result["language"])
     result_aligned = whisperx.align(result["segments"], model_a, metadata, audio, device=device)
 
     alignments = []
@@ -62,4 +146,19 @@ def compute_alignment(audio_path):
             })
 
     print(alignments)
-    return alignments
\ No newline at end of file
+    return alignments
+
+
+def align_wav_bytes(data):
+    """
+    Alineamiento de un .wav recibido en memoria, sin escribirlo a disco.
+    Es la tarea que ejecutan los procesos worker del servicio.
+    """
+    return compute_alignment(decode_audio(data))
+
+
+def alignment_cache_stats():
+    """
+    Contadores de la caché de modelos de alineación del proceso.
+    """
+    return dict(alignment_models_cache.stats(), pid=os.getpid(), forced_language=forced_language)
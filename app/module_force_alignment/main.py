@@ -2,66 +2,127 @@
 main.py
 
 Servidor Flask que agrupa los endpoints relacionados con el forced alignment
+
+Los audios se decodifican en memoria, sin pasar por disco. Con --workers N las peticiones se reparten
+entre N procesos que cargan los modelos una sola vez al arrancar; sin workers se procesan en el propio
+servidor. En ambos casos el número de peticiones en curso está acotado y las que exceden el límite
+reciben un 503.
+
+Ejemplo:
+    python main.py --workers 4 --max-pending 16
 """
+import argparse
+import multiprocessing
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from force_alignment_whisperx import compute_alignment
-import whisper
-import whisperx  
+from force_alignment_whisperx import align_wav_bytes, alignment_cache_stats, configure, load_models
 
 app = Flask(__name__)
-CORS(app) 
+CORS(app)
+
+# Peticiones que se aceptan a la vez (en proceso o esperando a un worker)
+MAX_PENDING = 8
+pending_requests = threading.BoundedSemaphore(MAX_PENDING)
+
+# Pool de procesos con los modelos cargados; None para procesar en el propio servidor
+executor = None
+workers_count = 0
+# Una sola ronda de tareas con barrera a la vez: dos rondas mezcladas se bloquearían entre sí
+every_worker_lock = threading.Lock()
+# Segundos que se espera a que todos los workers tomen su tarea: al arrancar (cargan los modelos antes)
+# y en las consultas de estado
+WORKERS_START_TIMEOUT = 600
+WORKERS_QUERY_TIMEOUT = 10
 
 
-class AudioConvert:
+def _wait_and_run(barrier, function, timeout):
     """
-    Clase encargada de guardar archivos de audio .wav en una carpeta específica.
+    Tarea de un worker: espera a que todos los workers tengan la suya y ejecuta la función.
+    Si la barrera se rompe (un worker ocupado o caído no llega a tiempo) la función se ejecuta igualmente.
+
+    Returns:
+        (pid, resultado), para descartar los resultados repetidos de un mismo worker.
     """
-    def __init__(self, output_folder):
-        self.output_folder = output_folder  # Carpeta donde se guardarán los archivos .wav
-        os.makedirs(self.output_folder, exist_ok=True)
-
-        
-    def save_wav_audio(self, wav_data, wav_filename):
-        """
-        Guarda un archivo de audio como .wav en disco.
-        """
-        try:
-            # Ruta de salida para el archivo wav
-            wav_path = os.path.join(self.output_folder, wav_filename)
+    try:
+        barrier.wait(timeout)
+    except Exception:
+        # BrokenBarrierError o, si la ronda ya ha terminado, el gestor de la barrera ya no existe
+        pass
+    return os.getpid(), function()
+
 
-            # Guardar el archivo WAV directamente en el disco
-            with open(wav_path, 'wb') as file:
-                file.write(wav_data)
+def run_on_every_worker(function, timeout=WORKERS_QUERY_TIMEOUT):
+    """
+    Ejecuta `function` una vez en cada worker del pool. Cada worker se queda esperando en la barrera
+    hasta que todos tienen su tarea, así que ninguno puede tomar dos. Si en `timeout` segundos no han
+    llegado todos, se devuelven los resultados de los que sí.
 
-            print(f"Archivo guardado como WAV: {wav_path}")
-            return wav_path
+    Returns:
+        Lista con el resultado de cada worker que ha respondido.
+    """
+    with every_worker_lock, multiprocessing.Manager() as manager:
+        barrier = manager.Barrier(workers_count)
+        futures = [executor.submit(_wait_and_run, barrier, function, timeout) for _ in range(workers_count)]
+        # Margen para que los workers que esperaban en la barrera rota terminen su tarea
+        done, not_done = wait(futures, timeout=timeout + 5)
+        for future in not_done:
+            future.cancel()
+
+    results = {}
+    for future in done:
+        try:
+            pid, result = future.result()
         except Exception as e:
-            print(f"Error al guardar el archivo WAV: {e}")
-            return None
+            print(f"Un worker no ha respondido: {e!r}")
+            continue
+        results.setdefault(pid, result)
+    if len(results) < workers_count:
+        print(f"Solo han respondido {len(results)} de {workers_count} workers")
+    return list(results.values())
+
 
+def start_workers(workers, max_pending=MAX_PENDING, settings=None):
+    """
+    Arranca los procesos worker y fija el tamaño de la cola de peticiones.
+    Cada worker carga Whisper y el modelo de alineación una vez y usa su parte de los núcleos.
 
-def convert_audio_to_wav(audio):
+    Args:
+        settings: Argumentos de `configure` (idioma y caché de modelos de alineación) para cada proceso.
     """
-    Valida y guarda un archivo de audio recibido como archivo .wav.
+    global executor, workers_count, pending_requests
+    pending_requests = threading.BoundedSemaphore(max_pending)
+    configure(**(settings or {}))
+
+    if workers > 0:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_models, initargs=(threads, settings))
+        workers_count = workers
+        # Una tarea por worker: todos los procesos arrancan y cargan los modelos antes de aceptar peticiones
+        pids = run_on_every_worker(os.getpid, timeout=WORKERS_START_TIMEOUT)
+        print(f"Workers listos: {pids}")
+    return executor
+
+
+def read_wav(audio):
+    """
+    Valida y lee en memoria un archivo de audio recibido como archivo .wav.
     """
     if not audio.filename.lower().endswith('.wav'):
         raise ValueError("Debe ser tipo .wav")
+    return audio.read()
 
-    # Ruta de la carpeta donde se guardarán los archivos 
-    save_folder = os.path.join(os.getcwd(), 'resources/audios')
-    audio_converter = AudioConvert(save_folder)
-
-    # Leer y guardar el archivo .wav
-    wav_data = audio.read()
-    wav_audioname = audio.filename
-    wav_path = audio_converter.save_wav_audio(wav_data, wav_audioname)
 
-    if not wav_path:
-        raise RuntimeError(f"Error converting the audio {audio.filename}")
+def aggregate_cache_stats(workers_stats):
+    """
+    Suma los contadores de la caché de varios procesos, conservando los de cada uno.
+    """
+    totals = {key: sum(stats[key] for stats in workers_stats)
+              for key in ("hits", "misses", "evictions", "resident_bytes")}
+    return dict(totals, workers=workers_stats)
 
-    return wav_path
 
 @app.route("/getForcedAlignment", methods=['POST'])
 def get_forced_alignment():
@@ -78,13 +139,49 @@ def get_forced_alignment():
     if not audio:
         return jsonify({"error": "No audio file received"}), 400
 
+    if not pending_requests.acquire(blocking=False):
+        return jsonify({"error": "Server busy, try again later"}), 503, {"Retry-After": "1"}
+
     try:
-        wav_path = convert_audio_to_wav(audio)
-        alignments = compute_alignment(wav_path)
-        # os.remove(wav_path)  # Limpieza del archivo temporal
+        wav_data = read_wav(audio)
+        if executor is not None:
+            alignments = executor.submit(align_wav_bytes, wav_data).result()
+        else:
+            alignments = align_wav_bytes(wav_data)
         return jsonify(alignments)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        pending_requests.release()
+
+
+@app.route("/getAlignmentModelCache", methods=['GET'])
+def get_alignment_model_cache():
+    """
+    Endpoint con el estado de la caché de modelos de alineación (idiomas residentes, memoria y expulsiones).
+    Con workers, se consulta cada proceso: los totales suman todos y `workers` tiene el detalle de cada uno.
+    Los workers que no responden a tiempo (ocupados o caídos) se cuentan en `missing_workers`.
+    """
+    if executor is not None:
+        workers_stats = run_on_every_worker(alignment_cache_stats)
+        return jsonify(dict(aggregate_cache_stats(workers_stats), missing_workers=workers_count - len(workers_stats)))
+    return jsonify(aggregate_cache_stats([alignment_cache_stats()]))
+
 
 if __name__ == "__main__":
-    app.run(port=5001, debug=True)
+    parser = argparse.ArgumentParser(description="Forced alignment service.")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes with their own models (0 = in-process)")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="Requests accepted at once before answering 503")
+    parser.add_argument("--language", default="es", help="Forced transcription language ('auto' to detect it on each audio)")
+    parser.add_argument("--alignment-cache-mb", type=int, default=2048, help="Memory budget of the alignment models")
+    parser.add_argument("--pin", nargs="*", default=["es"], help="Languages whose alignment model is never evicted")
+    args = parser.parse_args()
+
+    settings = {
+        "language": None if args.language == "auto" else args.language,
+        "max_bytes": args.alignment_cache_mb * 1024 ** 2,
+        "pinned": args.pin,
+    }
+    start_workers(args.workers, args.max_pending, settings)
+    app.run(port=args.port, threaded=True)
@@ -0,0 +1,84 @@
+import threading
+import torch
+from alignment_model_cache import AlignmentModelCache, model_bytes
+
+# Linear(16, 16): 16 * 16 + 16 parámetros float32
+MODEL_BYTES = (16 * 16 + 16) * 4
+
+
+def loader(lang):
+    return torch.nn.Linear(16, 16), {"language": lang}
+
+
+def test_model_loaded_once():
+    calls = []
+    cache = AlignmentModelCache(lambda lang: calls.append(lang) or loader(lang))
+
+    model, metadata = cache.get("es")
+    assert cache.get("es")[0] is model and metadata == {"language": "es"}
+
+    assert calls == ["es"]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["resident_bytes"] == model_bytes(model) == MODEL_BYTES
+
+
+def test_lru_eviction_within_budget():
+    cache = AlignmentModelCache(loader, max_bytes=2 * MODEL_BYTES, pinned=())
+    cache.get("en")
+    cache.get("fr")
+    cache.get("en")  # "en" pasa a ser el más reciente
+    cache.get("de")
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["languages"] == ["en", "de"]
+    assert stats["resident_bytes"] == 2 * MODEL_BYTES
+
+
+def test_pinned_language_is_never_evicted():
+    cache = AlignmentModelCache(loader, max_bytes=2 * MODEL_BYTES, pinned=("es",))
+    cache.get("es")
+    for lang in ("en", "fr", "de"):
+        cache.get(lang)
+
+    assert "es" in cache and "de" in cache
+    assert cache.stats()["evictions"] == 2
+
+
+def test_new_model_is_kept_over_budget():
+    # Aunque el modelo recién cargado no quepa, se devuelve y se queda hasta la siguiente carga
+    cache = AlignmentModelCache(loader, max_bytes=MODEL_BYTES // 2, pinned=("es",))
+    cache.get("es")
+    cache.get("en")
+
+    assert cache.stats()["languages"] == ["es", "en"]
+    cache.get("fr")
+    assert cache.stats()["languages"] == ["es", "fr"]
+
+
+def test_smaller_budget_and_pin():
+    cache = AlignmentModelCache(loader, pinned=())
+    for lang in ("es", "en", "fr"):
+        cache.get(lang)
+
+    cache.pin("fr")
+    cache.set_max_bytes(MODEL_BYTES)
+
+    stats = cache.stats()
+    assert stats["languages"] == ["fr"] and stats["pinned"] == ["fr"]
+    assert stats["evictions"] == 2 and stats["max_bytes"] == MODEL_BYTES
+
+
+def test_concurrent_get_loads_once():
+    calls = []
+    cache = AlignmentModelCache(lambda lang: calls.append(lang) or loader(lang))
+
+    threads = [threading.Thread(target=cache.get, args=("es",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["es"]
+    assert cache.stats()["hits"] == 7
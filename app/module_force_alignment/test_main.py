@@ -0,0 +1,105 @@
+import io
+import os
+import threading
+import time
+import numpy as np
+import pytest
+import soundfile as sf
+from app.module_force_alignment import main
+from force_alignment_whisperx import SAMPLE_RATE, decode_audio
+
+
+def wav_bytes(seconds, sample_rate=8000, channels=1):
+    buffer = io.BytesIO()
+    signal = np.zeros((int(seconds * sample_rate), channels), dtype=np.float32)
+    sf.write(buffer, signal, sample_rate, format="WAV")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "executor", None)
+    monkeypatch.setattr(main, "pending_requests", threading.BoundedSemaphore(1))
+    return main.app.test_client()
+
+
+def test_decode_audio_in_memory():
+    signal = decode_audio(wav_bytes(2, sample_rate=8000, channels=2))
+    assert signal.dtype == np.float32 and signal.ndim == 1
+    assert len(signal) == 2 * SAMPLE_RATE
+
+
+def test_alignment_receives_upload_bytes(client, monkeypatch):
+    received = []
+    monkeypatch.setattr(main, "align_wav_bytes", lambda data: received.append(data) or [{"word": "hola"}])
+    data = wav_bytes(1)
+
+    response = client.post("/getForcedAlignment", data={"audioFile": (io.BytesIO(data), "audio.wav")})
+
+    assert response.status_code == 200 and response.get_json() == [{"word": "hola"}]
+    # El audio llega en memoria, tal cual se subió
+    assert received == [data]
+
+
+def test_busy_server_answers_503(client, monkeypatch):
+    monkeypatch.setattr(main, "align_wav_bytes", lambda data: [])
+    main.pending_requests.acquire()
+    try:
+        response = client.post("/getForcedAlignment", data={"audioFile": (io.BytesIO(wav_bytes(1)), "audio.wav")})
+    finally:
+        main.pending_requests.release()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Al quedar libre vuelve a aceptar peticiones
+    response = client.post("/getForcedAlignment", data={"audioFile": (io.BytesIO(wav_bytes(1)), "audio.wav")})
+    assert response.status_code == 200
+
+
+def test_every_worker_loads_models(tmp_path, monkeypatch):
+    loaded = tmp_path / "loaded.txt"
+
+    def fake_load_models(threads=None, settings=None):
+        with open(loaded, "a") as f:
+            f.write(f"{os.getpid()}\n")
+
+    # Los procesos se crean con fork y heredan el parche
+    monkeypatch.setattr(main, "load_models", fake_load_models)
+    monkeypatch.setattr(main, "pending_requests", main.pending_requests)
+    monkeypatch.setattr(main, "workers_count", 0)
+    executor = main.start_workers(2, settings={"language": "es"})
+    try:
+        pids = main.run_on_every_worker(os.getpid)
+        assert len(set(pids)) == 2
+        # Cada worker ha cargado los modelos al arrancar, antes de la primera petición
+        assert set(loaded.read_text().split()) == {str(pid) for pid in pids}
+        # La caché se consulta en todos los workers, no solo en el que atiende la petición
+        stats = main.app.test_client().get("/getAlignmentModelCache").get_json()
+        assert {worker["pid"] for worker in stats["workers"]} == set(pids)
+        assert stats["missing_workers"] == 0
+
+        # Con un worker ocupado, la ronda no se bloquea: responde el otro
+        busy = executor.submit(time.sleep, 4)
+        time.sleep(0.2)
+        start = time.perf_counter()
+        answered = main.run_on_every_worker(os.getpid, timeout=1)
+        assert time.perf_counter() - start < 4
+        assert len(answered) == 1 and answered[0] in pids
+        busy.result()
+    finally:
+        executor.shutdown()
+        monkeypatch.setattr(main, "executor", None)
+
+
+def test_cache_stats_in_process(client):
+    stats = client.get("/getAlignmentModelCache").get_json()
+    assert len(stats["workers"]) == 1
+    assert stats["workers"][0]["pid"] == os.getpid()
+    assert stats["hits"] == stats["workers"][0]["hits"]
+
+
+def test_aggregate_cache_stats_sums_workers():
+    workers = [{"hits": 3, "misses": 1, "evictions": 0, "resident_bytes": 10, "pid": 1},
+               {"hits": 2, "misses": 2, "evictions": 1, "resident_bytes": 20, "pid": 2}]
+    stats = main.aggregate_cache_stats(workers)
+    assert stats == {"hits": 5, "misses": 3, "evictions": 1, "resident_bytes": 30, "workers": workers}
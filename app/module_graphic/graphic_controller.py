@@ -11,6 +11,7 @@ Blueprints:
 from flask import Blueprint, jsonify, request
 from app.module_graphic.graphic_processor import GraphicProcessor, ShiftModel, TimeModel, date_range
 from app.persistance.persistance import RecordDataCSV
+from app.persistance.record_ingest import OUTPUT_FOLDER, OutputCSVFollower
 import os
 
 graphic_bp = Blueprint('graphic', __name__)
@@ -18,17 +19,43 @@ graphic_bp = Blueprint('graphic', __name__)
 # data = RecordDataCSV()
 # data_processor = GraphicProcessor(data)
 
+DEFAULT_CSV = 'resources/estocastic_data.csv'
+
 data = None
 data_processor = None
 
+# Datos por defecto, que reciben los resultados de inferencia nuevos, y el hilo que los sigue
+default_data = None
+ingestion_settings = {}
+record_follower = None
+
+@graphic_bp.record_once
+def configure_ingestion(state):
+    """
+    Guarda la configuración de la ingesta de resultados de inferencia (INGESTION.enabled,
+    INGESTION.output_folder, INGESTION.interval_seconds, INGESTION.compact_records, INGESTION.state_file),
+    que se arranca al cargar los datos por defecto.
+    """
+    ingestion_settings.update(state.app.config.get("INGESTION", {}))
+
 def load_default_data():
     """
-    Carga de datos iniciales resources/estocastic_data.csv.
+    Carga de datos iniciales resources/estocastic_data.csv. Si la ingesta está activada, los resultados
+    que la inferencia escribe en sus csv de salida se añaden a estos datos en cuanto aparecen.
     """
-    global data, data_processor
-    data = RecordDataCSV(file_path='resources/estocastic_data.csv')
+    global data, data_processor, default_data, record_follower
+    default_data = RecordDataCSV(file_path=DEFAULT_CSV, compact_records=ingestion_settings.get("compact_records", 5000))
+    data = default_data
     data_processor = GraphicProcessor(data)
 
+    if ingestion_settings.get("enabled", False) and record_follower is None:
+        record_follower = OutputCSVFollower(
+            ingestion_settings.get("output_folder", OUTPUT_FOLDER),
+            lambda records: default_data.append_records(records),
+            state_path=ingestion_settings.get("state_file", "data/cache/ingestion_offsets.json"),
+            interval=ingestion_settings.get("interval_seconds", 2))
+        record_follower.start()
+
 # Enpoint para recuperar los ids de los usuarios para analizar
 @graphic_bp.route('/ids', methods=['GET'])
 def get_ids():
@@ -142,7 +169,11 @@ def set_csv():
         return jsonify({"error": "Archivo no encontrado"}), 404
 
     try:
-        data = RecordDataCSV(file_path=path)
+        # Los datos por defecto se mantienen en memoria con los registros añadidos desde el arranque
+        if default_data is not None and os.path.abspath(path) == os.path.abspath(DEFAULT_CSV):
+            data = default_data
+        else:
+            data = RecordDataCSV(file_path=path)
         data_processor = GraphicProcessor(data)
         return jsonify({"message": f"Fuente de datos cambiada a {new_file}"}), 200
     except Exception as e:
@@ -7,6 +7,16 @@ Módulo encargado de procesar, filtrar y estructurar los datos emocionales para
 from datetime import datetime
 from datetime import datetime, timedelta
 from flask import current_app
+
+
+def as_list(records):
+    """
+    Lista de diccionarios a partir de las vistas perezosas de la fuente de datos (RecordList, RecordChain),
+    que jsonify no sabe serializar.
+    """
+    return records.to_list() if hasattr(records, 'to_list') else list(records)
+
+
 class GraphicProcessor:
     """
     Clase encargada de filtrar los datos para su representación
@@ -14,15 +24,23 @@ class GraphicProcessor:
     def __init__(self, data_source):
         # data_source es una instancia de RecordDataCSV u otra fuente de datos similar
         self.data_source = data_source
-        self.records = self.data_source.data # Lee los datos iniciales
-        self.index = self.data_source.index  # Accede al índice de user_id
+
+    @property
+    def records(self):
+        # Se lee en cada acceso: la fuente de datos los sustituye al consolidar los registros añadidos
+        return self.data_source.data
+
+    @property
+    def index(self):
+        # Índice de user_id
+        return self.data_source.index
 
     def get_all_records(self):
         """
         Devuelve todos las grabaciones del dataset.
         """
         # Devuelve todos las filas, las grabaciones
-        return self.records
+        return as_list(self.records)
     
     def get_ids(self):
         """
@@ -35,7 +53,7 @@ class GraphicProcessor:
         """
         Devuelve los datos para un user_id, las grabaciones.
         """
-        return self.index.get(user_id, [])
+        return as_list(self.index.get(user_id, []))
     
     # Grabaciones filtradas por id y espacios temporales definidos en TimeModel
     def filtered_by_id_time(self,user_id, start_date,finish_date):
@@ -43,6 +43,16 @@ def test_find_records_by_id(graphic_processor):
     assert len(records) == 2 
     assert records[0]["timestamp"] == "2024-01-06"
 
+def test_records_are_plain_lists(graphic_processor):
+    class LazyRecords(list):
+        def to_list(self):
+            return list(self)
+
+    graphic_processor.data_source.data = LazyRecords(graphic_processor.data_source.data)
+    assert type(graphic_processor.get_all_records()) is list
+    assert type(graphic_processor.find_records_by_id(1)) is list
+    assert graphic_processor.find_records_by_id(3) == []
+
 def test_filtered_by_id_time(graphic_processor):
     start_date = datetime(2024, 1, 1)
     end_date = datetime(2024, 1, 8)
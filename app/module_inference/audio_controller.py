@@ -4,6 +4,9 @@ audio_controller.py
 Módulo Flask que gestiona endpoints relacionados con el procesamiento de audio:
 - Transcripción y alineación de palabras usando Whisper.
 - Detección de emociones a partir del archivo de audio.
+- Detección de emociones para lotes de audios, con resultados en streaming (NDJSON).
+- Evolución de las emociones a lo largo de una grabación larga (ventanas deslizantes).
+- Trabajos asíncronos: envío de un audio y consulta posterior de su resultado (con long-polling opcional).
 - Consulta de modelos de inferencia y configuración actual.
 
 Blueprint:
@@ -11,16 +14,83 @@ Blueprint:
 
 """
 
+import json
 import os
-from app.module_inference.audio_processer import convert_audio_to_wav, get_emotions_audio, get_all_model_files
-from flask import Blueprint, current_app, jsonify, request
+from app.module_inference.audio_processer import analyze_audio, convert_audio_to_wav, convert_batch_to_wav, get_emotion_timeline, get_emotions_audio_batch, get_all_model_files, get_model_and_features, save_job_audio
+from app.module_inference.job_processor import JobProcessor
+from app.persistance.job_persistance import new_job_id
+from app.config.startup import model_warmup
+from models.model_registry import model_registry
+from models.models import DIMENSIONAL_MODEL_PATH, get_dimensional_model, get_model_type
+from models.speech_models import speech_models
+from models.chunked_forward import chunked_forward
+from models.quantization import quantization
+from models.onnx_backend import onnx_backend
+from app.persistance.transcription_persistance import transcription_cache
+from features_extraction.feature_cache import feature_cache
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 
 from app.model.audio_convert import AudioConvert
-from force_alignment_processor import  compute_alignments, process, transcribe_audio
 # from force_alignment_processor import compute_alignment_new
 
 audio_bp = Blueprint('audios', __name__)
 
+MODEL_NAME = 'model_ours_MIXED.pkl'
+MODEL_FOLDER = 'data/models/'
+# Tiempo máximo que una consulta de un trabajo puede quedarse esperando su resultado
+MAX_JOB_WAIT = 60
+
+# Ajustes del pipeline leídos de la configuración al registrar el blueprint
+pipeline_settings = {"greedy_transcript_max_seconds": 0}
+
+job_processor = JobProcessor(lambda wav_path: analyze_audio(MODEL_FOLDER, MODEL_NAME, wav_path,
+                                                            pipeline_settings["greedy_transcript_max_seconds"]))
+
+# Modelos que se pueden precargar al arrancar (sección WARMUP de la configuración)
+model_warmup.register("whisper", speech_models.get_whisper, lambda: speech_models.is_loaded("whisper"))
+model_warmup.register("alignment", speech_models.get_alignment, lambda: speech_models.is_loaded("alignment"))
+model_warmup.register("emotion", lambda: get_model_and_features(MODEL_FOLDER, MODEL_NAME),
+                      lambda: (MODEL_FOLDER + MODEL_NAME, get_model_type(MODEL_FOLDER, MODEL_NAME)) in model_registry)
+model_warmup.register("dimensional", get_dimensional_model,
+                      lambda: (DIMENSIONAL_MODEL_PATH, 'dimensional') in model_registry)
+
+@audio_bp.record_once
+def configure_model_registry(state):
+    """
+    Ajusta el presupuesto de memoria del registro de modelos, el tamaño de la caché de características,
+    la duración máxima de los audios transcritos sin Whisper y las ventanas de los modelos wav2vec2
+    según la configuración (INFERENCE.model_cache_mb, INFERENCE.feature_cache_mb,
+    INFERENCE.greedy_transcript_max_seconds, INFERENCE.chunk_seconds, INFERENCE.chunk_overlap_seconds,
+    INFERENCE.chunk_batch_size, INFERENCE.transcription_cache_entries), el modo cuantizado (INFERENCE.quantize)
+    y el backend ONNX Runtime de los modelos wav2vec2 (INFERENCE.onnx_backend, INFERENCE.onnx_cache_folder,
+    INFERENCE.onnx_intra_op_threads, INFERENCE.onnx_inter_op_threads).
+    """
+    pipeline_settings["greedy_transcript_max_seconds"] = state.app.config.get("INFERENCE", {}).get("greedy_transcript_max_seconds", 0)
+    cache_mb = state.app.config.get("INFERENCE", {}).get("model_cache_mb", 2048)
+    model_registry.set_max_bytes(cache_mb * 1024 * 1024)
+    feature_cache.max_bytes = state.app.config.get("INFERENCE", {}).get("feature_cache_mb", 1024) * 1024 * 1024
+    # Ventanas en las que se dividen los audios largos en los modelos wav2vec2
+    chunked_forward.chunk_seconds = state.app.config.get("INFERENCE", {}).get("chunk_seconds", 20)
+    chunked_forward.overlap_seconds = state.app.config.get("INFERENCE", {}).get("chunk_overlap_seconds", 1)
+    chunked_forward.batch_size = state.app.config.get("INFERENCE", {}).get("chunk_batch_size", 4)
+    transcription_cache.max_entries = state.app.config.get("INFERENCE", {}).get("transcription_cache_entries", 10000)
+    # Modelos wav2vec2 y ONNX en int8 (solo CPU); se aplica a los modelos que se carguen a partir de ahora
+    quantization.enabled = state.app.config.get("INFERENCE", {}).get("quantize", False)
+    # Modelos wav2vec2 de Hugging Face exportados a ONNX y servidos con ONNX Runtime
+    onnx_backend.enabled = state.app.config.get("INFERENCE", {}).get("onnx_backend", False)
+    onnx_backend.cache_folder = state.app.config.get("INFERENCE", {}).get("onnx_cache_folder", "data/models/onnx")
+    onnx_backend.intra_op_threads = state.app.config.get("INFERENCE", {}).get("onnx_intra_op_threads", 0)
+    onnx_backend.inter_op_threads = state.app.config.get("INFERENCE", {}).get("onnx_inter_op_threads", 0)
+
+
+@audio_bp.record_once
+def configure_job_processor(state):
+    """
+    Arranca los workers de los trabajos asíncronos (INFERENCE.job_workers) y relanza los que
+    quedaron sin terminar en el último reinicio.
+    """
+    job_processor.start(workers=state.app.config.get("INFERENCE", {}).get("job_workers", 2))
+
 # Enpoint para recibir un audio, almacenarlo y procesar sus emociones y registrarlas
 @audio_bp.route('/audio/getData', methods=['POST'])
 def get_data_audio():
@@ -28,7 +98,8 @@ def get_data_audio():
     Endpoint que procesa un archivo .wav y produce un análisis emocional.
 
     Args
-        Audio formato .wav.
+        Audio formato .wav. Opcionalmente, 'worker_id' y 'timestamp' (epoch) de la grabación; si no se
+        envían se toman del nombre del audio (<timestamp>_<trabajador>.wav) o de la hora de la subida.
 
     Returns
         Objetivo JSON con:
@@ -36,41 +107,142 @@ def get_data_audio():
         - Forced alignment.
     """
     audio = request.files.get('audioFile')  
+    worker_id = request.form.get('worker_id', type=int)
+    timestamp = request.form.get('timestamp', type=int)
 
     if not audio:
         return jsonify({'message': 'No se encontró el audio'}), 400
     
     try:
         wav_path = convert_audio_to_wav(audio)
-        # Transcribir el audio usando Whisper
-        transcript = transcribe_audio(wav_path)
+        # alignments = compute_alignment_new(wav_path)
+        result = analyze_audio(MODEL_FOLDER, MODEL_NAME, wav_path, pipeline_settings["greedy_transcript_max_seconds"],
+                               worker_id, timestamp)
 
-        normalized_text = process(transcript)
+        # Retornar la respuesta con los datos procesados
+        return jsonify({
+            'message': f'Audio {audio.filename} processed successfully',
+            **result
+        }), 200
 
-         # Calcular alineaciones 
-        alignments = compute_alignments(wav_path, normalized_text)
-        # alignments = compute_alignment_new(wav_path)
+    except Exception as e:
+        print(f"Error processing the audio {audio.filename}: {e}")
+        return jsonify({'message': f'Error processing the audio {audio.filename}'}), 500
+    
 
-        # Procesar el audio y obtener emociones
-        model_name = 'model_ours_MIXED.pkl'
-        model_folder = 'data/models/'
+# Endpoint para procesar emocionalmente un lote de audios
+@audio_bp.route('/audio/getDataBatch', methods=['POST'])
+def get_data_audio_batch():
+    """
+    Endpoint que procesa un lote de archivos .wav (varios 'audioFiles' y/o un .zip en 'archive')
+    y devuelve su análisis emocional en streaming, una línea JSON por audio (NDJSON).
 
-        emotions = get_emotions_audio(model_folder,model_name,wav_path)
+    Returns
+        Una línea por audio con el nombre del fichero y sus emociones (o el error producido).
+    """
+    audios = request.files.getlist('audioFiles')
+    archive = request.files.get('archive')
+
+    if not audios and not archive:
+        return jsonify({'message': 'No se encontró el audio'}), 400
+
+    try:
+        decoded_audios = convert_batch_to_wav(audios, archive)
+    except Exception as e:
+        print(f"Error reading the batch of audios: {e}")
+        return jsonify({'message': 'Error reading the batch of audios'}), 400
+
+    def generate():
+        for result in get_emotions_audio_batch(MODEL_FOLDER, MODEL_NAME, decoded_audios):
+            yield json.dumps(result, default=float) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+# Endpoint para obtener la evolución emocional de una grabación larga
+@audio_bp.route('/audio/getTimeline', methods=['POST'])
+def get_timeline():
+    """
+    Procesa un archivo .wav por ventanas deslizantes ('window' y 'hop' en segundos, por defecto 3 y 1.5).
+
+    Returns
+        Objeto JSON con la emoción categórica y dimensional de cada ventana.
+    """
+    audio = request.files.get('audioFile')
+    window = request.form.get('window', 3.0, type=float)
+    hop = request.form.get('hop', 1.5, type=float)
+
+    if not audio:
+        return jsonify({'message': 'No se encontró el audio'}), 400
+    if hop <= 0 or window < hop:
+        return jsonify({'message': 'La ventana debe ser mayor o igual que el salto, y el salto mayor que 0'}), 400
+    # Los modelos preentrenados clasifican el audio completo: es un error de la petición, no del servidor
+    if get_model_type(MODEL_FOLDER, MODEL_NAME) == 'pretrained':
+        return jsonify({'message': 'El modelo no admite análisis por ventanas'}), 400
+
+    try:
+        wav_path = convert_audio_to_wav(audio)
+        timeline = get_emotion_timeline(MODEL_FOLDER, MODEL_NAME, wav_path, window=window, hop=hop)
 
-        # Retornar la respuesta con los datos procesados
         return jsonify({
             'message': f'Audio {audio.filename} processed successfully',
-            'transcription': transcript,
-            'normalized': normalized_text,
-            'alignments': alignments,
-            # 'number': number_text,
-            'emotions': emotions
+            'window': window,
+            'hop': hop,
+            'timeline': timeline
         }), 200
 
     except Exception as e:
         print(f"Error processing the audio {audio.filename}: {e}")
         return jsonify({'message': f'Error processing the audio {audio.filename}'}), 500
-    
+
+
+# Endpoint para encolar el procesamiento de un audio sin esperar al resultado
+@audio_bp.route('/audio/jobs', methods=['POST'])
+def submit_job():
+    """
+    Guarda el audio .wav y crea un trabajo que lo procesa en segundo plano.
+
+    Returns
+        202 con el id del trabajo y su estado.
+    """
+    audio = request.files.get('audioFile')
+
+    if not audio:
+        return jsonify({'message': 'No se encontró el audio'}), 400
+
+    try:
+        # El audio se guarda bajo el id del trabajo antes de encolarlo
+        job_id = new_job_id()
+        wav_path = save_job_audio(audio, job_id)
+        job_processor.submit(audio.filename, wav_path, job_id)
+    except Exception as e:
+        print(f"Error creating the job for {audio.filename}: {e}")
+        return jsonify({'message': f'Error processing the audio {audio.filename}'}), 500
+
+    return jsonify({'job_id': job_id, 'status': 'pending'}), 202
+
+
+# Endpoint para consultar el estado y el resultado de un trabajo
+@audio_bp.route('/audio/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Devuelve el estado del trabajo y, si ha terminado, su resultado o su error.
+    Con ?wait=N la petición espera hasta N segundos (máximo MAX_JOB_WAIT) a que el trabajo termine.
+    """
+    wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_JOB_WAIT)
+    job = job_processor.get(job_id, wait=wait)
+
+    if job is None:
+        return jsonify({'message': 'No se encontró el trabajo'}), 404
+
+    return jsonify({
+        'job_id': job['id'],
+        'filename': job['filename'],
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error']
+    }), 200
+
 
 # Enpoint para recuperar los modelos disponibles de inferencia
 @audio_bp.route('/audio/getAvalaibleModels', methods=['GET'])
@@ -94,4 +266,17 @@ def get_inference_interval():
 
     return jsonify({"silence_interval": silence_interval}), 200
 
- 
\ No newline at end of file
+
+# Endpoint para consultar el estado del registro de modelos
+@audio_bp.route('/audio/getModelCache', methods=['GET'])
+def get_model_cache():
+    """
+    Devuelve los aciertos, fallos y modelos residentes del registro de modelos y de la caché de características,
+    el tiempo de carga y la memoria de los modelos de voz y la tasa de aciertos de la caché de transcripciones.
+    """
+    return jsonify({
+        "models": model_registry.stats(),
+        "features": feature_cache.stats(),
+        "speech": speech_models.stats(),
+        "transcriptions": transcription_cache.stats()
+    }), 200
@@ -5,42 +5,190 @@ Módulo para procesar archivos de audio (.wav) y realizar inferencia emocional u
 También incluye utilidades para guardar archivos de audio y listar modelos disponibles.
 """
 
+import io
 import os
-from app.module_inference.infere_emotion.predict_emotions_folderwavs import interfere_emotion
-from models.models import load_model
+import zipfile
+import pandas as pd
+from app.module_inference.infere_emotion.predict_emotions_folderwavs import (
+    build_emotion_result, get_dimensional, interfere_emotion, write_csv_header)
+from app.module_inference.infere_emotion.emotion_timeline import compute_timeline, timeline_to_json
+from models.models import DIMENSIONAL_MODEL_PATH, get_model, get_w2v2_onnx_model
+from models.model_registry import model_registry
+from models.ensemble import evaluate_ensemble
 from features_extraction.extract_features_w2v2 import Feature_Extractor as fe_w2v2
 from features_extraction.extract_features_ours import Feature_Extractor as fe_ours
 from features_extraction.extract_features_pretrained import Feature_Extractor as fe_pre
+from features_extraction.feature_cache import feature_cache
+from utils.utils import write_csv
+from force_alignment_processor import transcribe_and_align
 
 from app.model.audio_convert import AudioConvert
+from utils.decoded_audio import DecodedAudio
 
 # volcado-output.csv almacena todos los datos obtenidos de procesar emocionalmente audios
 # devuelve para el audio sus datos emocionales
-def get_emotions_audio(model_folder,model_name,wav_path):
+def get_emotions_audio(model_folder,model_name,wav_path, worker_id=None, timestamp=None):
     """
-    Recibe la ruta de un audio y aplica el modelo de inteligencia emocional.
+    Recibe la ruta de un audio (o el audio ya decodificado) y aplica el modelo de inteligencia emocional.
+    El trabajador y el momento de la grabación se guardan en el csv de salida; si no se indican, se toman
+    del nombre del audio (<timestamp>_<trabajador>.wav) y, sin timestamp en el nombre, de la hora actual.
 
     Returns
         Análisis emocional en forma de lista.
     """
+    dataset_name, csvfile = get_output_csv(model_name)
+    model, model_type, feature_loader = get_model_and_features(model_folder, model_name)
+
+    return interfere_emotion(dataset_name,wav_path,feature_loader,model,
+            model_type,csvfile,worker_id=worker_id,timestamp=timestamp)
+
+
+def analyze_audio(model_folder, model_name, wav_path, greedy_max_seconds=0, worker_id=None, timestamp=None):
+    """
+    Pipeline completo para un audio guardado en local: transcripción, normalización,
+    forced alignment y análisis emocional. El audio se decodifica una sola vez para todas las etapas
+    y el modelo CTC se ejecuta una sola vez para el alineamiento (y la transcripción de audios cortos).
+
+    Args
+        greedy_max_seconds: Los audios de hasta esta duración se transcriben con el modelo CTC, sin Whisper.
+        worker_id, timestamp: Trabajador y momento de la grabación (ver get_emotions_audio).
+
+    Returns
+        Diccionario con la transcripción, el texto normalizado, las alineaciones y las emociones.
+    """
+    decoded_audio = DecodedAudio.from_file(wav_path)
+
+    transcript, normalized_text, alignments = transcribe_and_align(decoded_audio, greedy_max_seconds)
+    emotions = get_emotions_audio(model_folder, model_name, decoded_audio, worker_id, timestamp)
+
+    return {
+        'transcription': transcript,
+        'normalized': normalized_text,
+        'alignments': alignments,
+        'emotions': emotions
+    }
+
+
+def get_emotions_audio_batch(model_folder, model_name, audios, chunk_size=8):
+    """
+    Aplica el modelo emocional a un lote de audios ya decodificados.
+    Los audios se procesan en grupos de `chunk_size`: las características de cada grupo se apilan en una
+    matriz para que el scaler y cada modelo del ensemble se ejecuten una sola vez por grupo, y sus
+    resultados se devuelven en cuanto termina, sin esperar al resto del lote ni acumular sus características.
+
+    Returns
+        Generador con un diccionario por audio, en el mismo orden de entrada.
+    """
+    dataset_name, csvfile = get_output_csv(model_name)
+    model, model_type, feature_loader = get_model_and_features(model_folder, model_name)
+    write_csv_header(csvfile)
+
+    # Los modelos preentrenados reciben la señal completa, de longitud variable: no se pueden apilar
+    if model_type == 'pretrained':
+        for audio in audios:
+            try:
+                emotions = interfere_emotion(dataset_name, audio, feature_loader, model, model_type, csvfile)
+                yield {"file": os.path.basename(audio.path), "emotions": emotions}
+            except Exception as e:
+                yield {"file": os.path.basename(audio.path), "error": str(e)}
+        return
+
+    for start in range(0, len(audios), chunk_size):
+        yield from _emotions_chunk(audios[start:start + chunk_size], dataset_name, csvfile, model, model_type, feature_loader)
+
+
+def _emotions_chunk(audios, dataset_name, csvfile, model, model_type, feature_loader):
+    """
+    Resultados de un grupo de audios con una sola ejecución del ensemble.
+    """
+    valid_audios, features = [], []
+    for audio in audios:
+        try:
+            features.append(feature_loader.get_features(audio))
+            valid_audios.append(audio)
+        except Exception as e:
+            yield {"file": os.path.basename(audio.path), "error": str(e)}
+
+    if not valid_audios:
+        return
+
+    try:
+        probabilities, stds, _ = evaluate_ensemble(model, pd.concat(features, ignore_index=True))
+    except Exception as e:
+        # Sin resultados del grupo: se informa en cada audio y el streaming continúa con el siguiente grupo
+        for audio in valid_audios:
+            yield {"file": os.path.basename(audio.path), "error": str(e)}
+        return
+
+    for audio, por_accuracy, std in zip(valid_audios, probabilities, stds):
+        try:
+            dimensional_values = get_dimensional(audio)
+            data, emotions = build_emotion_result(dataset_name, audio.path, model_type, por_accuracy, std, dimensional_values)
+            write_csv(data, csvfile, 'a')
+            yield {"file": os.path.basename(audio.path), "emotions": emotions}
+        except Exception as e:
+            yield {"file": os.path.basename(audio.path), "error": str(e)}
+
+
+def get_emotion_timeline(model_folder, model_name, wav_path, window=3.0, hop=1.5):
+    """
+    Análisis emocional por ventanas deslizantes de una grabación larga. El fichero se lee por bloques,
+    de forma que la memoria no depende de la duración de la grabación.
+
+    Returns
+        Lista con las emociones de cada ventana (inicio, fin, emoción, probabilidad y valores dimensionales).
+    """
+    dataset_name, _ = get_output_csv(model_name)
+    model, model_type, feature_loader = get_model_and_features(model_folder, model_name)
+
+    # Los modelos preentrenados clasifican el audio completo y no admiten ventanas
+    if model_type == 'pretrained':
+        raise ValueError("El modelo no admite análisis por ventanas")
+
+    timeline = compute_timeline(wav_path, model, feature_loader, window=window, hop=hop)
+    return timeline_to_json(timeline, dataset_name)
+
+
+def get_output_csv(model_name):
+    """
+    Devuelve el nombre del dataset del modelo y el csv donde se vuelcan los resultados.
+    """
     dataset_name = model_name.split("_")[-1].split('.')[0]
     csv_folder = './data/output-predict-emotions/'
     csvfile = os.path.join(csv_folder, 'volcado-output.csv')
 
     # Crear carpetas si no existen
     os.makedirs(csv_folder, exist_ok=True)
-    
-    model, model_type = load_model(model_folder, model_name)
+
+    return dataset_name, csvfile
+
+
+def get_w2v2_feature_loader():
+    """
+    Devuelve el extractor de características w2v2 compartido.
+    Si el modelo dimensional tiene cargado el mismo ONNX se reutiliza y la entrada no suma al presupuesto
+    del registro, ya que la carpeta w2v2_extractor se cuenta en la entrada del modelo dimensional.
+    """
+    onnx_model = get_w2v2_onnx_model()
+    if onnx_model is not None:
+        return model_registry.get((DIMENSIONAL_MODEL_PATH, 'w2v2_features'), lambda: fe_w2v2(onnx_model), size=0)
+    return model_registry.get((DIMENSIONAL_MODEL_PATH, 'w2v2_features'), fe_w2v2)
+
+
+def get_model_and_features(model_folder, model_name):
+    """
+    Devuelve el modelo, su tipo y el extractor de características que le corresponde.
+    """
+    # El modelo se carga una sola vez y se reutiliza entre peticiones
+    model, model_type = get_model(model_folder, model_name)
     if model_type == 'pretrained':
         feature_loader = fe_pre()
     elif model_type == 'w2v2':
-        feature_loader = fe_w2v2()
+        feature_loader = get_w2v2_feature_loader()
     else:
-        feature_loader = fe_ours(model['mfcc'][0], model['mfcc'][1])
-
+        feature_loader = fe_ours(model['mfcc'][0], model['mfcc'][1], cache=feature_cache)
 
-    return interfere_emotion(dataset_name,wav_path,feature_loader,model,
-            model_type,csvfile,worker_id=None)
+    return model, model_type, feature_loader
 
 
 def convert_audio_to_wav(audio):
@@ -65,6 +213,57 @@ def convert_audio_to_wav(audio):
     return wav_path
 
 
+def save_job_audio(audio, job_id):
+    """
+    Guarda el audio de un trabajo asíncrono en su propia carpeta (resources/audios/jobs/<job_id>/), de forma
+    que dos subidas con el mismo nombre no se sobrescriben mientras esperan en la cola. Se conserva el
+    nombre original, del que se obtienen el timestamp y el trabajador.
+    """
+    if not audio.filename.lower().endswith('.wav'):
+        raise ValueError("Debe ser tipo .wav")
+
+    save_folder = os.path.join(os.getcwd(), 'resources/audios/jobs', job_id)
+    audio_converter = AudioConvert(save_folder)
+    wav_path = audio_converter.save_wav_audio(audio.read(), os.path.basename(audio.filename))
+
+    if not wav_path:
+        raise RuntimeError(f"Error converting the audio {audio.filename}")
+
+    return wav_path
+
+
+def convert_batch_to_wav(audios, archive=None):
+    """
+    Guarda en local los audios de un lote (varios ficheros y/o un .zip) y los decodifica en memoria.
+
+    Returns
+        Lista de DecodedAudio.
+    """
+    save_folder = os.path.join(os.getcwd(), 'resources/audios')
+    audio_converter = AudioConvert(save_folder)
+
+    wav_files = [(audio.filename, audio.read()) for audio in audios if audio.filename.lower().endswith('.wav')]
+
+    if archive:
+        with zipfile.ZipFile(io.BytesIO(archive.read())) as zip_file:
+            for member in sorted(zip_file.namelist()):
+                if member.lower().endswith('.wav') and not member.endswith('/'):
+                    wav_files.append((os.path.basename(member), zip_file.read(member)))
+
+    if not wav_files:
+        raise ValueError("Debe contener audios tipo .wav")
+
+    decoded_audios = []
+    for wav_audioname, wav_data in wav_files:
+        wav_path = audio_converter.save_wav_audio(wav_data, wav_audioname)
+        if not wav_path:
+            raise RuntimeError(f"Error converting the audio {wav_audioname}")
+        # Se decodifica desde los bytes ya leídos, sin volver a leer el fichero
+        decoded_audios.append(DecodedAudio.from_bytes(wav_data, path=wav_path))
+
+    return decoded_audios
+
+
 def get_all_model_files():
     """
     Devuelve una lista de modelos de inferencia disponibles en formato .pkl.
@@ -1,10 +1,12 @@
 import os
 from infere_emotion.predict_emotions_folderwavs import test_folder
-from models.models import Pretrained_Model_Dimensional
+from models.models import get_dimensional_model
+from models.ensemble import evaluate_ensemble
 import numpy as np
 from time import sleep
 
 from utils.utils import decode_label
+from utils.decoded_audio import load_audio
 
 """
 emotion_processor.py
@@ -21,34 +23,22 @@ class EmotionProcessor:
         """
         Realiza inferencia emocional.
         """
-        predictions = []
+        probabilities, std, labels = evaluate_ensemble(self.model, features)
         if mode == "hard":
-            if isinstance(self.model, dict):
-                features = self.model['scaler'].transform(features)
-                for model in self.model['models']:
-                    predictions.append(model.predict(features))
-                predictions = np.array(predictions, dtype=object)
-                unique_elements, counts = np.unique(predictions, return_counts=True)
-                return unique_elements[np.argmax(counts)].item()
-            else:
-                return int(self.model.predict(features))
+            return labels[0].item()
         elif mode == "soft":
-            if isinstance(self.model, dict):
-                features = self.model['scaler'].transform(features)
-                for model in self.model['models']:
-                    predictions.append(model.predict_proba(features))
-                return np.mean(predictions, axis=0), np.std(predictions, axis=0)
-            else:
-                return self.model.predict_proba(features), [[0]]
+            return probabilities[0], std[0]
 
     def process_audio(self, audio_file):
         """
         Procesa un archivo de audio .wav para extraer emociones categóricas y dimensionales.
         """
-        features = self.feature_loader.get_features(audio_file)
-        por_accuracy, std = self.get_emotions(features, "soft")
-        label = self.get_emotions(features, "hard")
-        dimensional_values = Pretrained_Model_Dimensional().predict(audio_file)
+        audio = load_audio(audio_file)
+        features = self.feature_loader.get_features(audio)
+        # Una sola pasada del ensemble devuelve probabilidades, desviación y voto
+        probabilities, std, labels = evaluate_ensemble(self.model, features)
+        por_accuracy = probabilities[0]
+        dimensional_values = get_dimensional_model().predict(audio)
         return {
             "emocategoric": [{"emo": decode_label(i, self.dataset_name), "prob": por_accuracy[i]} for i in np.argsort(por_accuracy)[-3:][::-1]],
             "emodimensional": {
@@ -2,14 +2,21 @@
 import math
 import numpy as np, pandas as pd
 from features_extraction.features import cepstral_features, prosodic_features
+from features_extraction.feature_engine import Feature_Engine
+from utils.decoded_audio import load_audio
 
 # Main package for working with audio data
 import librosa, librosa.display
 
 class Feature_Extractor():
-    def __init__(self, n_mfcc, n_fft):
+    def __init__(self, n_mfcc, n_fft, fast = True, cache = None):
         self.n_mfcc = n_mfcc
         self.n_fft = n_fft
+        # fast: use the shared-spectrogram engine instead of the reference librosa implementation
+        self.fast = fast
+        self.engine = Feature_Engine()
+        # cache: optional Feature_Cache to skip the extraction of already seen audios
+        self.cache = cache
         
     # 1. Preprocessing
     def preprocess_audio_signal(self, audio_signal, **kwargs):
@@ -252,24 +259,52 @@ class Feature_Extractor():
         return Frame
 
     # 6. Load Data
-    def get_features(self, audio_file):
+    def get_audio_features(self):
         audio_features = cepstral_features | prosodic_features
         audio_features['mfcc']['n_mfcc'] =  self.n_mfcc
         audio_features['n_fft'] =  self.n_fft
+        return audio_features
+
+    def extract_signal(self, audio_signal_raw, sample_rate, audio_features = None):
+        """
+        Extract the features of a signal already in memory (a whole audio or a window of it).
+        Returns:
+            features vector.
+            header of each value.
+        """
+        audio_features = audio_features or self.get_audio_features()
         frame_size= audio_features ['frame_size']
         hop_length = audio_features ['frame_slice']
         framing = audio_features['framing']
-        
-            
-        # Load audio Signal
-        audio_signal_raw, sample_rate = librosa.load(audio_file, sr=None)
-        
+
         # Frame audio signal
         audio_signal_frm  = self.frameW_audio_signal(audio_signal_raw, sample_rate = sample_rate, frame_size=frame_size,  hop_length=hop_length, framing = framing)
         
+        if self.fast:
+            return self.engine.extract(audio_signal_frm, sample_rate, **audio_features)
+
         audio_feature = self.extract_feature_ours(audio_signal_frm, sample_rate, **audio_features)
+        return audio_feature.values[0], [column[0] for column in audio_feature.columns]
+
+    def get_features(self, audio_file):
+        audio_features = self.get_audio_features()
+            
+        # Load audio Signal (decoded once and shared with the rest of the pipeline)
+        audio = load_audio(audio_file)
+
+        if self.cache:
+            fingerprint = self.cache.fingerprint(audio_features, 'fast' if self.fast else 'librosa')
+            cached = self.cache.get(audio.content_hash, fingerprint)
+            if cached:
+                features, header = cached
+                return pd.DataFrame([features], columns = [np.array(header)])
+
+        features, header = self.extract_signal(audio.get_signal(), audio.sample_rate, audio_features)
+
+        if self.cache:
+            self.cache.put(audio.content_hash, fingerprint, features, header)
             
-        return audio_feature
+        return pd.DataFrame([features], columns = [np.array(header)])
         
     
-        
\ No newline at end of file
+        
@@ -1,9 +1,12 @@
-import librosa
+from utils.decoded_audio import load_audio
+
+# Frecuencia por defecto de librosa.load
+SAMPLE_RATE = 22050
 
 class Feature_Extractor:
         
     def get_features(self, audio_file):
         
-        features, _ = librosa.load(path=audio_file)
+        features = load_audio(audio_file).get_signal(SAMPLE_RATE)
         
         return features
\ No newline at end of file
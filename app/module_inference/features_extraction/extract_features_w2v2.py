@@ -1,10 +1,12 @@
 import audonnx
 import audinterface
+from utils.decoded_audio import load_audio
 
 class Feature_Extractor:
     
-    def __init__(self):
-        self.model = self.load_model()
+    def __init__(self, model=None):
+        # Permite compartir un ONNX ya cargado en lugar de cargarlo otra vez
+        self.model = model if model is not None else self.load_model()
     
     def load_model(self):
         model_root = './data/models/w2v2_extractor'
@@ -27,6 +29,6 @@ class Feature_Extractor:
             verbose=True,
         )
 
-        features = hidden_states.process_files([audio_file])
+        features = hidden_states.process_signal(load_audio(audio_file).get_signal(16000), 16000)
         
         return features
\ No newline at end of file
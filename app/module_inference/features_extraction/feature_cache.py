@@ -0,0 +1,125 @@
+# Import Libraries
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+CACHE_FOLDER = './data/cache/features'
+DEFAULT_MAX_BYTES = 1024 ** 3
+
+
+class Feature_Cache():
+    """
+    Content-addressed on-disk cache of extracted features.
+    Each entry is keyed by the hash of the audio content plus a fingerprint of the feature
+    configuration, and stored as a `.npy` shard that is memory-mapped when read.
+    The oldest entries (by last access) are evicted when the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_folder=CACHE_FOLDER, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def fingerprint(self, audio_features, engine):
+        """
+        Hash of the active feature configuration (cepstral/prosodic features, n_mfcc, n_fft) and of the
+        extraction engine ('fast' or 'librosa'), whose values differ slightly.
+        """
+        config = json.dumps({"features": audio_features, "engine": engine}, sort_keys=True, default=str)
+        return hashlib.sha1(config.encode('utf-8')).hexdigest()[:16]
+
+    def _path(self, audio_hash, fingerprint):
+        return os.path.join(self.cache_folder, fingerprint, audio_hash[:2], f'{audio_hash}.npy')
+
+    def _header_path(self, fingerprint):
+        return os.path.join(self.cache_folder, fingerprint, 'header.json')
+
+    def get(self, audio_hash, fingerprint):
+        """
+        Returns:
+            (features, header) or None if the features are not cached.
+        """
+        path = self._path(audio_hash, fingerprint)
+        try:
+            features = np.load(path, mmap_mode='r')
+            with open(self._header_path(fingerprint), 'r') as f:
+                header = json.load(f)
+            # Keep track of the last access for the eviction
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return features, header
+
+    def put(self, audio_hash, fingerprint, features, header):
+        path = self._path(audio_hash, fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        header_path = self._header_path(fingerprint)
+        if not os.path.exists(header_path):
+            with open(header_path, 'w') as f:
+                json.dump(list(header), f)
+
+        # Write to a temporary file first so a reader never sees half a shard
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(features, dtype=np.float32))
+
+        with self._lock:
+            # An overwritten shard replaces its old size instead of adding to it
+            size = self.size() - (os.path.getsize(path) if os.path.exists(path) else 0)
+            os.replace(tmp_path, path)
+            self._size = size + os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _shards(self):
+        shards = []
+        for root, _, files in os.walk(self.cache_folder):
+            for filename in files:
+                if filename.endswith('.npy'):
+                    path = os.path.join(root, filename)
+                    stat = os.stat(path)
+                    shards.append((stat.st_mtime, stat.st_size, path))
+        return shards
+
+    def size(self):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._shards())
+        return self._size
+
+    def _evict(self):
+        """Remove the least recently used shards until the cache is back to 90% of its budget."""
+        shards = sorted(self._shards())
+        self._size = sum(size for _, size, _ in shards)
+        for _, size, path in shards:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size_bytes": self.size(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Cache shared by the whole process
+feature_cache = Feature_Cache()
@@ -0,0 +1,183 @@
+# Import Libraries
+import math
+from functools import lru_cache
+
+import numpy as np
+import librosa
+
+# Default hop used by librosa when the features are computed from `y`
+# (mfcc, spectral_centroid, spectral_bandwidth, spectral_rolloff)
+LIBROSA_HOP_LENGTH = 512
+
+
+@lru_cache(maxsize=None)
+def get_window(n_fft):
+    return librosa.filters.get_window('hann', n_fft, fftbins=True)
+
+
+@lru_cache(maxsize=None)
+def get_mel_basis(sample_rate, n_fft):
+    return librosa.filters.mel(sr=sample_rate, n_fft=n_fft)
+
+
+# estimate_tuning works with a resolution of 0.01 bins: the cache key is rounded to it so the same
+# tuning with a different floating point error does not add another filterbank
+TUNING_DECIMALS = 2
+
+
+@lru_cache(maxsize=None)
+def _chroma_basis(sample_rate, n_fft, tuning):
+    return librosa.filters.chroma(sr=sample_rate, n_fft=n_fft, tuning=tuning)
+
+
+def get_chroma_basis(sample_rate, n_fft, tuning):
+    return _chroma_basis(sample_rate, n_fft, round(float(tuning), TUNING_DECIMALS))
+
+
+def time_mean(feature):
+    """Average over frames, keeping the same value order as `np.mean(feature.T, axis=0).flatten()`."""
+    return np.mean(feature, axis=-1).T.reshape(-1)
+
+
+class Feature_Engine():
+    """
+    Fast path of `Feature_Extractor.extract_feature_ours`.
+    The reference takes mfcc and the spectral centroid, bandwidth and rolloff from an STFT with
+    hop 512 and chroma and contrast from one with hop n_fft // 4. When n_fft // 4 divides 512
+    (n_fft <= 2048, which includes the default n_fft_ms) both come from a single STFT with hop
+    n_fft // 4: the hop-512 frames are every (512 // hop)-th frame of it. With a bigger n_fft two
+    STFTs are computed. Filterbanks and windows are cached per (sr, n_fft) and the features are
+    written into one preallocated float32 vector.
+    """
+
+    def spectrogram(self, audio_signal, n_fft, hop_length):
+        stft = librosa.stft(audio_signal, n_fft=n_fft, hop_length=hop_length, window=get_window(n_fft))
+        return np.abs(stft)
+
+    def layout(self, n_channels, **kwargs):
+        """
+        Name and size of each enabled feature block, in the same order as `extract_feature_ours`.
+        """
+        extract_all_cepstral = kwargs.get("extract_all_cepstral")
+        mfcc = kwargs.get("mfcc")
+        chroma_stft = kwargs.get("chroma_stft")
+        contrast = kwargs.get("contrast")
+        tonnetz = kwargs.get("tonnetz")
+
+        def enabled(name):
+            return kwargs.get(name)['extract'] or extract_all_cepstral
+
+        blocks = []
+        if enabled("mfcc"):
+            n_mfcc = mfcc['n_mfcc']
+            blocks.append(("mfcc", ["{}_{}".format(mfcc['header'], i) for i in range(1, n_mfcc+1)], n_mfcc * n_channels))
+            if mfcc['mfcc_delta']['extract'] or extract_all_cepstral:
+                blocks.append(("mfcc_delta", ["{}_{}".format(mfcc['mfcc_delta']['header'], i) for i in range(1, n_mfcc+1)], n_mfcc * n_channels))
+            if mfcc['mfcc_delta2']['extract'] or extract_all_cepstral:
+                blocks.append(("mfcc_delta2", ["{}_{}".format(mfcc['mfcc_delta2']['header'], i) for i in range(1, n_mfcc+1)], n_mfcc * n_channels))
+        if enabled("chroma_stft"):
+            if chroma_stft['chroma_12']:
+                blocks.append(("chroma_12", list(chroma_stft['header']), 12 * n_channels))
+            if chroma_stft['chroma_mean']['extract'] or extract_all_cepstral:
+                blocks.append(("chroma_mean", [chroma_stft['chroma_mean']['header']], 1))
+            if chroma_stft['chroma_std']['extract'] or extract_all_cepstral:
+                blocks.append(("chroma_std", [chroma_stft['chroma_std']['header']], 1))
+        if enabled("chroma_cens"):
+            blocks.append(("chroma_cens", list(kwargs.get("chroma_cens")['header']), 12 * n_channels))
+        if enabled("mel"):
+            blocks.append(("mel", [kwargs.get("mel")['header']], 1))
+        if enabled("contrast"):
+            n_bands = contrast['n_bands']
+            blocks.append(("contrast", ["{}_{}".format(contrast['header'], i) for i in range(0, n_bands+1)], (n_bands + 1) * n_channels))
+        if enabled("tonnetz"):
+            blocks.append(("tonnetz", ["{}_{}".format(tonnetz['header'], i) for i in range(0, 6)], 6 * n_channels))
+        for name in ("spec_cent", "spec_bw", "rolloff"):
+            if enabled(name):
+                blocks.append((name, [kwargs.get(name)['header']], n_channels))
+        if kwargs.get("zcr")['extract']:
+            blocks.append(("zcr", [kwargs.get("zcr")['header']], 1))
+        if enabled("rms"):
+            blocks.append(("rms", [kwargs.get("rms")['header']], 1))
+
+        return blocks
+
+    def extract(self, audio_signal, sample_rate, **kwargs):
+        """
+        Returns:
+            features vector (float32).
+            header of each value.
+        """
+        X = audio_signal
+        n_fft = pow(2, math.ceil(math.log2(kwargs.get("n_fft_ms")*sample_rate)))
+        n_channels = 1 if X.ndim == 1 else int(np.prod(X.shape[:-1]))
+        blocks = self.layout(n_channels, **kwargs)
+        names = {name for name, _, _ in blocks}
+
+        # Spectrograms shared by all features. librosa uses hop 512 when the features are
+        # computed from `y` and n_fft // 4 when they are computed from a precomputed stft.
+        # Both STFTs are centered with the same window, so if n_fft // 4 divides 512 the
+        # hop-512 frames are a subsample of the hop n_fft // 4 ones and one STFT is enough.
+        needs_magnitude = bool(names & {"mfcc", "spec_cent", "spec_bw", "rolloff"})
+        needs_power = bool(names & {"chroma_12", "chroma_mean", "chroma_std", "contrast"})
+        magnitude = power = None
+        short_hop = n_fft // 4
+        if needs_power:
+            short = self.spectrogram(X, n_fft, short_hop)
+            power = short**2
+            if needs_magnitude and LIBROSA_HOP_LENGTH % short_hop == 0:
+                magnitude = short[..., ::LIBROSA_HOP_LENGTH // short_hop]
+        if needs_magnitude and magnitude is None:
+            magnitude = self.spectrogram(X, n_fft, LIBROSA_HOP_LENGTH)
+
+        features = np.empty(sum(size for _, _, size in blocks), dtype=np.float32)
+        header = []
+        values = {}
+
+        if "mfcc" in names:
+            mel = np.einsum("...ft,mf->...mt", magnitude**2, get_mel_basis(sample_rate, n_fft), optimize=True)
+            n_mfcc = kwargs.get("mfcc")['n_mfcc']
+            mfccs = time_mean(librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=n_mfcc))
+            values["mfcc"] = mfccs
+            if "mfcc_delta" in names:
+                values["mfcc_delta"] = librosa.feature.delta(mfccs)
+            if "mfcc_delta2" in names:
+                values["mfcc_delta2"] = librosa.feature.delta(mfccs, order=2)
+
+        if names & {"chroma_12", "chroma_mean", "chroma_std"}:
+            tuning = librosa.estimate_tuning(S=power, sr=sample_rate, bins_per_octave=12)
+            chroma = np.einsum("cf,...ft->...ct", get_chroma_basis(sample_rate, n_fft, tuning), power, optimize=True)
+            chroma_stft_r = time_mean(librosa.util.normalize(chroma, norm=np.inf, axis=-2))
+            values["chroma_12"] = chroma_stft_r
+            values["chroma_mean"] = np.mean(chroma_stft_r)
+            values["chroma_std"] = np.std(chroma_stft_r)
+
+        # Disabled by default: they need their own transforms, so they are computed from `y`
+        if "chroma_cens" in names:
+            values["chroma_cens"] = time_mean(librosa.feature.chroma_cens(y=X, sr=sample_rate))
+        if "mel" in names:
+            values["mel"] = np.mean(librosa.feature.melspectrogram(y=X, sr=sample_rate, n_fft=n_fft, hop_length=25))
+        if "tonnetz" in names:
+            values["tonnetz"] = time_mean(librosa.feature.tonnetz(y=librosa.effects.harmonic(X), sr=sample_rate))
+
+        if "contrast" in names:
+            values["contrast"] = time_mean(librosa.feature.spectral_contrast(S=power, sr=sample_rate, n_bands=kwargs.get("contrast")['n_bands']))
+        if "spec_cent" in names:
+            values["spec_cent"] = time_mean(librosa.feature.spectral_centroid(S=magnitude, sr=sample_rate))
+        if "spec_bw" in names:
+            values["spec_bw"] = time_mean(librosa.feature.spectral_bandwidth(S=magnitude, sr=sample_rate))
+        if "rolloff" in names:
+            values["rolloff"] = time_mean(librosa.feature.spectral_rolloff(S=magnitude, sr=sample_rate))
+
+        # Time-domain features, cheaper than going through a spectrogram
+        if "zcr" in names:
+            values["zcr"] = np.mean(librosa.feature.zero_crossing_rate(X))
+        if "rms" in names:
+            values["rms"] = np.mean(librosa.feature.rms(y=X))
+
+        offset = 0
+        for name, block_header, size in blocks:
+            features[offset:offset + size] = values[name]
+            header.extend(block_header)
+            offset += size
+
+        return features, header
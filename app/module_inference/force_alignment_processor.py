@@ -1,20 +1,16 @@
 import os
 import subprocess
 from flask import jsonify
-import torch
-import whisper
 from unidecode import unidecode
 import re
 from num2words import num2words
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-import subprocess
-import torchaudio
 import torch
-from torchaudio.pipelines import Wav2Vec2FABundle
-import torchaudio.transforms as T
-from torchaudio.models import wav2vec2_model
-from torchaudio.pipelines import Wav2Vec2ASRBundle
 import numpy as np
+from utils.decoded_audio import DecodedAudio, load_audio
+from models.speech_models import speech_models
+from models.chunked_forward import chunked_forward
+from models.quantization import quantization
+from app.persistance.transcription_persistance import transcription_cache
 # import whisperx
 
 
@@ -30,20 +26,23 @@ import numpy as np
 # model = Wav2Vec2ForCTC.from_pretrained(model_name)
 # processor = Wav2Vec2Processor.from_pretrained(model_name)
 
-# Load model directly
-from transformers import AutoProcessor, AutoModelForCTC
-import wave
+# Whisper, transformers y torchaudio se importan al usarse (speech_models y compute_alignments),
+# para no retrasar el arranque de la aplicación
 
+WHISPER_SAMPLE_RATE = 16000
+LANGUAGE = "es"
 
-processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-large-xlsr-53-spanish")
-model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-large-xlsr-53-spanish")
+def transcribe_audio(audio):
+    # Modelo Whisper residente: se carga solo en la primera llamada
+    model = speech_models.get_whisper()
 
-def transcribe_audio(audio_path):
-    # Cargar el modelo Whisper
-    model = whisper.load_model("base")  # Puedes usar otros modelos como "small", "medium", "large"
-    
-    # Transcribir el audio
-    result = model.transcribe(audio_path, language="es")  # Especifica el idioma
+    # Whisper acepta directamente la señal a 16 kHz, sin volver a leer el fichero
+    if isinstance(audio, DecodedAudio):
+        audio = audio.get_signal(WHISPER_SAMPLE_RATE)
+
+    # Transcribir el audio (Whisper no admite transcripciones concurrentes sobre el mismo modelo)
+    with speech_models.lock("whisper"):
+        result = model.transcribe(audio, language=LANGUAGE)  # Especifica el idioma
     
     # Obtener la transcripción
     transcription = result["text"]
@@ -100,104 +99,154 @@ def process(text):
     return texto_normalizado
 
 
-def compute_alignments(audio_path, transcript):
-    # Cargar el audio
-    waveform, sample_rate = torchaudio.load(audio_path)
-    
-    # Resamplear si es necesario
-    if sample_rate != processor.feature_extractor.sampling_rate:
-        resampler = torchaudio.transforms.Resample(
-            orig_freq=sample_rate, new_freq=processor.feature_extractor.sampling_rate
-        )
-        waveform = resampler(waveform)
-    
-    # Preprocesar el audio
-    inputs = processor(
-        waveform.squeeze().numpy(),
-        return_tensors="pt",
-        sampling_rate=processor.feature_extractor.sampling_rate,
-        padding=True,
-    )
-    
-        # Comparar transcripción real con predicha para alineamientos (por palabras)
-    alignments = []
-    words_in_transcript = transcript.split()  # Dividir la transcripción real en palabras
-
-    if not words_in_transcript:
-        raise ValueError("La transcripción está vacía. No se puede procesar el audio.")
-    
-    print(f"Transcripción real: {words_in_transcript}")
-
-    # Verificar las longitudes
-    num_tokens = len(words_in_transcript)  # Número de palabras en la transcripción
-    num_frames = waveform.size(1)  # Número de frames en el audio
-    print(f"Tokens: {num_tokens}, Frames: {num_frames}")
-
-    # Obtener las posiciones de los tokens en el audio
-    token_positions = []
-    for i in range(num_tokens):
-        token_start_frame = int(i * (num_frames / num_tokens))
-        token_end_frame = int((i + 1) * (num_frames / num_tokens))
-
-        # Convertir frames a tiempo
-        start_time = token_start_frame / sample_rate
-        end_time = token_end_frame / sample_rate
-
-        token_positions.append(
-            (words_in_transcript[i], start_time, end_time)
-        )
-
-    # Alinear tokens con la transcripción real
-    for i, (token, start_time, end_time) in enumerate(token_positions):
-        if i < len(transcript.split()):
-            alignments.append((transcript.split()[i], start_time, end_time))
-        else:
-            print(f"Warning: Token {token} could not be aligned.")
+def compute_emissions(audio):
+    """
+    Una única pasada del modelo CTC sobre el audio.
 
-    return alignments
+    Returns:
+        Log-probabilidades por frame (frames x vocabulario) y duración en segundos de cada frame.
+    """
+    # Modelo preentrenado en español, residente tras la primera llamada
+    processor, model = speech_models.get_alignment()
 
-def compute_alignments(audio_path, normalized_text):
-    # Cargar el modelo preentrenado en español
-    model_name = "jonatasgrosman/wav2vec2-large-xlsr-53-spanish"
-    processor = Wav2Vec2Processor.from_pretrained(model_name)
-    model = Wav2Vec2ForCTC.from_pretrained(model_name).eval()
+    # Señal ya decodificada, remuestreada al sample rate del modelo (solo se remuestrea una vez)
+    target_sample_rate = processor.feature_extractor.sampling_rate
+    signal = load_audio(audio).get_signal(target_sample_rate)
+
+    # Los audios largos se procesan en ventanas solapadas para acotar la memoria de la atención
+    def forward(batch):
+        input_values = processor.feature_extractor(list(batch), sampling_rate=target_sample_rate, return_tensors="pt").input_values
+        return model(input_values).logits
+
+    logits = chunked_forward(signal, forward, target_sample_rate)
+    emissions = torch.log_softmax(logits, dim=-1)
+    seconds_per_frame = len(signal) / emissions.size(0) / target_sample_rate
+    return emissions, seconds_per_frame
+
+
+def greedy_transcript(emissions):
+    """
+    Transcripción a partir de las mismas emisiones: el token más probable de cada frame,
+    uniendo repeticiones y eliminando los blancos (decodificación CTC voraz).
+    """
+    processor, _ = speech_models.get_alignment()
+    return processor.tokenizer.decode(torch.argmax(emissions, dim=-1).tolist(), skip_special_tokens=True)
+
+
+def text_to_tokens(normalized_text, tokenizer):
+    """
+    Convierte el texto en los ids de sus caracteres, separando las palabras con el delimitador del modelo.
+    Los caracteres que no están en el vocabulario se ignoran.
+
+    Returns:
+        Palabras que se pueden alinear y lista de ids.
+    """
+    vocab = tokenizer.get_vocab()
+    delimiter = vocab[tokenizer.word_delimiter_token]
+
+    words, tokens = [], []
+    for word in normalized_text.split():
+        ids = [vocab[char] for char in word if char in vocab]
+        if not ids:
+            continue
+        if tokens:
+            tokens.append(delimiter)
+        tokens.extend(ids)
+        words.append(word)
+    return words, tokens
+
+
+def uniform_alignments(words, duration):
+    """
+    Reparte la duración del audio a partes iguales entre las palabras.
+    Solo se usa cuando el alineamiento forzado no es posible (más tokens que frames).
+    """
+    step = duration / len(words)
+    return [{"word": word, "start": round(i * step, 3), "end": round((i + 1) * step, 3)} for i, word in enumerate(words)]
+
+
+def compute_alignments(audio, normalized_text, emissions=None):
+    """
+    Alineamiento forzado (Viterbi) de cada palabra del texto sobre las emisiones del modelo CTC.
+
+    Args:
+        audio: Ruta o audio decodificado.
+        normalized_text: Texto normalizado a alinear.
+        emissions: Resultado de compute_emissions, si ya se ha calculado para este audio.
+
+    Returns:
+        Lista con la palabra, su inicio, su fin (en segundos) y la confianza media de sus caracteres.
+    """
+    processor, _ = speech_models.get_alignment()
+    tokenizer = processor.tokenizer
+    emissions, seconds_per_frame = emissions if emissions is not None else compute_emissions(audio)
+
+    words, tokens = text_to_tokens(normalized_text, tokenizer)
+    if not words:
+        raise ValueError("La transcripción está vacía. No se puede procesar el audio.")
 
-    # Cargar el audio
-    waveform, sample_rate = torchaudio.load(audio_path)
+    import torchaudio
+
+    try:
+        aligned, scores = torchaudio.functional.forced_align(
+            emissions.unsqueeze(0), torch.tensor([tokens], dtype=torch.int32), blank=tokenizer.pad_token_id)
+    except RuntimeError as e:
+        print(f"Warning: no se puede hacer el alineamiento forzado ({e}), se reparte el tiempo entre las palabras")
+        return uniform_alignments(words, emissions.size(0) * seconds_per_frame)
+
+    # Segmentos de cada carácter (sin blancos), agrupados en palabras por el delimitador
+    delimiter = tokenizer.get_vocab()[tokenizer.word_delimiter_token]
+    word_spans, current = [], []
+    for span in torchaudio.functional.merge_tokens(aligned[0], scores[0].exp(), blank=tokenizer.pad_token_id):
+        if span.token == delimiter:
+            if current:
+                word_spans.append(current)
+            current = []
+        else:
+            current.append(span)
+    if current:
+        word_spans.append(current)
 
-    # Reescalar el audio al sample rate del modelo (si es necesario)
-    target_sample_rate = processor.feature_extractor.sampling_rate
-    if sample_rate != target_sample_rate:
-        resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=target_sample_rate)
-        waveform = resampler(waveform)
-
-    # Preparar el audio para el modelo
-    input_values = processor.feature_extractor(waveform.squeeze(0).numpy(), sampling_rate=target_sample_rate, return_tensors="pt").input_values
-
-    # Procesar el texto normalizado y convertirlo en etiquetas (token IDs)
-    with processor.as_target_processor():
-        labels = processor.tokenizer(normalized_text, return_tensors="pt").input_ids.squeeze()
-
-    # Ejecutar el modelo para obtener predicciones
-    with torch.no_grad():
-        logits = model(input_values).logits
-
-    # Decodificar alineaciones forzadas (implementación personalizada para alineación)
-    alignments = []  
-    for i, token_id in enumerate(labels):
-        token = processor.tokenizer.decode([token_id])
-        start_time = i * (len(waveform.squeeze(0)) / len(labels)) / target_sample_rate
-        end_time = start_time + (len(waveform.squeeze(0)) / len(labels)) / target_sample_rate
+    alignments = []
+    for word, spans in zip(words, word_spans):
         alignments.append({
-            "word": token,
-            "start": start_time,
-            "end": end_time
+            "word": word,
+            "start": round(spans[0].start * seconds_per_frame, 3),
+            "end": round(spans[-1].end * seconds_per_frame, 3),
+            "score": round(sum(span.score for span in spans) / len(spans), 3)
         })
 
-    print(alignments)
     return alignments
 
 
+def transcribe_and_align(audio, greedy_max_seconds=0):
+    """
+    Transcripción, normalización y alineamiento de un audio con una sola pasada del modelo CTC.
+    Los audios de hasta `greedy_max_seconds` segundos se transcriben con las propias emisiones,
+    sin pasar por Whisper. La transcripción y su normalización se guardan en caché por contenido del
+    audio, modelo e idioma, así que un audio que ya se había subido no vuelve a transcribirse.
+
+    Returns:
+        Transcripción, texto normalizado y alineamientos.
+    """
+    audio = load_audio(audio)
+    emissions = compute_emissions(audio)
+
+    greedy = audio.duration <= greedy_max_seconds
+    asr_model = f"ctc-{speech_models.alignment_model}{quantization.suffix}" if greedy else f"whisper-{speech_models.whisper_model}"
+
+    cached = transcription_cache.get(audio.content_hash, asr_model, LANGUAGE)
+    if cached:
+        transcript, normalized_text = cached
+    else:
+        transcript = greedy_transcript(emissions[0]) if greedy else transcribe_audio(audio)
+        normalized_text = process(transcript)
+        transcription_cache.put(audio.content_hash, asr_model, LANGUAGE, transcript, normalized_text)
+
+    alignments = compute_alignments(audio, normalized_text, emissions)
+    return transcript, normalized_text, alignments
+
+
 # import whisperx 
 
 # def compute_alignment_new(audio_path):
@@ -0,0 +1,58 @@
+"""
+Backfill CLI: reprocess a whole folder of audios with a model, using a pool of processes.
+
+Example (from the root of the project, with the inference package installed):
+    python -m app.module_inference.infere_emotion.backfill data/output-audios-used --model model_ours_MEACorpus.pkl --workers 32
+"""
+
+import argparse
+import csv
+import os
+import time
+
+from app.module_inference.infere_emotion.predict_emotions_folderwavs import process_audio_files_parallel
+
+
+#   Names of the audios that already have a row in the output .csv
+def processed_files(csvfile):
+    if not os.path.exists(csvfile):
+        return set()
+    with open(csvfile, encoding='UTF8', newline='') as f:
+        return {row['file_name'] for row in csv.DictReader(f)}
+
+
+#   Audios of the list without a row in the output .csv, so running the backfill twice does not duplicate rows
+def pending_audio_files(audio_files, csvfile):
+    processed = processed_files(csvfile)
+    return [audio_file for audio_file in audio_files if os.path.basename(audio_file) not in processed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess a folder of .wav files with an emotion model.")
+    parser.add_argument("audio_folder", help="Folder with the .wav files to process")
+    parser.add_argument("--model", required=True, help="Model file, e.g. model_ours_MIXED.pkl")
+    parser.add_argument("--model-folder", default="data/models/", help="Folder of the models")
+    parser.add_argument("--csv-folder", default="data/output-predict-emotions", help="Folder of the output .csv and .json")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of processes")
+    parser.add_argument("--test", action="store_true", help="Files are named <emotion>_<n>.wav instead of <timestamp>_<worker>.wav")
+    args = parser.parse_args()
+
+    os.makedirs(args.csv_folder, exist_ok=True)
+    csvfile = f'{args.csv_folder}/{args.model.removesuffix(".pkl")}-output.csv'
+    audio_files = [os.path.join(args.audio_folder, audio_file) for audio_file in os.listdir(args.audio_folder)
+                   if audio_file.lower().endswith('.wav')]
+    pending = pending_audio_files(audio_files, csvfile)
+    if len(pending) < len(audio_files):
+        print(f"Skipping {len(audio_files) - len(pending)} audios already in {csvfile}")
+
+    start = time.perf_counter()
+    processed, errors = process_audio_files_parallel(pending, args.model_folder, args.model, csvfile, args.workers, test = args.test)
+    elapsed = time.perf_counter() - start
+
+    print(f"{processed} of {len(pending)} audios processed in {elapsed:.1f}s with {args.workers} workers -> {csvfile}")
+    if errors:
+        print(f"{len(errors)} audios failed: {', '.join(os.path.basename(audio_file) for audio_file, _ in errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pandas as pd
+import soundfile as sf
+
+from app.module_inference.models.models import get_dimensional_model
+from app.module_inference.models.ensemble import evaluate_ensemble
+
+from utils.utils import reformat_label
+from utils.decoded_audio import DecodedAudio
+
+# One row per window: 29 bytes, so an hour of audio with a 1.5 s hop fits in ~70 KB
+TIMELINE_DTYPE = np.dtype([
+    ('start', np.float32),
+    ('end', np.float32),
+    ('label', np.uint8),
+    ('prob', np.float32),
+    ('std', np.float32),
+    ('valence', np.float32),
+    ('arousal', np.float32),
+    ('dominance', np.float32),
+])
+
+
+#   Split a recording into overlapping windows: (start in seconds, mono signal, sample rate)
+def iter_windows(audio, window = 3.0, hop = 1.5):
+    if isinstance(audio, (str, os.PathLike)):
+        # Stream the file block by block, so only one window is in memory at a time
+        sample_rate = sf.info(audio).samplerate
+        window_samples, hop_samples = int(window * sample_rate), int(hop * sample_rate)
+        blocks = sf.blocks(audio, blocksize = window_samples, overlap = window_samples - hop_samples,
+                           dtype = 'float32', always_2d = True)
+        blocks = (block.mean(axis = 1) for block in blocks)
+    else:
+        signal, sample_rate = audio.get_signal(), audio.sample_rate
+        window_samples, hop_samples = int(window * sample_rate), int(hop * sample_rate)
+        starts = range(0, max(len(signal) - window_samples, 0) + hop_samples, hop_samples)
+        blocks = (signal[start:start + window_samples] for start in starts if start < len(signal))
+
+    for index, block in enumerate(blocks):
+        # The last window is usually shorter: drop it when it is too short to be meaningful
+        if index > 0 and len(block) < window_samples // 2:
+            break
+        yield index * hop_samples / sample_rate, block, sample_rate
+
+
+#   Features of a batch of windows, stacked in a single frame
+def get_windows_features(feature_loader, windows):
+    if hasattr(feature_loader, 'extract_signal'):
+        audio_features = feature_loader.get_audio_features()
+        rows, header = [], None
+        for _, signal, sample_rate in windows:
+            features, header = feature_loader.extract_signal(signal, sample_rate, audio_features)
+            rows.append(features)
+        return pd.DataFrame(np.stack(rows), columns = [np.array(header)])
+
+    frames = [feature_loader.get_features(DecodedAudio(signal, sample_rate)) for _, signal, sample_rate in windows]
+    return pd.concat(frames, ignore_index = True)
+
+
+#   Predict a batch of windows: the ensemble runs once for the whole batch
+def predict_windows(windows, model, feature_loader, dimensional = True):
+    probabilities, stds, _ = evaluate_ensemble(model, get_windows_features(feature_loader, windows))
+    labels = np.argmax(probabilities, axis = 1)
+    rows = np.arange(len(windows))
+
+    timeline = np.zeros(len(windows), dtype = TIMELINE_DTYPE)
+    timeline['start'] = [start for start, _, _ in windows]
+    timeline['end'] = [start + len(signal) / sample_rate for start, signal, sample_rate in windows]
+    timeline['label'] = labels
+    timeline['prob'] = probabilities[rows, labels]
+    timeline['std'] = stds[rows, labels]
+
+    if dimensional:
+        dimensional_model = get_dimensional_model()
+        values = [dimensional_model.predict(DecodedAudio(signal, sample_rate)) for _, signal, sample_rate in windows]
+        timeline['valence'], timeline['arousal'], timeline['dominance'] = np.asarray(values, dtype = np.float32).T
+    else:
+        for name in ('valence', 'arousal', 'dominance'):
+            timeline[name] = np.nan
+
+    return timeline
+
+
+def emotion_timeline(audio, model, feature_loader, window = 3.0, hop = 1.5, batch_size = 32, dimensional = True):
+    """
+    Sliding-window emotion estimates over a long recording.
+
+    Args:
+        audio: path of the recording (read in blocks) or a DecodedAudio.
+        model, feature_loader: categorical model and its feature extractor ('ours' or 'w2v2').
+        window, hop: window length and step in seconds.
+        batch_size: number of windows evaluated together by the ensemble.
+        dimensional: also estimate valence, arousal and dominance of each window.
+
+    Yields:
+        Structured arrays of TIMELINE_DTYPE, one per batch of windows.
+    """
+    batch = []
+    for window_data in iter_windows(audio, window, hop):
+        batch.append(window_data)
+        if len(batch) == batch_size:
+            yield predict_windows(batch, model, feature_loader, dimensional)
+            batch = []
+
+    if batch:
+        yield predict_windows(batch, model, feature_loader, dimensional)
+
+
+#   Whole timeline of a recording in a single compact array
+def compute_timeline(audio, model, feature_loader, **kwargs):
+    batches = list(emotion_timeline(audio, model, feature_loader, **kwargs))
+    if not batches:
+        return np.zeros(0, dtype = TIMELINE_DTYPE)
+    return np.concatenate(batches)
+
+
+#   Readable version of a timeline, with the label names of the dataset
+def timeline_to_json(timeline, dataset_name):
+    return [
+        {
+            "start": float(row['start']),
+            "end": float(row['end']),
+            "emo": reformat_label(int(row['label']), dataset_name),
+            "prob": float(row['prob']),
+            "std": float(row['std']),
+            "emodimensional": {
+                "valence": float(row['valence']),
+                "arousal": float(row['arousal']),
+                "dominance": float(row['dominance'])
+            }
+        }
+        for row in timeline
+    ]
@@ -0,0 +1,177 @@
+import os
+import queue
+import threading
+import time
+
+# inotify (through watchdog) when it is installed, polling otherwise
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _Event_Handler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+    def on_closed(self, event):
+        # IN_CLOSE_WRITE: the writer has finished, no need to wait for the debounce
+        if not event.is_directory:
+            self.watcher.notify(event.src_path, closed=True)
+
+
+class Folder_Watcher:
+    """
+    Watch a folder for new audio files and push them into a bounded queue.
+
+    Files are only queued once they have stopped changing for `settle` seconds (or once the
+    writer closes them), so half-written recordings are never processed. When the queue is
+    full the watcher waits, which gives backpressure to the producer side instead of
+    growing memory without limit.
+    """
+
+    def __init__(self, folder, suffix='.wav', max_queue=100, settle=0.5, poll_interval=5):
+        self.folder = folder
+        self.suffix = suffix
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.use_inotify = Observer is not None
+        self._folder_path = os.path.abspath(folder)
+
+        self._pending = {}    # path -> (size, mtime, last change)
+        self._tracked = {}    # path -> arrival time (mtime), for files queued or being processed
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._observer = None
+        self._threads = []
+        self.processed = 0
+        self.last_latency = None
+
+    def start(self):
+        # Files that were already in the folder before starting
+        for entry in os.scandir(self.folder):
+            self.notify(entry.path)
+
+        if self.use_inotify:
+            self._observer = Observer()
+            self._observer.schedule(_Event_Handler(self), self.folder, recursive=False)
+            self._observer.start()
+        else:
+            self._threads.append(threading.Thread(target=self._poll, daemon=True))
+
+        self._threads.append(threading.Thread(target=self._debounce, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+
+    def notify(self, path, closed=False):
+        """Register a change in a file of the folder."""
+        if not path.lower().endswith(self.suffix) or os.path.dirname(os.path.abspath(path)) != self._folder_path:
+            return
+        with self._condition:
+            if path in self._tracked:
+                return
+            now = time.monotonic()
+            # A closed file is considered settled straight away
+            self._pending[path] = (None, None, now - self.settle if closed else now)
+            self._condition.notify()
+
+    def _poll(self):
+        """Fallback without inotify: scan the folder every `poll_interval` seconds."""
+        known = {}
+        while not self._stop.wait(self.poll_interval):
+            current = {}
+            for entry in os.scandir(self.folder):
+                if entry.is_file():
+                    stat = entry.stat()
+                    current[entry.path] = (stat.st_size, stat.st_mtime)
+                    if known.get(entry.path) != current[entry.path]:
+                        self.notify(entry.path)
+            known = current
+
+    def _debounce(self):
+        while not self._stop.is_set():
+            with self._condition:
+                # Sleep without using CPU until there is some file pending
+                while not self._pending and not self._stop.is_set():
+                    self._condition.wait()
+                pending = dict(self._pending)
+
+            ready = []
+            now = time.monotonic()
+            for path, (size, mtime, changed) in pending.items():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    with self._condition:
+                        self._pending.pop(path, None)
+                    continue
+
+                if size is None and now - changed >= self.settle:
+                    # Closed by the writer
+                    ready.append((path, stat.st_mtime))
+                elif (stat.st_size, stat.st_mtime) != (size, mtime):
+                    # First look at the file or still being written: remember its state and wait again
+                    with self._condition:
+                        if path in self._pending:
+                            self._pending[path] = (stat.st_size, stat.st_mtime, changed if size is None else now)
+                elif now - changed >= self.settle:
+                    ready.append((path, stat.st_mtime))
+
+            for path, arrival in ready:
+                with self._condition:
+                    self._pending.pop(path, None)
+                    self._tracked[path] = arrival
+                # Blocks while the queue is full (backpressure)
+                self.queue.put(path)
+
+            self._stop.wait(self.settle / 2)
+
+    def get(self, timeout=None):
+        """Next file ready to be processed."""
+        return self.queue.get(timeout=timeout)
+
+    def task_done(self, path):
+        """Mark a file as processed, once it has been moved out of the folder."""
+        with self._condition:
+            arrival = self._tracked.pop(path, None)
+        if arrival is not None:
+            self.last_latency = time.time() - arrival
+        self.processed += 1
+        self.queue.task_done()
+
+    def metrics(self):
+        now = time.time()
+        with self._condition:
+            ages = [now - arrival for arrival in self._tracked.values()]
+            pending = len(self._pending)
+        return {
+            "backend": "inotify" if self.use_inotify else "polling",
+            "queue_depth": self.queue.qsize(),
+            "pending_files": pending,
+            "oldest_file_age": max(ages) if ages else 0,
+            "last_latency": self.last_latency,
+            "processed": self.processed,
+        }
@@ -1,71 +1,47 @@
 import os
 import numpy as np
-from time import sleep
+from concurrent.futures import ProcessPoolExecutor
+from time import sleep, time
 
 from app.module_inference.infere_emotion.test import check_installation
 from app.module_inference.infere_emotion.mqtt import config_mqtt, mandar_alerta_emocion
+from app.module_inference.infere_emotion.folder_watcher import Folder_Watcher
 
-from app.module_inference.models.models import Pretrained_Model_Dimensional, load_model
+from app.module_inference.models.models import get_dimensional_model, load_model
+from app.module_inference.models.ensemble import evaluate_ensemble
 
-from utils.utils import load_csv, reformat_label, write_csv, decode_label, write_json
+from utils.utils import load_csv, reformat_label, write_csv, decode_label, write_json, extend_json
+from utils.decoded_audio import load_audio
 
 from features_extraction.extract_features_w2v2 import Feature_Extractor as fe_w2v2
 from features_extraction.extract_features_ours import Feature_Extractor as fe_ours
 from features_extraction.extract_features_pretrained import Feature_Extractor as fe_pre
+from features_extraction.feature_cache import feature_cache
 
 
 #   Predict the emotions of each features group
 def get_emotions(models, features, mode="hard"):
-    predictions = []
+    probabilities, std, labels = evaluate_ensemble(models, features)
     
     if(mode == "hard"):
-        if 'dict' in str(type(models)):
-            features = models['scaler'].transform(features)
-            for model in models['models']:
-                prediction = model.predict(features)
-                predictions.append(list(prediction))
-            
-            predictions = np.array(predictions, dtype=object)
-            
-            unique_elements, counts = np.unique(predictions, return_counts=True)
-            final_result =  unique_elements[np.argmax(counts)].item()
-        else:
-            final_result = int(models.predict(features))
-            
-        return final_result
+        return labels[0].item()
             
     elif (mode == "soft"):
-        if 'dict' in str(type(models)):
-            features = models['scaler'].transform(features)
-            for model in models['models']:
-                prediction = model.predict_proba(features)
-                predictions.append(prediction)
-            
-            final_result = np.mean(predictions, axis=0)
-            final_std = np.std(predictions, axis=0)
-        else:
-            final_result = models.predict_proba(features)
-            final_std = [[0]]
-            
-        final_result = final_result[0]
-        final_std = final_std[0]
-            
-        return final_result, final_std
+        return probabilities[0], std[0]
 
 
 def get_dimensional(audio_file):
     
     # features = fe_pre().get_features(audio_file)
     
-    model = Pretrained_Model_Dimensional()
+    model = get_dimensional_model()
     
     values = model.predict(audio_file)
     
     return values
 
 
-#   Test a model with an audio
-def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csvfile, original_emotion = None, worker_id = None):
+def write_csv_header(csvfile, original_emotion = None):
     #   Create the header of the .csv including the target column
     if not os.path.exists(csvfile):
         cabeceraCsv = ["file_name", "Emotion_1_label", "Emotion_1_mean", "Emotion_1_std", "Emotion_2_label", "Emotion_2_mean", "Emotion_2_std", "Emotion_3_label", "Emotion_3_mean", "Emotion_3_std", "valence", "arousal", "dominance"]
@@ -78,16 +54,19 @@ def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csv
             
         
         write_csv(cabeceraCsv, csvfile, 'a')
-    
-    
-    features = feature_loader.get_features(audio_file)
 
-    # Get emotions
-    porAccuracy, std = get_emotions(model, features, "soft")
-    label = get_emotions(model, features, "hard")
-        
-    dimensional_values = get_dimensional(audio_file)
-    
+
+#   Timestamp and worker of an audio named <timestamp>_<worker>.wav (None for the parts that are not integers)
+def audio_origin(audio_file):
+    name = os.path.basename(str(audio_file).replace('\\', '/')).removesuffix('.wav')
+    timestamp, _, worker = name.partition('_')
+    return (int(timestamp) if timestamp.isdigit() else None), (int(worker) if worker.isdigit() else None)
+
+
+#   Build the csv row and the json output of an audio from its predictions.
+#   The user_id and timestamp columns take the given worker_id and timestamp or, if missing, those of the
+#   audio name; an audio without a timestamp in its name gets the time when it is processed
+def build_emotion_result(dataset_name, audio_file, type, porAccuracy, std, dimensional_values, original_emotion = None, worker_id = None, timestamp = None):
     # Get the indices that would sort the array
     sorted_indices = np.argsort(porAccuracy)[-3:][::-1]
  
@@ -106,7 +85,6 @@ def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csv
     }
     
     if type == 'pretrained':
-        label = decode_label(label, dataset_name)
         for index in sorted_indices:
             emo = decode_label(index, dataset_name)
             prob = porAccuracy[index]
@@ -120,7 +98,6 @@ def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csv
             })
                     
     else:   
-        label = reformat_label(label, dataset_name)
         for index in sorted_indices:
             emo = reformat_label(index, dataset_name)
             prob = porAccuracy[index]
@@ -141,9 +118,31 @@ def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csv
     if original_emotion:
         data.append(original_emotion)
     else:
-        timestamp = audio_file.split('/')[-1].split('_')[0]
-        data.append(worker_id)
-        data.append(timestamp)
+        file_timestamp, file_worker = audio_origin(audio_file)
+        data.append(worker_id if worker_id is not None else file_worker)
+        data.append(timestamp or file_timestamp or int(time()))
+    
+    return data, json_data
+
+
+#   Test a model with an audio
+def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csvfile, original_emotion = None, worker_id = None, timestamp = None):
+    write_csv_header(csvfile, original_emotion)
+    
+    # Decode the audio once and share it between the feature loader and the dimensional model
+    audio = load_audio(audio_file)
+    audio_file = audio.path
+
+    features = feature_loader.get_features(audio)
+
+    # Get emotions: probabilities, spread and vote from a single pass of the ensemble
+    probabilities, stds, labels = evaluate_ensemble(model, features)
+    porAccuracy, std = probabilities[0], stds[0]
+        
+    dimensional_values = get_dimensional(audio)
+    
+    data, json_data = build_emotion_result(dataset_name, audio_file, type, porAccuracy, std, dimensional_values,
+                                           original_emotion = original_emotion, worker_id = worker_id, timestamp = timestamp)
             
     #Add to the csv the new data
     write_csv(data, csvfile, 'a')
@@ -151,14 +150,105 @@ def interfere_emotion(dataset_name, audio_file, feature_loader, model, type, csv
     return json_data
 
     
-def process_audio_files(dataset_name, audio_folder, model, type, csvfile, used_audio_folder, seconds, test):
-    
+def get_feature_loader(model, type):
     if type == 'pretrained':
-        feature_loader = fe_pre()
+        return fe_pre()
     elif type == 'w2v2':
-        feature_loader = fe_w2v2()
-    else:
-        feature_loader = fe_ours(model['mfcc'][0], model['mfcc'][1])
+        return fe_w2v2()
+    return fe_ours(model['mfcc'][0], model['mfcc'][1], cache=feature_cache)
+
+
+#   The folder watcher metrics (queue depth, latency...) are logged every this number of audios
+WATCHER_METRICS_EVERY = 50
+
+
+#   State of each process of the pool, loaded once by init_worker
+worker_state = {}
+
+
+#   'dimensional' predicts the valence, arousal and dominance of an audio (get_dimensional if missing). It is
+#   passed to the workers as an argument, so it must be a module level function to be pickled under spawn
+def init_worker(model_folder, model_name, dimensional = None):
+    worker_state['dimensional'] = dimensional or get_dimensional
+    model, type = load_model(model_folder, model_name)
+    worker_state['dataset_name'] = model_name.split("_")[-1].split('.')[0]
+    worker_state['model'] = model
+    worker_state['type'] = type
+    worker_state['feature_loader'] = get_feature_loader(model, type)
+
+
+#   Predict one audio inside a worker of the pool, without writing anything.
+#   Returns (data, json_data, None) or, if the audio fails, (None, None, error message)
+def predict_file(args):
+    audio_file, original_emotion, worker_id = args
+    try:
+        audio = load_audio(audio_file)
+        features = worker_state['feature_loader'].get_features(audio)
+        probabilities, stds, labels = evaluate_ensemble(worker_state['model'], features)
+        dimensional_values = worker_state['dimensional'](audio)
+        
+        data, json_data = build_emotion_result(worker_state['dataset_name'], audio_file, worker_state['type'], probabilities[0], stds[0],
+                                               dimensional_values, original_emotion = original_emotion, worker_id = worker_id)
+        return data, json_data, None
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+
+#   Task (audio_file, original_emotion, worker_id) of each audio. Files whose name does not follow
+#   <emotion>_<n>.wav (test) or <timestamp>_<worker>.wav are skipped
+def audio_tasks(audio_files, test = False):
+    tasks = []
+    for audio_file in sorted(audio_file for audio_file in audio_files if os.path.isfile(audio_file)):
+        name = os.path.basename(audio_file).removesuffix('.wav')
+        prefix, separator, suffix = name.partition('_')
+        if not separator or not prefix or not suffix:
+            print(f"Skipping {audio_file}: the name is not <{'emotion' if test else 'timestamp'}>_<{'n' if test else 'worker'}>.wav")
+            continue
+        tasks.append((audio_file, prefix, None) if test else (audio_file, None, suffix))
+    return tasks
+
+
+#   Process a list of audios with a pool of processes. Results are written in the same order as the input.
+#   Returns the number of audios whose result was written and the list of (audio_file, error) of the failed ones
+def process_audio_files_parallel(audio_files, model_folder, model_name, csvfile, workers, test = False, dimensional = None):
+    tasks = audio_tasks(audio_files, test)
+    
+    write_csv_header(csvfile, original_emotion = test)
+    json_results = []
+    written = 0
+    errors = []
+    
+    with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (model_folder, model_name, dimensional)) as executor:
+        for (audio_file, original_emotion, worker_id), (data, json_data, error) in zip(tasks, executor.map(predict_file, tasks, chunksize = 4)):
+            if error:
+                print(f"Error processing {audio_file}: {error}")
+                errors.append((audio_file, error))
+                continue
+            write_csv(data, csvfile, 'a')
+            written += 1
+            
+            if not test:
+                json_data['worker_id'] = worker_id
+                json_results.append(json_data)
+    
+    if json_results:
+        extend_json(json_results, csvfile.replace('csv', 'json'))
+    
+    return written, errors
+
+    
+#   Move an audio that could not be processed to the error folder (it can be moved back to retry it)
+def move_failed_audio(audio, error_audio_folder):
+    try:
+        os.makedirs(error_audio_folder, exist_ok = True)
+        os.rename(audio, os.path.join(error_audio_folder, os.path.basename(audio)))
+    except OSError as e:
+        print(f"Could not move {audio} to {error_audio_folder}: {e}")
+
+
+def process_audio_files(dataset_name, audio_folder, model, type, csvfile, used_audio_folder, seconds, test, error_audio_folder = None):
+    
+    feature_loader = get_feature_loader(model, type)
         
         
     if test:
@@ -178,33 +268,43 @@ def process_audio_files(dataset_name, audio_folder, model, type, csvfile, used_a
     else:
         
         client = config_mqtt()
+        error_audio_folder = error_audio_folder or f'{audio_folder}/../output-audios-error'
+        
+        # New files are received from the watcher as soon as they are completely written,
+        # 'seconds' is only used as the interval of the polling fallback
+        watcher = Folder_Watcher(audio_folder, poll_interval = seconds)
+        watcher.start()
         
         while True:
-            # List all files in the folder
-            audio_files = os.listdir(audio_folder)
+            audio = watcher.get()
+            audio_file = os.path.basename(audio)
             
-            for audio_file in audio_files:
-                audio = os.path.join(audio_folder, audio_file)
-                if os.path.isfile(audio):
-                    worker_id = audio_file.split('_')[1].removesuffix('.wav')
-                    # Get emotions from audio file
-                    data = interfere_emotion(dataset_name, audio, feature_loader, model, type, csvfile, worker_id=worker_id)
-                    
-                    data['worker_id'] = worker_id
-                    write_json(data, csvfile.replace('csv', 'json'))
-                    mandar_alerta_emocion(client, data, audio_file.split('_')[0])
+            try:
+                worker_id = audio_file.split('_')[1].removesuffix('.wav')
+                # Get emotions from audio file
+                data = interfere_emotion(dataset_name, audio, feature_loader, model, type, csvfile, worker_id=worker_id)
+                
+                data['worker_id'] = worker_id
+                write_json(data, csvfile.replace('csv', 'json'))
+                mandar_alerta_emocion(client, data, audio_file.split('_')[0])
 
-                    # Move audio file to other folder
-                    os.rename(audio, os.path.join(used_audio_folder, audio_file))
-                    
-            # Schedule the function to run again after 'seconds' seconds
-            sleep(seconds)
+                # Move audio file to other folder
+                os.rename(audio, os.path.join(used_audio_folder, audio_file))
+            except Exception as e:
+                print(f"Error processing {audio_file}: {e}")
+                # The watcher does not queue the file again: move it out of the folder so it is not left behind
+                move_failed_audio(audio, error_audio_folder)
+            finally:
+                watcher.task_done(audio)
+                if watcher.processed % WATCHER_METRICS_EVERY == 0:
+                    print(f"Folder watcher: {watcher.metrics()}")
 
 
-def test_folder(audio_folder, model_name, model_folder, csv_folder, seconds, test = False):
+def test_folder(audio_folder, model_name, model_folder, csv_folder, seconds, test = False, workers = 1):
     
     dataset_name = model_name.split("_")[-1].split('.')[0]
     used_audio_folder = f'{audio_folder}/../output-audios-used'
+    error_audio_folder = f'{audio_folder}/../output-audios-error'
     
     # Create .csv for the results
     if not os.path.exists(csv_folder):
@@ -218,8 +318,17 @@ def test_folder(audio_folder, model_name, model_folder, csv_folder, seconds, tes
     if not os.path.exists(used_audio_folder):
         os.makedirs(used_audio_folder)
     
+    #   Batch mode: every worker of the pool loads its own model
+    if test and workers > 1:
+        audio_files = [os.path.join(audio_folder, audio_file) for audio_file in os.listdir(audio_folder)]
+        process_audio_files_parallel(audio_files, model_folder, model_name, csvfile, workers, test = True)
+        
+        test_csv = load_csv(f'{audio_folder}/../sample_result.csv')
+        result_csv = load_csv(csvfile)
+        check_installation(audio_folder, test_csv, result_csv)
+        return
         
     model, type = load_model(model_folder, model_name)
         
     # Start the initial processing
-    process_audio_files(dataset_name, audio_folder, model, type, csvfile, used_audio_folder, seconds, test)
\ No newline at end of file
+    process_audio_files(dataset_name, audio_folder, model, type, csvfile, used_audio_folder, seconds, test, error_audio_folder)
\ No newline at end of file
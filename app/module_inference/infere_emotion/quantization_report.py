@@ -0,0 +1,167 @@
+"""
+Precisión y latencia de los modelos cuantizados (int8) frente a los fp32 con los audios de prueba.
+
+Para cada audio de la carpeta de prueba se comparan:
+  - las emisiones por frame del modelo CTC de alineamiento (mismo argmax por frame y diferencia media absoluta),
+  - la valencia, activación y dominancia del modelo dimensional ONNX (también frente a sample_result.csv),
+  - opcionalmente, las probabilidades de un modelo categórico preentrenado (mismo top-1 y diferencia máxima).
+
+Ejemplo (desde la raíz del proyecto, con el paquete de inferencia instalado):
+    python -m app.module_inference.infere_emotion.quantization_report --categorical-model data/models/pretrained/ model_MIXED
+"""
+
+import argparse
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+from app.module_inference.models.models import Pretrained_Model_Categorical, Pretrained_Model_Dimensional
+from models.chunked_forward import chunked_forward
+from models.quantization import quantization, quantize_torch_model
+from models.speech_models import SpeechModels, model_bytes
+from utils.decoded_audio import DecodedAudio
+from utils.utils import load_csv
+
+DIMENSIONS = ['valence', 'arousal', 'dominance']
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def ctc_logits(processor, model, audio):
+    sample_rate = processor.feature_extractor.sampling_rate
+    signal = audio.get_signal(sample_rate)
+
+    def forward(batch):
+        return model(processor.feature_extractor(list(batch), sampling_rate=sample_rate, return_tensors="pt").input_values).logits
+
+    return chunked_forward(signal, forward, sample_rate)
+
+
+def compare_ctc(audios):
+    processor, model = SpeechModels().get_alignment()
+    quantized = quantize_torch_model(copy.deepcopy(model))
+
+    agreement, differences, fp32_seconds, int8_seconds = [], [], 0, 0
+    for audio in audios:
+        reference, seconds = timed(ctc_logits, processor, model, audio)
+        fp32_seconds += seconds
+        result, seconds = timed(ctc_logits, processor, quantized, audio)
+        int8_seconds += seconds
+
+        reference, result = torch.log_softmax(reference, dim=-1), torch.log_softmax(result, dim=-1)
+        agreement.append((reference.argmax(-1) == result.argmax(-1)).float().mean().item())
+        differences.append((reference - result).abs().mean().item())
+
+    return {
+        "frame_argmax_agreement": float(np.mean(agreement)),
+        "mean_abs_logprob_difference": float(np.mean(differences)),
+        "fp32_seconds": fp32_seconds,
+        "int8_seconds": int8_seconds,
+        "fp32_bytes": model_bytes(model),
+        "int8_bytes": model_bytes(quantized),
+    }
+
+
+def compare_dimensional(audios, sample):
+    # El modelo dimensional lee el modo cuantizado de la configuración global, que se restaura aunque falle la carga
+    enabled = quantization.enabled
+    try:
+        quantization.enabled = False
+        model = Pretrained_Model_Dimensional()
+        quantization.enabled = True
+        quantized = Pretrained_Model_Dimensional()
+    finally:
+        quantization.enabled = enabled
+
+    reference, result, expected, fp32_seconds, int8_seconds = [], [], [], 0, 0
+    for audio in audios:
+        values, seconds = timed(model.predict, audio)
+        reference.append(values)
+        fp32_seconds += seconds
+        values, seconds = timed(quantized.predict, audio)
+        result.append(values)
+        int8_seconds += seconds
+
+        row = sample[sample['file_name'] == os.path.basename(audio.path)]
+        expected.append(row[DIMENSIONS].iloc[0].tolist() if len(row) else [np.nan] * 3)
+
+    reference, result, expected = (np.asarray(values, dtype=float) for values in (reference, result, expected))
+    return {
+        "mean_abs_difference": dict(zip(DIMENSIONS, np.abs(reference - result).mean(axis=0).tolist())),
+        "fp32_vs_sample_result": dict(zip(DIMENSIONS, np.nanmean(np.abs(reference - expected), axis=0).tolist())),
+        "int8_vs_sample_result": dict(zip(DIMENSIONS, np.nanmean(np.abs(result - expected), axis=0).tolist())),
+        "fp32_seconds": fp32_seconds,
+        "int8_seconds": int8_seconds,
+    }
+
+
+def compare_categorical(audios, model_folder, model_name):
+    enabled = quantization.enabled
+    try:
+        quantization.enabled = False
+        model = Pretrained_Model_Categorical(model_folder, model_name)
+    finally:
+        quantization.enabled = enabled
+    quantized = copy.copy(model)
+    quantized.model = quantize_torch_model(copy.deepcopy(model.model))
+
+    same_label, differences, fp32_seconds, int8_seconds = [], [], 0, 0
+    for audio in audios:
+        features = audio.get_signal(16000)
+        reference, seconds = timed(model.predict_proba, features)
+        fp32_seconds += seconds
+        result, seconds = timed(quantized.predict_proba, features)
+        int8_seconds += seconds
+
+        reference, result = np.asarray(reference[0]), np.asarray(result[0])
+        same_label.append(reference.argmax() == result.argmax())
+        differences.append(np.abs(reference - result).max())
+
+    return {
+        "top1_agreement": float(np.mean(same_label)),
+        "max_abs_probability_difference": float(np.max(differences)),
+        "fp32_seconds": fp32_seconds,
+        "int8_seconds": int8_seconds,
+        "fp32_bytes": model_bytes(model.model),
+        "int8_bytes": model_bytes(quantized.model),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los modelos int8 con los fp32 en los audios de prueba.")
+    parser.add_argument("--audio-folder", default="data/test/audio", help="Carpeta con los .wav de prueba")
+    parser.add_argument("--sample-csv", default="data/test/sample_result.csv", help="Resultados esperados de los audios de prueba")
+    parser.add_argument("--categorical-model", nargs=2, metavar=("CARPETA", "NOMBRE"), help="Modelo categórico preentrenado a comparar")
+    parser.add_argument("--output", default="data/test/quantization_report.json", help="Fichero en el que se escribe el informe")
+    args = parser.parse_args()
+
+    audios = [DecodedAudio.from_file(os.path.join(args.audio_folder, audio_file))
+              for audio_file in sorted(os.listdir(args.audio_folder)) if audio_file.lower().endswith('.wav')]
+
+    report = {
+        "audios": len(audios),
+        "ctc_alignment": compare_ctc(audios),
+        "dimensional": compare_dimensional(audios, load_csv(args.sample_csv)),
+    }
+    if args.categorical_model:
+        report["categorical"] = compare_categorical(audios, *args.categorical_model)
+
+    for name, results in report.items():
+        if isinstance(results, dict) and results.get("int8_seconds"):
+            results["speedup"] = results["fp32_seconds"] / results["int8_seconds"]
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
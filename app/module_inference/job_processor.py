@@ -0,0 +1,92 @@
+"""
+job_processor.py
+
+Ejecución asíncrona del pipeline de inferencia. Las peticiones solo registran el trabajo y
+devuelven su id; un grupo de hilos independiente del servidor web ejecuta el pipeline y guarda
+el resultado en el almacén SQLite de trabajos.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.persistance.job_persistance import DONE, FAILED, RUNNING, JobsDataSQLite
+
+
+class JobProcessor:
+    def __init__(self, run_job, db_path='resources/jobs.db', workers=2):
+        self.run_job = run_job    # función que recibe la ruta del audio y devuelve su resultado
+        self.db_path = db_path
+        self.workers = workers
+        self.store = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._finished = threading.Condition()
+
+    def start(self, workers=None):
+        """
+        Crea el grupo de hilos y vuelve a lanzar los trabajos que quedaron sin terminar.
+        """
+        with self._lock:
+            if self._executor is not None:
+                return
+            self.workers = workers or self.workers
+            self.store = JobsDataSQLite(self.db_path)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference-job')
+
+        for job in self.store.get_unfinished_jobs():
+            print(f"Relanzando trabajo {job['id']} ({job['filename']})")
+            self._executor.submit(self._run, job['id'], job['wav_path'])
+
+    def submit(self, filename, wav_path, job_id=None):
+        """
+        Registra un trabajo y lo encola. Devuelve su id inmediatamente.
+        El audio pertenece al trabajo: se borra cuando termina.
+        """
+        self.start()
+        job_id = self.store.create_job(filename, wav_path, job_id)
+        self._executor.submit(self._run, job_id, wav_path)
+        return job_id
+
+    def _run(self, job_id, wav_path):
+        self.store.update_job(job_id, RUNNING)
+        try:
+            result = self.run_job(wav_path)
+            self.store.update_job(job_id, DONE, result=result)
+        except Exception as e:
+            print(f"Error en el trabajo {job_id}: {e}")
+            self.store.update_job(job_id, FAILED, error=str(e))
+        finally:
+            remove_job_audio(wav_path)
+            with self._finished:
+                self._finished.notify_all()
+
+    def get(self, job_id, wait=0):
+        """
+        Devuelve el trabajo. Si `wait` > 0 espera hasta ese número de segundos a que termine (long-polling).
+        """
+        self.start()
+        deadline = time.monotonic() + wait
+        job = self.store.get_job(job_id)
+
+        while job is not None and job['status'] not in (DONE, FAILED):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._finished:
+                self._finished.wait(timeout=min(remaining, 1))
+            job = self.store.get_job(job_id)
+
+        return job
+
+
+def remove_job_audio(wav_path):
+    """
+    Borra el audio de un trabajo terminado y su carpeta, si ha quedado vacía.
+    """
+    try:
+        os.remove(wav_path)
+        os.rmdir(os.path.dirname(wav_path))
+    except OSError:
+        pass
@@ -0,0 +1,85 @@
+"""
+chunked_forward.py
+
+Ejecución por trozos de los modelos wav2vec2 sobre audios largos.
+La memoria de la atención crece con el cuadrado de la longitud del audio, así que la señal se divide
+en ventanas solapadas de longitud fija, que se procesan en lotes, y las salidas por frame se vuelven
+a unir descartando la mitad del solape en cada borde (donde el modelo tiene menos contexto).
+"""
+
+import numpy as np
+import torch
+
+
+class ChunkedForward:
+    """
+    Aplica una función de salidas por frame a una señal de cualquier longitud con memoria acotada.
+
+    Args:
+        chunk_seconds: Longitud de cada ventana.
+        overlap_seconds: Solape entre ventanas consecutivas.
+        batch_size: Número de ventanas que se procesan juntas.
+    """
+    def __init__(self, chunk_seconds=20, overlap_seconds=1, batch_size=4):
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self.batch_size = batch_size
+
+    def bounds(self, n_samples, sample_rate):
+        """
+        Inicio y fin (en muestras) de cada ventana. La última puede ser más corta.
+        """
+        chunk = int(self.chunk_seconds * sample_rate)
+        overlap = int(self.overlap_seconds * sample_rate)
+        if n_samples <= chunk:
+            return [(0, n_samples)]
+
+        step = chunk - overlap
+        starts = range(0, n_samples - overlap, step)
+        return [(start, min(start + chunk, n_samples)) for start in starts]
+
+    def __call__(self, signal, forward, sample_rate=16000):
+        """
+        Args:
+            signal: Señal mono (numpy).
+            forward: Función que recibe un array (ventanas x muestras), todas de la misma longitud,
+                y devuelve un tensor (ventanas x frames x dimensión).
+
+        Returns:
+            Tensor (frames x dimensión) con las salidas de toda la señal.
+        """
+        bounds = self.bounds(len(signal), sample_rate)
+        if len(bounds) == 1:
+            with torch.no_grad():
+                return forward(signal[np.newaxis, :])[0]
+
+        half_overlap = int(self.overlap_seconds * sample_rate) // 2
+
+        # Las ventanas de igual longitud se agrupan en lotes; la última, más corta, va sola
+        outputs = {}
+        full = [i for i, (start, end) in enumerate(bounds) if end - start == bounds[0][1] - bounds[0][0]]
+        groups = [full[i:i + self.batch_size] for i in range(0, len(full), self.batch_size)]
+        groups += [[i] for i in range(len(bounds)) if i not in full]
+
+        for group in groups:
+            batch = np.stack([signal[bounds[i][0]:bounds[i][1]] for i in group])
+            with torch.no_grad():
+                result = forward(batch)
+            for i, frames in zip(group, result):
+                outputs[i] = frames
+
+        # Cada ventana conserva los frames entre la mitad del solape anterior y la mitad del siguiente
+        stitched = []
+        for i, (start, end) in enumerate(bounds):
+            frames = outputs[i]
+            stride = (end - start) / frames.shape[0]
+            keep_start = start + half_overlap if i > 0 else start
+            keep_end = end - half_overlap if i < len(bounds) - 1 else end
+            positions = start + torch.arange(frames.shape[0]) * stride
+            stitched.append(frames[(positions >= keep_start) & (positions < keep_end)])
+
+        return torch.cat(stitched)
+
+
+# Configuración compartida por el alineamiento y los modelos preentrenados
+chunked_forward = ChunkedForward()
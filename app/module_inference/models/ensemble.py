@@ -0,0 +1,57 @@
+"""
+ensemble.py
+
+Evaluación en una sola pasada de los modelos categóricos.
+El scaler se aplica una vez y cada modelo del ensemble se ejecuta una vez (predict_proba);
+de esa misma pasada se obtienen la media de probabilidades, su desviación y el voto mayoritario.
+"""
+
+import numpy as np
+
+
+def evaluate_ensemble(models, features):
+    """
+    Evalúa un lote de características.
+
+    Args:
+        models: Diccionario {'scaler', 'models'} del ensemble o un modelo único con predict_proba.
+        features: Una o varias filas de características.
+
+    Returns:
+        Tupla (probabilidades medias, desviación por clase, etiqueta votada), con una fila por muestra.
+    """
+    if not isinstance(models, dict):
+        probabilities = np.asarray(models.predict_proba(features), dtype=float)
+        return probabilities, np.zeros_like(probabilities), predicted_labels(models, probabilities)
+
+    features = models['scaler'].transform(features)
+
+    probabilities = []
+    votes = []
+    for model in models['models']:
+        proba = np.asarray(model.predict_proba(features), dtype=float)
+        probabilities.append(proba)
+        votes.append(predicted_labels(model, proba))
+
+    probabilities = np.stack(probabilities)
+    return probabilities.mean(axis=0), probabilities.std(axis=0), majority_vote(np.stack(votes, axis=1))
+
+
+def predicted_labels(model, probabilities):
+    """
+    Etiqueta de mayor probabilidad de cada fila, en las clases del modelo (classes_). Mismo resultado
+    que model.predict, sin volver a ejecutar el modelo.
+    """
+    classes = getattr(model, 'classes_', np.arange(probabilities.shape[1]))
+    return np.asarray(classes)[np.argmax(probabilities, axis=1)]
+
+
+def majority_vote(votes):
+    """
+    Etiqueta más votada de cada fila. En caso de empate gana la menor, igual que np.unique + argmax.
+    """
+    labels = []
+    for row in votes:
+        unique_elements, counts = np.unique(row, return_counts=True)
+        labels.append(unique_elements[np.argmax(counts)])
+    return np.array(labels)
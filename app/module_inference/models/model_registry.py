@@ -0,0 +1,130 @@
+"""
+model_registry.py
+
+Registro de modelos de inferencia compartido por todo el proceso.
+Cada modelo se carga una única vez (carga perezosa) y se mantiene en memoria
+mientras quepa en el presupuesto configurado; cuando se supera, se expulsan
+los modelos usados hace más tiempo (LRU).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# Presupuesto por defecto: 2 GB
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def estimate_size(path):
+    """
+    Estima la memoria que ocupará un modelo a partir de su tamaño en disco.
+    Si la ruta es una carpeta se suman todos sus ficheros.
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+class ModelRegistry:
+    """
+    Caché LRU de modelos, segura para usar desde varios hilos.
+
+    Las claves son tuplas (ruta del modelo, tipo de modelo).
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models = OrderedDict()  # clave -> (modelo, tamaño)
+        self._lock = threading.Lock()
+        self._loading = {}  # clave -> lock de carga, evita cargar dos veces el mismo modelo
+
+    def get(self, key, loader, size=None):
+        """
+        Devuelve el modelo asociado a `key`, cargándolo con `loader()` si no está en memoria.
+
+        Args:
+            key: Tupla (ruta, tipo) que identifica al modelo.
+            loader: Función sin argumentos que carga el modelo.
+            size: Tamaño estimado en bytes. Si no se indica, se calcula a partir de la ruta.
+
+        Returns:
+            El modelo cargado.
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key][0]
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # La carga se hace fuera del lock global para no bloquear otros modelos
+        try:
+            with load_lock:
+                with self._lock:
+                    if key in self._models:
+                        self._models.move_to_end(key)
+                        self.hits += 1
+                        return self._models[key][0]
+                    self.misses += 1
+
+                model = loader()
+                if size is None:
+                    size = estimate_size(key[0]) if os.path.exists(key[0]) else 0
+
+                with self._lock:
+                    self._models[key] = (model, size)
+                    self._evict()
+        finally:
+            # Aunque el loader falle, el lock de carga no se queda en el diccionario
+            with self._lock:
+                if self._loading.get(key) is load_lock:
+                    self._loading.pop(key)
+
+        return model
+
+    def _evict(self):
+        """Expulsa los modelos menos usados hasta respetar el presupuesto (siempre conserva el último)."""
+        while len(self._models) > 1 and self.resident_bytes() > self.max_bytes:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def resident_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self):
+        """
+        Devuelve los contadores del registro.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": [f"{path} ({model_type})" for path, model_type in self._models],
+                "resident_bytes": self.resident_bytes(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Registro único para todo el proceso
+model_registry = ModelRegistry()
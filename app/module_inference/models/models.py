@@ -3,71 +3,127 @@ import audinterface
 import numpy as np
 import torch.nn.functional as F
 import torch
-from transformers import Wav2Vec2ForSequenceClassification, Wav2Vec2Processor
 from utils.utils import load_obj
+from utils.decoded_audio import load_audio
+from models.model_registry import model_registry
+from models.chunked_forward import chunked_forward
+from models.quantization import quantization
+from models.onnx_backend import ClassifierFrameStates, onnx_backend
 import os
 
+DIMENSIONAL_MODEL_PATH = './data/models/w2v2_extractor'
+
 def load_model(model_path, model_name):
-    if 'pretrained' in model_path:
-        type = 'pretrained'
+    type = get_model_type(model_path, model_name)
+    if type == 'pretrained':
         model = Pretrained_Model_Categorical(model_path, model_name)
-    elif 'w2v2' in model_name:
-        type = 'w2v2'
-        model = load_obj(model_path + model_name)
     else:
-        type = 'ours'
         model = load_obj(model_path + model_name)
     return model, type
 
+
+def get_model_type(model_path, model_name):
+    if 'pretrained' in model_path:
+        return 'pretrained'
+    elif 'w2v2' in model_name:
+        return 'w2v2'
+    return 'ours'
+
+
+def get_model(model_path, model_name):
+    """
+    Igual que load_model, pero el modelo se carga una sola vez y se comparte a través del registro.
+    """
+    type = get_model_type(model_path, model_name)
+    model = model_registry.get((model_path + model_name, type),
+                               lambda: load_model(model_path, model_name)[0])
+    return model, type
+
+
+def get_dimensional_model():
+    """
+    Devuelve el modelo dimensional compartido, evitando cargar el ONNX y su calentamiento en cada audio.
+    """
+    return model_registry.get((DIMENSIONAL_MODEL_PATH, 'dimensional'), Pretrained_Model_Dimensional)
+
+
+def get_w2v2_onnx_model():
+    """
+    Devuelve el ONNX de w2v2_extractor ya cargado por el modelo dimensional, o None si este usa la copia
+    cuantizada (las características de los modelos w2v2 se extraen siempre del ONNX original).
+    """
+    model = get_dimensional_model()
+    return model.onnx_model if model.model_path == DIMENSIONAL_MODEL_PATH else None
+
 class Pretrained_Model_Categorical:
     
     def __init__(self, model_path, model_name):
         self.model, self.processor = self.load_model(model_path, model_name)
+        self.frames = ClassifierFrameStates(self.model)
+        # Con ONNX los estados por frame se calculan con ONNX Runtime; el modelo de PyTorch se deja intacto
+        # y frame_states elige el camino según este indicador
+        self.use_onnx = onnx_backend.enabled
+        self.onnx_frames = onnx_backend.frame_states_model(model_path + model_name, self.model) if self.use_onnx else None
 
     
     def load_model(self, model_path, model_name):
+        # transformers se importa en la primera carga, para no retrasar el arranque
+        from transformers import Wav2Vec2ForSequenceClassification, Wav2Vec2Processor
+
         # Initialize the model
         model = Wav2Vec2ForSequenceClassification.from_pretrained(model_path + model_name)
         processor = Wav2Vec2Processor.from_pretrained(model_path + 'processor')
 
         # Set the model to evaluation mode
         model.eval()
+        # Capas lineales en int8 si está activado el modo cuantizado (con ONNX se cuantiza el grafo exportado)
+        if not onnx_backend.enabled:
+            model = quantization.torch_model(model)
         
         return model, processor
         
+    def frame_states(self, batch):
+        """
+        Estados por frame tras el proyector del clasificador, para un lote de ventanas de audio.
+        """
+        inputs = self.processor(list(batch), sampling_rate=16000, return_tensors="pt", padding=True)
+        if self.use_onnx:
+            return torch.from_numpy(self.onnx_frames(input_values=inputs.input_values.numpy()))
+        return self.frames(inputs.input_values)
+
+    def get_logits(self, features):
+        # Igual que Wav2Vec2ForSequenceClassification (media de los frames y clasificador), pero calculando
+        # los frames por ventanas para que audios de cualquier duración quepan en memoria
+        with torch.no_grad():
+            hidden_states = chunked_forward(np.asarray(features, dtype=np.float32).squeeze(), self.frame_states)
+            return self.model.classifier(hidden_states.mean(dim=0, keepdim=True))
+
     def predict(self, features):
         self.model.eval()
-        # Load and preprocess the audio file
-        inputs = self.processor(features.squeeze(), sampling_rate=16000, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            logits = self.model(inputs.input_values.to('cpu')).logits
+        logits = self.get_logits(features)
         predicted_ids = torch.argmax(logits, dim=-1).item()
         
         return predicted_ids
     
     def predict_proba(self, features):
-        probabilities_list = []
-        
-        inputs = self.processor(features.squeeze(), sampling_rate=16000, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            logits = outputs.logits
-            probabilities = F.softmax(logits, dim=-1)
-            probabilities_list.append(probabilities)
+        probabilities = F.softmax(self.get_logits(features), dim=-1)
 
-        return probabilities_list[0].tolist()
+        return probabilities.tolist()
     
     
     
 class Pretrained_Model_Dimensional:
     
     def __init__(self):
-        model_path = './data/models/w2v2_extractor'
-        self.model = self.load_model(model_path)
+        # Copia cuantizada del ONNX si está activado el modo cuantizado
+        self.model_path = quantization.onnx_model_path(DIMENSIONAL_MODEL_PATH)
+        self.model = self.load_model(self.model_path)
 
     
     def load_model(self, model_path):
         model = audonnx.load(model_path)
+        # ONNX sin envolver, lo reutiliza el extractor de características w2v2
+        self.onnx_model = model
         np.random.seed(0)
 
         sampling_rate = 16000
@@ -91,8 +147,8 @@ class Pretrained_Model_Dimensional:
         
         return model
         
-    def predict(self, file):
-        result = self.model.process_file(file)
+    def predict(self, audio):
+        result = self.model.process_signal(load_audio(audio).get_signal(16000), 16000)
         result = result.reset_index()
         result = result.iloc[0]
         
@@ -0,0 +1,206 @@
+"""
+onnx_backend.py
+
+Ejecución de los modelos wav2vec2 de Hugging Face con ONNX Runtime (opcional, INFERENCE.onnx_backend).
+Cada checkpoint se exporta a ONNX una sola vez, con la longitud del audio y el tamaño del lote como ejes
+dinámicos, y el grafo se guarda en disco (INFERENCE.onnx_cache_folder) para los siguientes arranques
+junto a un source.json que identifica el checkpoint exportado: si el checkpoint cambia, se vuelve a exportar.
+Las sesiones usan el número de hilos configurado (INFERENCE.onnx_intra_op_threads e
+INFERENCE.onnx_inter_op_threads; 0 deja que ONNX Runtime decida).
+Con el modo cuantizado activado se sirve la copia int8 del grafo exportado.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from models.quantization import QUANTIZED_SUFFIX, quantization
+
+ONNX_FILENAME = 'model.onnx'
+SOURCE_FILE = 'source.json'
+OPSET_VERSION = 17
+
+
+class CTCLogits(torch.nn.Module):
+    """Grafo a exportar de un Wav2Vec2ForCTC: logits por frame."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values, attention_mask):
+        return self.model(input_values, attention_mask=attention_mask).logits
+
+
+class ClassifierFrameStates(torch.nn.Module):
+    """Grafo a exportar de un Wav2Vec2ForSequenceClassification: estados por frame tras el proyector."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values):
+        if self.model.config.use_weighted_layer_sum:
+            outputs = self.model.wav2vec2(input_values, output_hidden_states=True)
+            hidden_states = torch.stack(outputs.hidden_states, dim=1)
+            weights = torch.nn.functional.softmax(self.model.layer_weights, dim=-1)
+            hidden_states = (hidden_states * weights.view(-1, 1, 1)).sum(dim=1)
+        else:
+            hidden_states = self.model.wav2vec2(input_values).last_hidden_state
+        return self.model.projector(hidden_states)
+
+
+def export_onnx(module, output_path, input_names, output_name):
+    """
+    Exporta un módulo a ONNX con el lote y las muestras (y los frames de la salida) como ejes dinámicos.
+    """
+    # El grafo se traza en modo evaluación: en entrenamiento wav2vec2 aplica enmascarado y dropout
+    module = module.eval()
+    example = tuple(torch.ones(2, 16000, dtype=torch.long if name == 'attention_mask' else torch.float32)
+                    for name in input_names)
+    dynamic_axes = {name: {0: 'batch', 1: 'samples'} for name in input_names}
+    dynamic_axes[output_name] = {0: 'batch', 1: 'frames'}
+
+    folder = os.path.dirname(output_path)
+    os.makedirs(folder, exist_ok=True)
+    # Se exporta a un fichero temporal para no dejar grafos a medias si el proceso se interrumpe
+    tmp_path = output_path + '.tmp'
+    with torch.no_grad():
+        torch.onnx.export(module, example, tmp_path, input_names=list(input_names), output_names=[output_name],
+                          dynamic_axes=dynamic_axes, opset_version=OPSET_VERSION, dynamo=False)
+    os.replace(tmp_path, output_path)
+
+
+def checkpoint_signature(name, model, input_names, output_name):
+    """
+    Identifica lo que se exporta: el hash de la configuración del modelo, las entradas y salida del grafo
+    y, si el checkpoint es una ruta local, el tamaño y la fecha de modificación de sus ficheros.
+    """
+    signature = {
+        "opset": OPSET_VERSION,
+        "config": hashlib.sha1(model.config.to_json_string().encode('utf-8')).hexdigest(),
+        "inputs": list(input_names),
+        "output": output_name,
+    }
+    if os.path.exists(name):
+        paths = [name] if os.path.isfile(name) else sorted(
+            os.path.join(root, filename) for root, _, filenames in os.walk(name) for filename in filenames)
+        signature["files"] = {os.path.relpath(path, name): [os.stat(path).st_size, os.stat(path).st_mtime_ns]
+                              for path in paths}
+    return signature
+
+
+def read_signature(folder):
+    """Firma del checkpoint con el que se exportó el grafo de la carpeta, o None si no hay grafo."""
+    if not os.path.exists(os.path.join(folder, ONNX_FILENAME)):
+        return None
+    try:
+        with open(os.path.join(folder, SOURCE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_signature(folder, signature):
+    tmp_path = os.path.join(folder, SOURCE_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(signature, f)
+    os.replace(tmp_path, os.path.join(folder, SOURCE_FILE))
+
+
+class OnnxModel:
+    """
+    Sesión de ONNX Runtime sobre un grafo exportado.
+    """
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feeds = {name: np.ascontiguousarray(inputs[name]) for name in self.input_names}
+        return self.session.run(None, feeds)[0]
+
+    def size_bytes(self):
+        return os.path.getsize(self.path)
+
+
+class OnnxWav2Vec2ForCTC:
+    """
+    Sustituto de Wav2Vec2ForCTC que ejecuta el grafo exportado. Solo ofrece lo que usan el alineamiento
+    y la transcripción por lotes: la llamada (con .logits) y la longitud en frames de cada audio.
+    """
+    def __init__(self, onnx_model, config):
+        self.onnx_model = onnx_model
+        self.config = config
+
+    def __call__(self, input_values, attention_mask=None):
+        if attention_mask is None:
+            attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+        logits = self.onnx_model(input_values=input_values.numpy(), attention_mask=attention_mask.numpy())
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def _get_feat_extract_output_lengths(self, input_lengths):
+        # Misma fórmula que transformers: una convolución sin relleno por cada capa del extractor
+        for kernel_size, stride in zip(self.config.conv_kernel, self.config.conv_stride):
+            input_lengths = torch.div(input_lengths - kernel_size, stride, rounding_mode='floor') + 1
+        return input_lengths
+
+    def size_bytes(self):
+        return self.onnx_model.size_bytes()
+
+
+class OnnxBackend:
+    """
+    Exportación y carga de los grafos ONNX de los modelos wav2vec2. Se configura al arrancar.
+    """
+    def __init__(self, enabled=False, cache_folder='data/models/onnx', intra_op_threads=0, inter_op_threads=0):
+        self.enabled = enabled
+        self.cache_folder = cache_folder
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._lock = threading.Lock()
+
+    def model_folder(self, name):
+        """Carpeta del grafo exportado de un checkpoint (ruta local o identificador del hub)."""
+        return os.path.join(self.cache_folder, os.path.normpath(name).strip(os.sep).replace(os.sep, '--'))
+
+    def load(self, name, signature, make_module, input_names, output_name):
+        """
+        Devuelve la sesión del grafo de `name`, exportándolo antes con `make_module()` si no está en disco
+        o si se exportó con otro checkpoint (`signature`, ver checkpoint_signature).
+        """
+        folder = self.model_folder(name)
+        with self._lock:
+            if read_signature(folder) != signature:
+                print(f"Exportando {name} a ONNX en {folder}")
+                export_onnx(make_module(), os.path.join(folder, ONNX_FILENAME), input_names, output_name)
+                # La copia cuantizada del grafo anterior ya no vale
+                shutil.rmtree(folder.rstrip('/') + QUANTIZED_SUFFIX, ignore_errors=True)
+                write_signature(folder, signature)
+        folder = quantization.onnx_model_path(folder)
+        return OnnxModel(os.path.join(folder, ONNX_FILENAME), self.intra_op_threads, self.inter_op_threads)
+
+    def ctc_model(self, name, model):
+        input_names = ('input_values', 'attention_mask')
+        signature = checkpoint_signature(name, model, input_names, 'logits')
+        return OnnxWav2Vec2ForCTC(
+            self.load(name, signature, lambda: CTCLogits(model), input_names, 'logits'), model.config)
+
+    def frame_states_model(self, name, model):
+        input_names = ('input_values',)
+        signature = checkpoint_signature(name, model, input_names, 'frame_states')
+        return self.load(name, signature, lambda: ClassifierFrameStates(model), input_names, 'frame_states')
+
+
+# Configuración compartida por todos los modelos del proceso
+onnx_backend = OnnxBackend()
@@ -0,0 +1,107 @@
+"""
+quantization.py
+
+Modo de inferencia cuantizada en CPU (opcional, INFERENCE.quantize).
+Las capas lineales de los modelos wav2vec2 de PyTorch se cuantizan dinámicamente a int8 al cargarlos:
+los pesos se guardan en int8 y las activaciones se cuantizan en cada llamada, así que no hace falta
+calibración. Del modelo ONNX dimensional se genera una copia cuantizada junto al original, que se vuelve
+a generar si cambian los ficheros del original (ver source_signature).
+"""
+
+import json
+import os
+import shutil
+import threading
+
+QUANTIZED_SUFFIX = '_int8'
+SOURCE_FILE = 'quantized_from.json'
+
+
+def quantize_torch_model(model):
+    """
+    Copia del modelo con las capas lineales cuantizadas dinámicamente a int8.
+    """
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def source_signature(model_path):
+    """
+    Identifica la carpeta original: tamaño y fecha de modificación de cada uno de sus ficheros.
+    """
+    signature = {}
+    for root, _, files in os.walk(model_path):
+        for filename in files:
+            stat = os.stat(os.path.join(root, filename))
+            signature[os.path.relpath(os.path.join(root, filename), model_path)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def read_source_signature(output_path):
+    """Firma de la carpeta original con la que se generó la copia cuantizada, o None si no hay copia."""
+    try:
+        with open(os.path.join(output_path, SOURCE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def quantize_onnx_folder(model_path, output_path=None):
+    """
+    Copia cuantizada de una carpeta de modelo ONNX (audonnx): se cuantizan los pesos de todos los
+    ficheros .onnx y el resto de ficheros se copian tal cual. Si la copia ya existe y se generó a partir
+    de los mismos ficheros se reutiliza; si no, se vuelve a generar.
+
+    Returns:
+        Ruta de la carpeta cuantizada.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = output_path or model_path.rstrip('/') + QUANTIZED_SUFFIX
+    signature = source_signature(model_path)
+    if read_source_signature(output_path) == signature:
+        return output_path
+
+    # Se genera en una carpeta temporal para no dejar copias a medias si el proceso se interrumpe
+    tmp_path = output_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    shutil.copytree(model_path, tmp_path, ignore=shutil.ignore_patterns('*.onnx'))
+    for root, _, files in os.walk(model_path):
+        for filename in files:
+            if filename.endswith('.onnx'):
+                source = os.path.join(root, filename)
+                quantize_dynamic(source, os.path.join(tmp_path, os.path.relpath(source, model_path)),
+                                 weight_type=QuantType.QInt8)
+    with open(os.path.join(tmp_path, SOURCE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(signature, f)
+    # La copia anterior, si la hay, se generó con otros ficheros
+    shutil.rmtree(output_path, ignore_errors=True)
+    os.rename(tmp_path, output_path)
+    return output_path
+
+
+class Quantization:
+    """
+    Indica si los modelos se cargan cuantizados. Se fija al arrancar, antes de cargar ningún modelo.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def torch_model(self, model):
+        return quantize_torch_model(model) if self.enabled else model
+
+    def onnx_model_path(self, model_path):
+        if not self.enabled:
+            return model_path
+        with self._lock:
+            return quantize_onnx_folder(model_path)
+
+    @property
+    def suffix(self):
+        """Sufijo para las claves de las cachés de resultados de los modelos cuantizados."""
+        return QUANTIZED_SUFFIX if self.enabled else ''
+
+
+# Configuración compartida por todos los modelos del proceso
+quantization = Quantization()
@@ -0,0 +1,115 @@
+"""
+speech_models.py
+
+Propietario único de los modelos de reconocimiento de voz y de alineamiento (Whisper y wav2vec2 CTC).
+Cada modelo se carga la primera vez que se usa y permanece en memoria durante toda la vida del proceso:
+no pasa por el registro LRU porque se usa en todas las peticiones y expulsarlo supondría volver a
+cargar más de 1 GB. Se registra el tiempo de carga y la memoria que ocupa cada modelo.
+Whisper y transformers también se importan en la primera carga, para no retrasar el arranque.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from models.quantization import quantization
+from models.onnx_backend import onnx_backend
+
+WHISPER_MODEL = "base"
+ALIGNMENT_MODEL = "jonatasgrosman/wav2vec2-large-xlsr-53-spanish"
+
+
+def model_bytes(model):
+    """
+    Memoria ocupada por los tensores de un modelo de PyTorch. Se usa el state_dict porque las capas
+    cuantizadas guardan sus pesos empaquetados, fuera de parameters(). Los modelos servidos con
+    ONNX Runtime indican su propio tamaño.
+    """
+    if hasattr(model, 'size_bytes'):
+        return model.size_bytes()
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in value if isinstance(value, tuple) else (value,):
+            if hasattr(tensor, 'element_size'):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class SpeechModels:
+    """
+    Carga perezosa y segura entre hilos de los modelos de voz.
+    """
+    def __init__(self, whisper_model=WHISPER_MODEL, alignment_model=ALIGNMENT_MODEL, device="cpu"):
+        self.whisper_model = whisper_model
+        self.alignment_model = alignment_model
+        self.device = device
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._loading = {}    # nombre -> lock de carga, evita cargar dos veces el mismo modelo
+        self._inference = {}  # nombre -> lock de uso, para los modelos que no admiten llamadas concurrentes
+
+    def _get(self, name, loader):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            loading_lock = self._loading.setdefault(name, threading.Lock())
+
+        with loading_lock:
+            if name not in self._models:
+                start = time.perf_counter()
+                model = loader()
+                load_seconds = time.perf_counter() - start
+                torch_model = model[1] if isinstance(model, tuple) else model
+                self._stats[name] = {
+                    "load_seconds": round(load_seconds, 3),
+                    "bytes": model_bytes(torch_model)
+                }
+                print(f"Modelo {name} cargado en {load_seconds:.1f} s ({self._stats[name]['bytes'] / 1024 ** 2:.0f} MB)")
+                self._models[name] = model
+        return self._models[name]
+
+    @contextmanager
+    def lock(self, name):
+        """
+        Uso exclusivo de un modelo. Whisper instala hooks de caché en el modelo durante la
+        decodificación, así que dos transcripciones no pueden compartirlo a la vez.
+        """
+        with self._lock:
+            inference_lock = self._inference.setdefault(name, threading.Lock())
+        with inference_lock:
+            yield
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get_whisper(self):
+        def load():
+            import whisper
+            return whisper.load_model(self.whisper_model, device=self.device)
+
+        return self._get("whisper", load)
+
+    def get_alignment(self):
+        """
+        Returns:
+            Tupla (processor, modelo) del modelo CTC de alineamiento.
+        """
+        def load():
+            from transformers import Wav2Vec2ForCTC, Wav2Vec2Processor
+            processor = Wav2Vec2Processor.from_pretrained(self.alignment_model)
+            model = Wav2Vec2ForCTC.from_pretrained(self.alignment_model).to(self.device).eval()
+            if onnx_backend.enabled:
+                return processor, onnx_backend.ctc_model(self.alignment_model, model)
+            return processor, quantization.torch_model(model)
+
+        return self._get("alignment", load)
+
+    def stats(self):
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+# Modelos de voz compartidos por todo el proceso
+speech_models = SpeechModels()
@@ -1,9 +1,12 @@
 import pytest
 import os
+import numpy as np
+import pandas as pd
 from unittest.mock import patch, MagicMock
-from app.module_inference.audio_processer import convert_audio_to_wav, get_emotions_audio
+from app.module_inference.audio_processer import convert_audio_to_wav, get_emotions_audio, get_emotions_audio_batch
 from app.model.audio_convert import AudioConvert
-from force_alignment_processor import compute_alignments, process, transcribe_audio
+from force_alignment_processor import compute_alignments, process, text_to_tokens, transcribe_and_align, transcribe_audio
+from utils.decoded_audio import DecodedAudio
 
 @pytest.fixture
 def mock_audio():
@@ -20,15 +23,79 @@ def test_convert_audio_to_wav(mock_save_wav_audio, mock_audio):
     mock_save_wav_audio.assert_called_once()
 
 
-@patch("app.module_inference.audio_processer.load_model", return_value=(MagicMock(), "pretrained"))
+@patch("app.module_inference.audio_processer.get_model", return_value=(MagicMock(), "pretrained"))
 @patch("app.module_inference.audio_processer.interfere_emotion", return_value={"happiness": 0.7, "sadness": 0.2})
-def test_get_emotions_audio(mock_interfere_emotion, mock_load_model):
+def test_get_emotions_audio(mock_interfere_emotion, mock_get_model):
     emotions = get_emotions_audio("models/", "model_ours_MIXED.pkl", "test.wav")
     assert "happiness" in emotions
     assert emotions["happiness"] == 0.7
     mock_interfere_emotion.assert_called_once()
 
-@patch("force_alignment_processor.whisper.load_model")
+@patch("app.module_inference.audio_processer.write_csv")
+@patch("app.module_inference.audio_processer.write_csv_header")
+@patch("app.module_inference.audio_processer.get_dimensional", return_value=[0.1, 0.2, 0.3])
+@patch("app.module_inference.audio_processer.get_model_and_features")
+def test_get_emotions_audio_batch(mock_get_model, mock_dimensional, mock_header, mock_write):
+    feature_loader = MagicMock()
+    feature_loader.get_features.side_effect = lambda audio: pd.DataFrame([[1.0, 2.0]])
+    model = {"scaler": MagicMock(), "models": [MagicMock()]}
+    model["scaler"].transform.side_effect = lambda features: features
+    model["models"][0].predict_proba.return_value = np.array([[0.7, 0.2, 0.1], [0.1, 0.2, 0.7]])
+    model["models"][0].classes_ = np.arange(3)
+    mock_get_model.return_value = (model, "ours", feature_loader)
+
+    audios = [MagicMock(path="resources/audios/1_1.wav"), MagicMock(path="resources/audios/2_1.wav")]
+    results = list(get_emotions_audio_batch("models/", "model_ours_MIXED.pkl", audios))
+
+    assert [result["file"] for result in results] == ["1_1.wav", "2_1.wav"]
+    # El scaler y el modelo se ejecutan una única vez para todo el lote
+    model["scaler"].transform.assert_called_once()
+    model["models"][0].predict_proba.assert_called_once()
+    assert mock_write.call_count == 2
+
+@patch("app.module_inference.audio_processer.write_csv")
+@patch("app.module_inference.audio_processer.write_csv_header")
+@patch("app.module_inference.audio_processer.get_dimensional", return_value=[0.1, 0.2, 0.3])
+@patch("app.module_inference.audio_processer.get_model_and_features")
+def test_get_emotions_audio_batch_yields_per_chunk(mock_get_model, mock_dimensional, mock_header, mock_write):
+    feature_loader = MagicMock()
+    feature_loader.get_features.side_effect = lambda audio: pd.DataFrame([[1.0, 2.0]])
+    model = {"scaler": MagicMock(), "models": [MagicMock()]}
+    model["scaler"].transform.side_effect = lambda features: features
+    model["models"][0].predict_proba.side_effect = lambda features: np.tile([0.7, 0.2, 0.1], (len(features), 1))
+    model["models"][0].classes_ = np.arange(3)
+    mock_get_model.return_value = (model, "ours", feature_loader)
+
+    audios = [MagicMock(path=f"resources/audios/{i}_1.wav") for i in range(5)]
+    results = get_emotions_audio_batch("models/", "model_ours_MIXED.pkl", audios, chunk_size=2)
+
+    # El primer resultado sale sin extraer las características del resto del lote
+    assert next(results)["file"] == "0_1.wav"
+    assert feature_loader.get_features.call_count == 2
+    assert [result["file"] for result in results] == ["1_1.wav", "2_1.wav", "3_1.wav", "4_1.wav"]
+    assert model["models"][0].predict_proba.call_count == 3
+
+@patch("app.module_inference.audio_processer.write_csv")
+@patch("app.module_inference.audio_processer.write_csv_header")
+@patch("app.module_inference.audio_processer.get_dimensional", return_value=[0.1, 0.2, 0.3])
+@patch("app.module_inference.audio_processer.get_model_and_features")
+def test_get_emotions_audio_batch_ensemble_error(mock_get_model, mock_dimensional, mock_header, mock_write):
+    feature_loader = MagicMock()
+    feature_loader.get_features.side_effect = lambda audio: pd.DataFrame([[1.0, 2.0]])
+    model = {"scaler": MagicMock(), "models": [MagicMock()]}
+    model["scaler"].transform.side_effect = lambda features: features
+    # El ensemble falla en el primer grupo y funciona en el segundo
+    model["models"][0].predict_proba.side_effect = [ValueError("features"), np.array([[0.7, 0.2, 0.1]])]
+    model["models"][0].classes_ = np.arange(3)
+    mock_get_model.return_value = (model, "ours", feature_loader)
+
+    audios = [MagicMock(path=f"resources/audios/{i}_1.wav") for i in range(3)]
+    results = list(get_emotions_audio_batch("models/", "model_ours_MIXED.pkl", audios, chunk_size=2))
+
+    assert results[:2] == [{"file": "0_1.wav", "error": "features"}, {"file": "1_1.wav", "error": "features"}]
+    assert results[2]["file"] == "2_1.wav" and "emotions" in results[2]
+
+@patch("force_alignment_processor.speech_models.get_whisper")
 def test_transcribe_audio(mock_whisper):
     mock_model = MagicMock()
     mock_whisper.return_value = mock_model
@@ -49,3 +116,47 @@ def test_transform_number_to_text():
     assert process("Tengo 3 manzanas") == "tengo tres manzanas"
     assert process("5.99") == "cinco coma noventa y nueve"
 
+
+def test_text_to_tokens():
+    tokenizer = MagicMock()
+    tokenizer.get_vocab.return_value = {"<pad>": 0, "|": 1, "h": 2, "o": 3, "l": 4, "a": 5}
+    tokenizer.word_delimiter_token = "|"
+
+    words, tokens = text_to_tokens("hola ? la", tokenizer)
+    # La palabra sin caracteres del vocabulario no se alinea
+    assert words == ["hola", "la"]
+    assert tokens == [2, 3, 4, 5, 1, 4, 5]
+
+
+@patch("force_alignment_processor.transcription_cache")
+@patch("force_alignment_processor.compute_alignments", return_value=[])
+@patch("force_alignment_processor.transcribe_audio")
+@patch("force_alignment_processor.greedy_transcript", return_value="hola")
+@patch("force_alignment_processor.compute_emissions", return_value=("emisiones", 0.02))
+def test_short_audio_skips_whisper(mock_emissions, mock_greedy, mock_whisper, mock_align, mock_cache):
+    mock_cache.get.return_value = None
+    audio = DecodedAudio(np.zeros(16000, dtype=np.float32), 16000)
+
+    transcript, normalized, _ = transcribe_and_align(audio, greedy_max_seconds=2)
+
+    assert transcript == "hola"
+    mock_whisper.assert_not_called()
+    mock_emissions.assert_called_once()
+    # El alineamiento reutiliza las emisiones ya calculadas
+    mock_align.assert_called_once_with(audio, "hola", ("emisiones", 0.02))
+
+
+@patch("force_alignment_processor.transcription_cache")
+@patch("force_alignment_processor.compute_alignments", return_value=[])
+@patch("force_alignment_processor.transcribe_audio")
+@patch("force_alignment_processor.compute_emissions", return_value=("emisiones", 0.02))
+def test_cached_transcription_skips_whisper(mock_emissions, mock_whisper, mock_align, mock_cache):
+    mock_cache.get.return_value = ("Hola, ¿qué tal?", "hola que tal")
+    audio = DecodedAudio(np.zeros(16000, dtype=np.float32), 16000, content_hash="abc")
+
+    transcript, normalized, _ = transcribe_and_align(audio)
+
+    assert (transcript, normalized) == ("Hola, ¿qué tal?", "hola que tal")
+    mock_whisper.assert_not_called()
+    mock_cache.get.assert_called_once_with("abc", "whisper-base", "es")
+    mock_cache.put.assert_not_called()
@@ -4,6 +4,7 @@ import os
 from flask import Flask
 from flask_jwt_extended import JWTManager
 import pytest
+from app.module_inference import audio_controller
 from app.module_inference.audio_controller import audio_bp
 
 @pytest.fixture
@@ -66,3 +67,12 @@ def test_get_data_audio_no_file(client):
     # Verificar el mensaje de error
     json_response = response.get_json()
     assert json_response['message'] == 'No se encontró el audio'
+
+def test_get_timeline_pretrained_model_is_bad_request(client, monkeypatch):
+    monkeypatch.setattr(audio_controller, "MODEL_FOLDER", "data/models/pretrained/")
+
+    response = client.post('/audios/audio/getTimeline', data={'audioFile': (BytesIO(b"RIFF"), 'audio.wav')},
+                           content_type='multipart/form-data')
+
+    assert response.status_code == 400
+    assert response.json['message'] == 'El modelo no admite análisis por ventanas'
@@ -0,0 +1,97 @@
+import functools
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from features_extraction.extract_features_ours import Feature_Extractor
+from utils.utils import load_csv
+from features_extraction.feature_cache import feature_cache
+import app.module_inference.infere_emotion.predict_emotions_folderwavs as predict
+from app.module_inference.infere_emotion.backfill import pending_audio_files
+
+AUDIO_FOLDER = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'test', 'audio')
+
+
+def fixed_dimensional(audio):
+    """Valores fijos en lugar del modelo dimensional."""
+    return [0.1, 0.2, 0.3]
+
+
+@pytest.fixture
+def model_folder(tmp_path):
+    """Modelo 'ours' pequeño, con la misma estructura que los .pkl: {'scaler', 'models', 'mfcc'}."""
+    n_features = Feature_Extractor(20, 2048).get_features(os.path.join(AUDIO_FOLDER, 'anger_1.wav')).shape[1]
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(60, n_features)), np.arange(60) % 6
+    scaler = StandardScaler().fit(X)
+    model = {"scaler": scaler, "models": [LogisticRegression().fit(scaler.transform(X), y)], "mfcc": (20, 2048)}
+    with open(tmp_path / "model_ours_MIXED.pkl", "wb") as f:
+        pickle.dump(model, f)
+    return str(tmp_path) + "/"
+
+
+def test_audio_tasks_skip_bad_names(tmp_path):
+    for name in ("1706640000_7.wav", "recording.wav", "_3.wav"):
+        (tmp_path / name).write_bytes(b"")
+    files = [str(tmp_path / name) for name in os.listdir(tmp_path)]
+
+    assert predict.audio_tasks(files) == [(str(tmp_path / "1706640000_7.wav"), None, "7")]
+    assert predict.audio_tasks(files, test=True) == [(str(tmp_path / "1706640000_7.wav"), "1706640000", None)]
+
+
+@pytest.mark.skipif(not os.path.isdir(AUDIO_FOLDER), reason="No hay audios de prueba")
+def test_parallel_matches_sequential(model_folder, tmp_path, monkeypatch):
+    # Sin el modelo dimensional: unos valores fijos, que llegan a los procesos del pool por init_worker
+    monkeypatch.setattr(predict, "get_dimensional", fixed_dimensional)
+    audio_files = [os.path.join(AUDIO_FOLDER, name) for name in sorted(os.listdir(AUDIO_FOLDER))[:6]]
+
+    # La ejecución secuencial usa su propia caché de características: el pool vuelve a extraerlas
+    monkeypatch.setattr(feature_cache, "cache_folder", str(tmp_path / "sequential_cache"))
+    sequential_csv = str(tmp_path / "sequential.csv")
+    model, type = predict.load_model(model_folder, "model_ours_MIXED.pkl")
+    feature_loader = predict.get_feature_loader(model, type)
+    for audio_file in audio_files:
+        predict.interfere_emotion("MIXED", audio_file, feature_loader, model, type, sequential_csv,
+                                  original_emotion=os.path.basename(audio_file).split('_')[0])
+
+    # Los procesos se crean con spawn: no heredan nada del proceso de los tests
+    monkeypatch.setattr(predict, "ProcessPoolExecutor",
+                        functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")))
+    parallel_csv = str(tmp_path / "parallel.csv")
+    broken_file = tmp_path / "broken_1.wav"
+    broken_file.write_bytes(b"no es un wav")
+    written, errors = predict.process_audio_files_parallel(audio_files + [str(tmp_path / "missing_1.wav"), str(broken_file)],
+                                                           model_folder, "model_ours_MIXED.pkl", parallel_csv, workers=2, test=True,
+                                                           dimensional=fixed_dimensional)
+
+    assert written == len(audio_files)
+    # El audio que falla se devuelve con su error en lugar de perderse en la salida del worker
+    assert [audio_file for audio_file, _ in errors] == [str(broken_file)]
+    sequential, parallel = load_csv(sequential_csv), load_csv(parallel_csv)
+    assert list(parallel["file_name"]) == [os.path.basename(audio_file) for audio_file in audio_files]
+    assert sequential.equals(parallel)
+
+
+def test_pending_audio_files_skip_processed(tmp_path):
+    csvfile = tmp_path / "model_ours_MIXED-output.csv"
+    audio_files = [f"data/output-audios-used/{name}" for name in ("1706640000_7.wav", "1706640005_7.wav")]
+    assert pending_audio_files(audio_files, str(csvfile)) == audio_files
+
+    predict.write_csv_header(str(csvfile))
+    predict.write_csv(["1706640000_7.wav"] + [""] * 14, str(csvfile), 'a')
+    assert pending_audio_files(audio_files, str(csvfile)) == audio_files[1:]
+
+
+def test_move_failed_audio(tmp_path):
+    audio = tmp_path / "input" / "1706640000_7.wav"
+    audio.parent.mkdir()
+    audio.write_bytes(b"")
+
+    predict.move_failed_audio(str(audio), str(tmp_path / "output-audios-error"))
+
+    assert not audio.exists()
+    assert (tmp_path / "output-audios-error" / "1706640000_7.wav").exists()
@@ -0,0 +1,37 @@
+import numpy as np
+import torch
+from models.chunked_forward import ChunkedForward
+
+SAMPLE_RATE = 16000
+STRIDE = 320  # 20 ms por frame, como wav2vec2
+
+
+def forward(batch):
+    # Un frame cada STRIDE muestras cuyo valor es la posición de la muestra
+    return torch.from_numpy(batch[:, ::STRIDE, np.newaxis].copy())
+
+
+def test_short_signal_single_pass():
+    signal = np.arange(SAMPLE_RATE, dtype=np.float32)
+    chunked = ChunkedForward(chunk_seconds=2, overlap_seconds=0.2)
+
+    assert chunked.bounds(len(signal), SAMPLE_RATE) == [(0, SAMPLE_RATE)]
+    assert torch.equal(chunked(signal, forward, SAMPLE_RATE), forward(signal[np.newaxis])[0])
+
+
+def test_stitched_frames_match_full_pass():
+    signal = np.arange(10 * SAMPLE_RATE, dtype=np.float32)
+    chunked = ChunkedForward(chunk_seconds=1, overlap_seconds=0.2, batch_size=3)
+
+    calls = []
+    def counting_forward(batch):
+        calls.append(len(batch))
+        return forward(batch)
+
+    stitched = chunked(signal, counting_forward, SAMPLE_RATE)
+
+    # Ni frames repetidos ni huecos en las uniones
+    assert torch.equal(stitched, forward(signal[np.newaxis])[0])
+    # Las ventanas se procesan en lotes y la memoria depende del tamaño de la ventana, no del audio
+    assert max(calls) <= 3
+    assert sum(calls) == len(chunked.bounds(len(signal), SAMPLE_RATE))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.naive_bayes import GaussianNB
+from models.ensemble import evaluate_ensemble, majority_vote
+
+
+@pytest.fixture
+def ensemble():
+    """Ensemble con la misma estructura que los .pkl: {'scaler', 'models'}."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, 4))
+    y = rng.choice([0, 2, 3], size=60)
+    scaler = StandardScaler().fit(X)
+    models = [m.fit(scaler.transform(X), y) for m in (LogisticRegression(), DecisionTreeClassifier(max_depth=3), GaussianNB())]
+    return {"scaler": scaler, "models": models}, rng.normal(size=(5, 4))
+
+
+def test_evaluate_ensemble_matches_separate_passes(ensemble):
+    models, features = ensemble
+    probabilities, std, labels = evaluate_ensemble(models, features)
+
+    scaled = models["scaler"].transform(features)
+    expected = [model.predict_proba(scaled) for model in models["models"]]
+    np.testing.assert_allclose(probabilities, np.mean(expected, axis=0))
+    np.testing.assert_allclose(std, np.std(expected, axis=0))
+
+    predictions = np.stack([model.predict(scaled) for model in models["models"]], axis=1)
+    np.testing.assert_array_equal(labels, majority_vote(predictions))
+
+
+def test_evaluate_ensemble_runs_scaler_once(ensemble):
+    models, features = ensemble
+    scaler = MagicMock(wraps=models["scaler"])
+    evaluate_ensemble({"scaler": scaler, "models": models["models"]}, features)
+    scaler.transform.assert_called_once()
+
+
+def test_majority_vote_tie_keeps_smallest_label():
+    assert list(majority_vote(np.array([[3, 2, 2, 3], [4, 4, 0, 5]]))) == [2, 4]
+
+
+def test_single_model_returns_class_labels(ensemble):
+    models, features = ensemble
+    model = models["models"][0]
+    scaled = models["scaler"].transform(features)
+    _, _, labels = evaluate_ensemble(model, scaled)
+    # Etiquetas de classes_ (0, 2, 3), no índices de columna
+    np.testing.assert_array_equal(labels, model.predict(scaled))
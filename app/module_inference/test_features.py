@@ -0,0 +1,114 @@
+import os
+import numpy as np
+import pytest
+from features_extraction.extract_features_ours import Feature_Extractor
+from features_extraction.features import cepstral_features, prosodic_features
+from features_extraction.feature_cache import Feature_Cache
+from features_extraction.feature_engine import _chroma_basis, get_chroma_basis
+
+AUDIO_FOLDER = 'data/test/audio'
+
+
+def reference_and_fast(audio_signal, sample_rate, n_mfcc=20, n_fft_ms=None, extractor=None):
+    audio_features = cepstral_features | prosodic_features
+    audio_features['mfcc']['n_mfcc'] = n_mfcc
+    if n_fft_ms:
+        audio_features['n_fft_ms'] = n_fft_ms
+    extractor = extractor or Feature_Extractor(n_mfcc, 2048)
+    signal = extractor.frameW_audio_signal(audio_signal, sample_rate=sample_rate, framing=False)
+
+    reference = extractor.extract_feature_ours(signal, sample_rate, **audio_features)
+    features, header = extractor.engine.extract(signal, sample_rate, **audio_features)
+    return reference, features, header
+
+
+@pytest.mark.parametrize("sample_rate", [16000, 44100])
+def test_engine_matches_librosa(sample_rate):
+    rng = np.random.default_rng(0)
+    t = np.arange(sample_rate * 2) / sample_rate
+    audio_signal = (0.5 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.normal(size=t.size)).astype(np.float32)
+
+    reference, features, header = reference_and_fast(audio_signal, sample_rate)
+
+    assert features.dtype == np.float32
+    assert header == [column[0] for column in reference.columns]
+    np.testing.assert_allclose(features, reference.values[0], rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("n_fft_ms, stfts", [(None, 1), (0.2, 2)])
+def test_engine_stft_count(n_fft_ms, stfts, monkeypatch):
+    # Con el n_fft por defecto (1024 a 44,1 kHz) basta una STFT; con 4096 hacen falta dos
+    sample_rate = 44100
+    rng = np.random.default_rng(0)
+    audio_signal = rng.normal(size=sample_rate).astype(np.float32)
+    extractor = Feature_Extractor(20, 2048)
+    calls = []
+    spectrogram = extractor.engine.spectrogram
+    monkeypatch.setattr(extractor.engine, "spectrogram", lambda *args: calls.append(args[2]) or spectrogram(*args))
+
+    reference, features, _ = reference_and_fast(audio_signal, sample_rate, n_fft_ms=n_fft_ms, extractor=extractor)
+
+    assert len(calls) == stfts
+    np.testing.assert_allclose(features, reference.values[0], rtol=1e-4, atol=1e-5)
+
+
+def test_chroma_basis_cache_key_is_rounded():
+    _chroma_basis.cache_clear()
+    first = get_chroma_basis(16000, 512, 0.1)
+    assert get_chroma_basis(16000, 512, 0.1 + 1e-12) is first
+    assert _chroma_basis.cache_info().currsize == 1
+
+
+@pytest.mark.skipif(not os.path.isdir(AUDIO_FOLDER), reason="No hay audios de prueba")
+def test_engine_matches_librosa_on_test_audios():
+    extractor = Feature_Extractor(20, 2048, fast=False)
+    fast_extractor = Feature_Extractor(20, 2048)
+    for audio_file in sorted(os.listdir(AUDIO_FOLDER))[:5]:
+        path = os.path.join(AUDIO_FOLDER, audio_file)
+        reference = extractor.get_features(path)
+        fast = fast_extractor.get_features(path)
+        assert list(fast.columns) == list(reference.columns)
+        np.testing.assert_allclose(fast.values, reference.values, rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.skipif(not os.path.isdir(AUDIO_FOLDER), reason="No hay audios de prueba")
+def test_cached_features_skip_extraction(tmp_path, monkeypatch):
+    cache = Feature_Cache(cache_folder=str(tmp_path))
+    extractor = Feature_Extractor(20, 2048, cache=cache)
+    path = os.path.join(AUDIO_FOLDER, sorted(os.listdir(AUDIO_FOLDER))[0])
+
+    first = extractor.get_features(path)
+    monkeypatch.setattr(extractor.engine, "extract", lambda *args, **kwargs: pytest.fail("Se ha vuelto a extraer"))
+    second = extractor.get_features(path)
+
+    assert list(second.columns) == list(first.columns)
+    np.testing.assert_array_equal(second.values, first.values)
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = Feature_Cache(cache_folder=str(tmp_path), max_bytes=1000)
+    for i in range(5):
+        cache.put(f"{i:040d}", "config", np.zeros(50, dtype=np.float32), ["f"] * 50)
+
+    assert cache.size() <= 1000
+    assert cache.get(f"{4:040d}", "config") is not None
+    assert cache.get(f"{0:040d}", "config") is None
+
+
+def test_cache_overwrite_keeps_size(tmp_path):
+    cache = Feature_Cache(cache_folder=str(tmp_path))
+    cache.put("a" * 40, "config", np.zeros(50, dtype=np.float32), ["f"] * 50)
+    size = cache.size()
+    for _ in range(3):
+        cache.put("a" * 40, "config", np.ones(50, dtype=np.float32), ["f"] * 50)
+
+    assert cache.size() == size
+    assert Feature_Cache(cache_folder=str(tmp_path)).size() == size
+
+
+def test_cache_fingerprint_depends_on_engine():
+    cache = Feature_Cache()
+    audio_features = Feature_Extractor(20, 2048).get_audio_features()
+    assert cache.fingerprint(audio_features, 'fast') != cache.fingerprint(audio_features, 'librosa')
+    assert cache.fingerprint(audio_features, 'fast') == cache.fingerprint(dict(audio_features), 'fast')
@@ -0,0 +1,79 @@
+import os
+import queue
+import pytest
+from types import SimpleNamespace
+from app.module_inference.infere_emotion import folder_watcher
+from app.module_inference.infere_emotion.folder_watcher import Folder_Watcher, _Event_Handler
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    watcher = Folder_Watcher(str(tmp_path), settle=0.1, poll_interval=0.1)
+    yield watcher
+    watcher.stop()
+
+
+def test_existing_files_are_queued_on_start(tmp_path, watcher):
+    (tmp_path / "1706640000_1.wav").write_bytes(b"RIFF")
+    (tmp_path / "notes.txt").write_text("no es un audio")
+    watcher.start()
+
+    assert watcher.get(timeout=2) == str(tmp_path / "1706640000_1.wav")
+    with pytest.raises(queue.Empty):
+        watcher.get(timeout=0.3)
+
+
+def test_events_are_delivered_once_settled(tmp_path, watcher):
+    watcher.use_inotify = False
+    watcher.poll_interval = 60  # sin escaneos: solo cuentan los eventos
+    watcher.start()
+    handler = _Event_Handler(watcher)
+    path = str(tmp_path / "1706640000_2.wav")
+
+    with open(path, "wb") as f:
+        f.write(b"RIFF")
+        handler.on_created(SimpleNamespace(is_directory=False, src_path=path))
+        handler.on_modified(SimpleNamespace(is_directory=False, src_path=path))
+        f.write(b"data")
+    handler.on_closed(SimpleNamespace(is_directory=False, src_path=path))
+
+    assert watcher.get(timeout=2) == path
+    # Los eventos repetidos de un fichero ya encolado no lo vuelven a encolar
+    handler.on_modified(SimpleNamespace(is_directory=False, src_path=path))
+    with pytest.raises(queue.Empty):
+        watcher.get(timeout=0.3)
+
+
+def test_polling_fallback_finds_new_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(folder_watcher, "Observer", None)
+    watcher = Folder_Watcher(str(tmp_path), settle=0.1, poll_interval=0.1)
+    assert not watcher.use_inotify
+    watcher.start()
+    try:
+        (tmp_path / "1706640000_3.wav").write_bytes(b"RIFF")
+        assert watcher.get(timeout=3) == str(tmp_path / "1706640000_3.wav")
+        assert watcher.metrics()["backend"] == "polling"
+    finally:
+        watcher.stop()
+
+
+def test_task_done_releases_the_file(tmp_path, watcher):
+    path = tmp_path / "1706640000_4.wav"
+    path.write_bytes(b"RIFF")
+    watcher.start()
+    queued = watcher.get(timeout=2)
+    assert watcher.metrics()["queue_depth"] == 0 and watcher.metrics()["oldest_file_age"] >= 0
+
+    os.rename(queued, tmp_path / "used.bin")
+    watcher.task_done(queued)
+
+    metrics = watcher.metrics()
+    assert metrics["processed"] == 1 and metrics["last_latency"] is not None
+    assert queued not in watcher._tracked
+    # Todas las tareas del queue se han completado
+    watcher.queue.join()
+
+    # Un fichero nuevo con el mismo nombre se vuelve a encolar
+    path.write_bytes(b"RIFF")
+    watcher.notify(str(path), closed=True)
+    assert watcher.get(timeout=2) == str(path)
@@ -0,0 +1,38 @@
+import os
+import numpy as np
+from utils.utils import write_csv
+from app.module_inference.infere_emotion.predict_emotions_folderwavs import build_emotion_result, write_csv_header
+from app.persistance.record_ingest import OutputCSVFollower
+
+VOLCADO_CSV = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'output-predict-emotions', 'volcado-output.csv')
+
+
+def emotion_row(audio_file, worker_id=None, timestamp=None):
+    probabilities = np.array([0.6, 0.1, 0.05, 0.05, 0.1, 0.1])
+    data, _ = build_emotion_result("MIXED", audio_file, "ours", probabilities, np.full(6, 0.02), [0.4, 0.3, 0.2],
+                                   worker_id=worker_id, timestamp=timestamp)
+    return data
+
+
+def test_inference_rows_reach_the_records(tmp_path):
+    # El csv de salida tal y como lo escribe la inferencia (cabecera y filas antiguas sin usuario)
+    output_csv = tmp_path / "volcado-output.csv"
+    if os.path.exists(VOLCADO_CSV):
+        with open(VOLCADO_CSV, encoding='utf-8') as f:
+            output_csv.write_text(''.join(f.readlines()[:3]))
+    else:
+        write_csv_header(str(output_csv))
+    received = []
+    follower = OutputCSVFollower(str(tmp_path), received.extend, state_path=str(tmp_path / "offsets.json"))
+    follower.offsets[str(output_csv)] = 0
+
+    write_csv(emotion_row("resources/audios/1729765754_3.wav"), str(output_csv), 'a')
+    write_csv(emotion_row("resources/audios/recording.wav", worker_id=5, timestamp=1729765800), str(output_csv), 'a')
+    write_csv(emotion_row("resources/audios/recording.wav", worker_id=6), str(output_csv), 'a')
+
+    assert follower.poll() == 3
+    assert [(record["user_id"], record["timestamp"]) for record in received[:2]] == [(3, 1729765754), (5, 1729765800)]
+    assert received[2]["user_id"] == 6 and received[2]["timestamp"] > 1729765800
+    assert received[0]["Emotion_1_label"] and received[0]["Emotion_1_mean"] == np.float32(0.6)
+    # Las filas antiguas del volcado, sin trabajador ni timestamp, no se pueden asignar a nadie
+    assert follower.skipped == (2 if os.path.exists(VOLCADO_CSV) else 0)
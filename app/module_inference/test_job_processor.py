@@ -0,0 +1,32 @@
+import os
+from unittest.mock import MagicMock
+from app.module_inference.audio_processer import save_job_audio
+from app.module_inference.job_processor import JobProcessor
+from app.persistance.job_persistance import DONE, new_job_id
+
+
+def upload(content):
+    audio = MagicMock()
+    audio.filename = "recording.wav"
+    audio.read.return_value = content
+    return audio
+
+
+def test_uploads_with_the_same_name_keep_their_audio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    seen = {}
+    processor = JobProcessor(lambda wav_path: seen.setdefault(wav_path, open(wav_path).read()),
+                             db_path=str(tmp_path / "jobs.db"), workers=1)
+
+    jobs = []
+    for content in ("first", "second"):
+        job_id = new_job_id()
+        wav_path = save_job_audio(upload(content.encode()), job_id)
+        assert os.path.basename(wav_path) == "recording.wav"
+        jobs.append((processor.submit("recording.wav", wav_path, job_id), wav_path))
+
+    for job_id, wav_path in jobs:
+        assert processor.get(job_id, wait=5)['status'] == DONE
+    # Cada trabajo procesa su propio audio, que se borra al terminar
+    assert [seen[wav_path] for _, wav_path in jobs] == ["first", "second"]
+    assert not any(os.path.exists(os.path.dirname(wav_path)) for _, wav_path in jobs)
@@ -0,0 +1,61 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from models.model_registry import ModelRegistry
+
+
+def test_model_loaded_once():
+    registry = ModelRegistry()
+    loader = MagicMock(return_value="modelo")
+
+    assert registry.get(("data/models/a.pkl", "ours"), loader, size=10) == "modelo"
+    assert registry.get(("data/models/a.pkl", "ours"), loader, size=10) == "modelo"
+
+    loader.assert_called_once()
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_eviction():
+    registry = ModelRegistry(max_bytes=20)
+    registry.get(("a", "ours"), lambda: "a", size=10)
+    registry.get(("b", "ours"), lambda: "b", size=10)
+    registry.get(("a", "ours"), lambda: "a", size=10)  # "a" pasa a ser el más reciente
+    registry.get(("c", "ours"), lambda: "c", size=10)
+
+    stats = registry.stats()
+    assert stats["evictions"] == 1
+    assert "b (ours)" not in stats["models"]
+    assert stats["resident_bytes"] == 20
+
+
+def test_concurrent_get_loads_once():
+    registry = ModelRegistry()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return "modelo"
+
+    threads = [threading.Thread(target=registry.get, args=(("a", "ours"), loader, 1)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+
+
+def test_failed_load_releases_loading_lock():
+    registry = ModelRegistry()
+
+    def loader():
+        raise OSError("no existe")
+
+    with pytest.raises(OSError):
+        registry.get(("a", "ours"), loader, size=1)
+
+    assert registry._loading == {}
+    # Un segundo intento vuelve a cargar el modelo
+    assert registry.get(("a", "ours"), lambda: "modelo", size=1) == "modelo"
@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import torch
+from types import SimpleNamespace
+from transformers import Wav2Vec2Config, Wav2Vec2ForCTC, Wav2Vec2ForSequenceClassification
+from models.models import Pretrained_Model_Categorical
+from models.onnx_backend import ClassifierFrameStates, OnnxBackend, checkpoint_signature
+
+
+def tiny_config(**kwargs):
+    return Wav2Vec2Config(hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+                          conv_dim=(32, 32), conv_stride=(5, 4), conv_kernel=(10, 4), num_conv_pos_embeddings=16,
+                          feat_extract_norm="layer", do_stable_layer_norm=True, **kwargs)
+
+
+def test_ctc_export_matches_pytorch_with_any_length(tmp_path):
+    torch.manual_seed(0)
+    model = Wav2Vec2ForCTC(tiny_config(vocab_size=10)).eval()
+    backend = OnnxBackend(enabled=True, cache_folder=str(tmp_path), intra_op_threads=1)
+
+    onnx_model = backend.ctc_model("org/wav2vec2-tiny", model)
+    assert os.path.exists(tmp_path / "org--wav2vec2-tiny" / "model.onnx")
+
+    for samples in (8000, 23456):
+        input_values = torch.randn(3, samples)
+        with torch.no_grad():
+            expected = model(input_values).logits
+        assert torch.allclose(onnx_model(input_values).logits, expected, atol=1e-4)
+
+    lengths = torch.tensor([8000, 23456])
+    assert torch.equal(onnx_model._get_feat_extract_output_lengths(lengths), model._get_feat_extract_output_lengths(lengths))
+
+
+def test_cached_graph_is_not_exported_again(tmp_path):
+    model = Wav2Vec2ForCTC(tiny_config(vocab_size=10)).eval()
+    backend = OnnxBackend(enabled=True, cache_folder=str(tmp_path))
+    backend.ctc_model("wav2vec2-tiny", model)
+    modified = os.path.getmtime(tmp_path / "wav2vec2-tiny" / "model.onnx")
+
+    def fail():
+        raise AssertionError("exported twice")
+    signature = checkpoint_signature("wav2vec2-tiny", model, ("input_values", "attention_mask"), "logits")
+    backend.load("wav2vec2-tiny", signature, fail, ("input_values", "attention_mask"), "logits")
+    assert os.path.getmtime(tmp_path / "wav2vec2-tiny" / "model.onnx") == modified
+
+
+def test_changed_checkpoint_is_exported_again(tmp_path):
+    torch.manual_seed(0)
+    checkpoint = tmp_path / "checkpoint"
+    Wav2Vec2ForCTC(tiny_config(vocab_size=10)).save_pretrained(checkpoint)
+    backend = OnnxBackend(enabled=True, cache_folder=str(tmp_path / "onnx"))
+    backend.ctc_model(str(checkpoint), Wav2Vec2ForCTC.from_pretrained(checkpoint).eval())
+
+    # Se reentrena y guarda otro checkpoint en la misma carpeta: el grafo cacheado ya no vale
+    torch.manual_seed(1)
+    model = Wav2Vec2ForCTC(tiny_config(vocab_size=10)).eval()
+    model.save_pretrained(checkpoint)
+    weights = next(path for path in checkpoint.iterdir() if path.suffix in (".safetensors", ".bin"))
+    os.utime(weights, ns=(os.stat(weights).st_atime_ns, os.stat(weights).st_mtime_ns + 10 ** 9))
+
+    onnx_model = backend.ctc_model(str(checkpoint), model)
+    input_values = torch.randn(1, 8000)
+    with torch.no_grad():
+        expected = model(input_values).logits
+    assert torch.allclose(onnx_model(input_values).logits, expected, atol=1e-4)
+
+
+def test_changed_config_is_exported_again(tmp_path):
+    backend = OnnxBackend(enabled=True, cache_folder=str(tmp_path))
+    backend.ctc_model("org/wav2vec2-tiny", Wav2Vec2ForCTC(tiny_config(vocab_size=10)).eval())
+    quantized = tmp_path / "org--wav2vec2-tiny_int8"
+    quantized.mkdir()
+
+    onnx_model = backend.ctc_model("org/wav2vec2-tiny", Wav2Vec2ForCTC(tiny_config(vocab_size=12)).eval())
+    assert onnx_model(torch.randn(1, 8000)).logits.shape[-1] == 12
+    # La copia cuantizada del grafo anterior se descarta
+    assert not quantized.exists()
+
+
+def test_categorical_frame_states_through_onnx(tmp_path):
+    torch.manual_seed(0)
+    model = Wav2Vec2ForSequenceClassification(tiny_config(num_labels=4, classifier_proj_size=16, use_weighted_layer_sum=True)).eval()
+    processor = lambda batch, **kwargs: SimpleNamespace(input_values=torch.tensor(np.stack(batch)))
+    signal = np.random.default_rng(0).normal(size=16000).astype(np.float32)
+
+    categorical = Pretrained_Model_Categorical.__new__(Pretrained_Model_Categorical)
+    categorical.model, categorical.processor, categorical.onnx_frames = model, processor, None
+    categorical.frames, categorical.use_onnx = ClassifierFrameStates(model), False
+    expected = categorical.predict_proba(signal)
+
+    categorical.onnx_frames = OnnxBackend(enabled=True, cache_folder=str(tmp_path)).frame_states_model("models/pretrained/model", model)
+    categorical.use_onnx = True
+    np.testing.assert_allclose(categorical.predict_proba(signal), expected, atol=1e-5)
+    # El modelo de PyTorch sigue completo: se puede volver al camino sin ONNX
+    assert categorical.model.wav2vec2 is not None
+    categorical.use_onnx = False
+    np.testing.assert_allclose(categorical.predict_proba(signal), expected, atol=1e-6)
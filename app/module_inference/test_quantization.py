@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import onnx
+import onnxruntime
+import torch
+from onnx import TensorProto, helper, numpy_helper
+from models.quantization import Quantization, quantize_onnx_folder
+from models.speech_models import model_bytes
+
+
+def test_disabled_keeps_fp32_model():
+    model = torch.nn.Linear(8, 4)
+    assert Quantization(enabled=False).torch_model(model) is model
+    assert Quantization(enabled=False).onnx_model_path("data/models/w2v2_extractor") == "data/models/w2v2_extractor"
+
+
+def test_dynamic_quantization_close_to_fp32():
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(256, 256), torch.nn.ReLU(), torch.nn.Linear(256, 8)).eval()
+    quantized = Quantization(enabled=True).torch_model(model)
+    inputs = torch.randn(16, 256)
+
+    with torch.no_grad():
+        assert torch.allclose(model(inputs), quantized(inputs), atol=0.05)
+    # Pesos en int8: aproximadamente la cuarta parte de memoria
+    assert model_bytes(quantized) < model_bytes(model) / 3
+
+
+def test_onnx_folder_quantized_once(tmp_path):
+    weights = np.random.default_rng(0).normal(size=(256, 256)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("MatMul", ["signal", "weights"], ["logits"])], "model",
+        [helper.make_tensor_value_info("signal", TensorProto.FLOAT, [1, 256])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, [1, 256])],
+        [numpy_helper.from_array(weights, "weights")])
+    model_path = tmp_path / "w2v2_extractor"
+    model_path.mkdir()
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8), model_path / "model.onnx")
+    (model_path / "model.yaml").write_text("labels: {}")
+
+    output_path = quantize_onnx_folder(str(model_path))
+    assert output_path == str(model_path) + "_int8"
+    assert (tmp_path / "w2v2_extractor_int8" / "model.yaml").exists()
+    assert os.path.getsize(f"{output_path}/model.onnx") < os.path.getsize(model_path / "model.onnx") / 2
+
+    signal = np.random.default_rng(1).normal(size=(1, 256)).astype(np.float32)
+    session = onnxruntime.InferenceSession(f"{output_path}/model.onnx", providers=["CPUExecutionProvider"])
+    np.testing.assert_allclose(session.run(None, {"signal": signal})[0], signal @ weights, rtol=0.1, atol=1.0)
+
+    # La segunda vez se reutiliza la copia existente
+    modified = os.path.getmtime(f"{output_path}/model.onnx")
+    assert quantize_onnx_folder(str(model_path)) == output_path
+    assert os.path.getmtime(f"{output_path}/model.onnx") == modified
+
+    # Si cambia el original, la copia se vuelve a generar
+    (model_path / "model.yaml").write_text("labels: {valence: 0}")
+    assert quantize_onnx_folder(str(model_path)) == output_path
+    assert (tmp_path / "w2v2_extractor_int8" / "model.yaml").read_text() == "labels: {valence: 0}"
+    assert not (tmp_path / "w2v2_extractor_int8.tmp").exists()
@@ -0,0 +1,36 @@
+import threading
+import time
+import torch
+from unittest.mock import patch
+from models.speech_models import SpeechModels
+
+
+@patch("whisper.load_model")
+def test_whisper_loaded_once(mock_load):
+    mock_load.return_value = torch.nn.Linear(4, 2)
+    speech_models = SpeechModels()
+
+    assert speech_models.get_whisper() is speech_models.get_whisper()
+
+    mock_load.assert_called_once_with("base", device="cpu")
+    # 4x2 pesos + 2 sesgos en float32
+    assert speech_models.stats()["whisper"]["bytes"] == 40
+
+
+@patch("whisper.load_model")
+def test_concurrent_first_use_loads_once(mock_load):
+    def slow_load(*args, **kwargs):
+        time.sleep(0.05)
+        return torch.nn.Linear(4, 2)
+    mock_load.side_effect = slow_load
+    speech_models = SpeechModels()
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(speech_models.get_whisper())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    mock_load.assert_called_once()
+    assert all(model is models[0] for model in models)
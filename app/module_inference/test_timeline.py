@@ -0,0 +1,47 @@
+import numpy as np
+import soundfile as sf
+from unittest.mock import patch, MagicMock
+
+from app.module_inference.infere_emotion import emotion_timeline
+from features_extraction.extract_features_ours import Feature_Extractor
+from utils.decoded_audio import DecodedAudio
+
+SAMPLE_RATE = 16000
+
+
+def make_signal(seconds):
+    return (np.random.RandomState(0).randn(SAMPLE_RATE * seconds) * 0.1).astype(np.float32)
+
+
+def test_windows_from_file_match_memory(tmp_path):
+    """Las ventanas leídas por bloques del fichero coinciden con las del audio en memoria."""
+    signal = make_signal(10)
+    wav_path = str(tmp_path / "audio.wav")
+    sf.write(wav_path, signal, SAMPLE_RATE, subtype='FLOAT')
+
+    from_file = list(emotion_timeline.iter_windows(wav_path, window=3.0, hop=1.5))
+    from_memory = list(emotion_timeline.iter_windows(DecodedAudio(signal, SAMPLE_RATE), window=3.0, hop=1.5))
+
+    assert [start for start, _, _ in from_file] == [0.0, 1.5, 3.0, 4.5, 6.0, 7.5]
+    assert [start for start, _, _ in from_file] == [start for start, _, _ in from_memory]
+    for (_, file_window, _), (_, memory_window, _) in zip(from_file, from_memory):
+        np.testing.assert_allclose(file_window, memory_window)
+
+
+@patch("app.module_inference.infere_emotion.emotion_timeline.get_dimensional_model")
+def test_compute_timeline(mock_dimensional):
+    """El ensemble se ejecuta una vez por lote de ventanas y el resultado es un array compacto."""
+    mock_dimensional.return_value.predict.return_value = [0.1, 0.2, 0.3]
+    model = MagicMock()
+    model.predict_proba.side_effect = lambda features: np.tile([0.2, 0.5, 0.3], (len(features), 1))
+    model.classes_ = np.arange(3)
+
+    timeline = emotion_timeline.compute_timeline(DecodedAudio(make_signal(10), SAMPLE_RATE), model,
+                                                 Feature_Extractor(13, 0.023), batch_size=4)
+
+    assert timeline.dtype == emotion_timeline.TIMELINE_DTYPE
+    assert len(timeline) == 6
+    assert model.predict_proba.call_count == 2
+    assert (timeline['label'] == 1).all()
+    np.testing.assert_allclose(timeline['valence'], 0.1)
+    assert timeline['end'][-1] == 10.0
@@ -0,0 +1,63 @@
+import csv
+import numpy as np
+from unittest.mock import patch
+import soundfile as sf
+from transcription_batch import CSV_HEADER, audio_duration, length_buckets, transcribe_files, transcription_row
+from utils.decoded_audio import DecodedAudio
+
+SAMPLE_RATE = 16000
+
+
+def make_audio(seconds, path=None):
+    return DecodedAudio(np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32), SAMPLE_RATE, path=path)
+
+
+def test_length_buckets_groups_similar_durations():
+    audios = [make_audio(seconds) for seconds in [12, 1, 2, 14, 3, 1.5, 30]]
+    batches = length_buckets(audios, bucket_seconds=5, batch_size=3)
+
+    assert [[audio.duration for audio in batch] for batch in batches] == [[1, 1.5, 2], [3], [12, 14], [30]]
+
+
+def test_transcription_row_from_filename():
+    audio = make_audio(1, path="data/output-audios-used/1729765754_1.wav")
+    assert transcription_row(audio, " Soy el trabajador 1 ") == ["1729765754", "1", 0, 0, "soy el trabajador 1"]
+    questions = {("1729765754", "1"): "207"}
+    assert transcription_row(audio, "Sí", questions=questions) == ["1729765754", "1", "207", 0, "sí"]
+
+
+def test_length_buckets_with_duration_key():
+    durations = {"a.wav": 3, "b.wav": 1, "c.wav": 10}
+    assert length_buckets(list(durations), bucket_seconds=5, duration=durations.get) == [["b.wav", "a.wav"], ["c.wav"]]
+
+
+def test_audio_duration_reads_header(tmp_path):
+    path = str(tmp_path / "audio.wav")
+    sf.write(path, np.zeros(SAMPLE_RATE * 3, dtype=np.float32), SAMPLE_RATE)
+    assert audio_duration(path) == 3
+
+
+@patch("transcription_batch.audio_duration", return_value=2)
+@patch("transcription_batch.DecodedAudio.from_file", side_effect=lambda path: make_audio(2, path=path))
+def test_transcribe_files_appends_rows(mock_from_file, mock_duration, tmp_path):
+    decoded_per_batch = []
+
+    def fake_batch(batch):
+        # Cada lote se decodifica justo antes de procesarlo, no todos al principio
+        decoded_per_batch.append(mock_from_file.call_count)
+        return [("Hola", "hola", [])] * len(batch)
+    csvfile = tmp_path / "transcriptions.csv"
+    # Fila escrita antes por el sistema en directo: el lote reutiliza su id_pregunta
+    csvfile.write_text(",".join(CSV_HEADER) + "\n1729765761,2,3,0,hola\n")
+    files = [f"{timestamp}_2.wav" for timestamp in (1729765761, 1729765754, 1729765770)]
+
+    with patch("transcription_batch.transcribe_batch", side_effect=fake_batch):
+        report = transcribe_files(files, str(csvfile), alignments_file=None, batch_size=2)
+
+    with open(csvfile, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == CSV_HEADER
+    assert rows[2:] == [["1729765754", "2", "0", "0", "hola"], ["1729765761", "2", "3", "0", "hola"],
+                        ["1729765770", "2", "0", "0", "hola"]]
+    assert decoded_per_batch == [2, 3]
+    assert report["audios"] == 3 and report["audio_seconds"] == 6
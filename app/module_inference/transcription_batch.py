@@ -0,0 +1,243 @@
+"""
+transcription_batch.py
+
+Transcripción y alineamiento por lotes de una carpeta (o lista) de audios.
+Los audios se agrupan por duración para que el relleno de cada lote sea pequeño; Whisper decodifica
+cada lote de espectrogramas de una vez y el modelo CTC calcula las emisiones del lote en una sola
+pasada con relleno. Las filas se añaden en bloque a data/transcription/transcriptions.csv, con el
+id_pregunta que ya tenga el audio (mismo timestamp y worker) en ese csv.
+
+Ejemplo (desde la raíz del proyecto):
+    PYTHONPATH=app/module_inference python -m app.module_inference.transcription_batch data/output-audios-used --batch-size 8
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+
+import soundfile as sf
+import torch
+
+from force_alignment_processor import LANGUAGE, WHISPER_SAMPLE_RATE, compute_alignments, compute_emissions, process, transcribe_audio
+from models.speech_models import speech_models
+from models.chunked_forward import chunked_forward
+from app.persistance.transcription_persistance import transcription_cache
+from utils.decoded_audio import DecodedAudio
+from utils.utils import write_csv, write_csv_rows
+
+TRANSCRIPTIONS_CSV = 'data/transcription/transcriptions.csv'
+ALIGNMENTS_FILE = 'data/transcription/alignments.jsonl'
+CSV_HEADER = ['timestamp', 'worker', 'id_pregunta', 'id_interaction', 'transcripcion']
+
+# Whisper trabaja con ventanas de 30 s: los audios más largos se transcriben de uno en uno
+WHISPER_MAX_SECONDS = 30
+
+# id_pregunta de los audios que no aparecen en el csv de transcripciones
+UNKNOWN_QUESTION = 0
+
+
+def length_buckets(audios, bucket_seconds=5, batch_size=8, duration=lambda audio: audio.duration):
+    """
+    Agrupa los audios en lotes de duración parecida (diferencia máxima `bucket_seconds`).
+    `duration` da la duración de cada elemento, para poder agrupar rutas sin decodificarlas.
+    """
+    batches, batch = [], []
+    for audio in sorted(audios, key=duration):
+        if batch and (len(batch) == batch_size or duration(audio) - duration(batch[0]) > bucket_seconds):
+            batches.append(batch)
+            batch = []
+        batch.append(audio)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def whisper_transcribe_batch(audios):
+    """
+    Transcribe un lote de audios de hasta 30 s con una sola llamada a whisper.decode.
+    """
+    # Whisper se importa al usarlo, como el resto de modelos de voz, para no cargarlo al arrancar
+    import whisper
+
+    model = speech_models.get_whisper()
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio.get_signal(WHISPER_SAMPLE_RATE))),
+                                    n_mels=model.dims.n_mels)
+        for audio in audios
+    ]).to(model.device)
+    options = whisper.DecodingOptions(language=LANGUAGE, without_timestamps=True, fp16=False)
+
+    with speech_models.lock("whisper"):
+        results = whisper.decode(model, mels, options)
+    return [result.text for result in results]
+
+
+def ctc_emissions_batch(audios):
+    """
+    Emisiones del modelo CTC para un lote de audios, rellenando hasta el más largo.
+
+    Returns:
+        Lista de (emisiones, segundos por frame), con solo los frames válidos de cada audio.
+    """
+    processor, model = speech_models.get_alignment()
+    sample_rate = processor.feature_extractor.sampling_rate
+    signals = [audio.get_signal(sample_rate) for audio in audios]
+
+    inputs = processor.feature_extractor(signals, sampling_rate=sample_rate, padding=True, return_tensors="pt",
+                                         return_attention_mask=True)
+    # Los modelos sin normalización por capas no admiten máscara: el relleno con ceros ya es neutro
+    use_mask = processor.feature_extractor.return_attention_mask
+    with torch.no_grad():
+        logits = model(inputs.input_values, attention_mask=inputs.attention_mask if use_mask else None).logits
+    emissions = torch.log_softmax(logits, dim=-1)
+
+    frames = model._get_feat_extract_output_lengths(torch.tensor([len(signal) for signal in signals])).tolist()
+    return [
+        (emissions[i, :n_frames], len(signal) / n_frames / sample_rate)
+        for i, (signal, n_frames) in enumerate(zip(signals, frames))
+    ]
+
+
+def transcribe_batch(audios):
+    """
+    Transcripción, normalización y alineamiento de un lote de audios de duración parecida.
+
+    Returns:
+        Lista de (transcripción, texto normalizado, alineamientos), en el orden del lote.
+    """
+    asr_model = f"whisper-{speech_models.whisper_model}"
+
+    # Solo se transcriben los audios que no están en la caché
+    cached = [transcription_cache.get(audio.content_hash, asr_model, LANGUAGE) for audio in audios]
+    pending = [audio for audio, hit in zip(audios, cached) if hit is None]
+    short = [audio for audio in pending if audio.duration <= WHISPER_MAX_SECONDS]
+
+    transcripts = dict(zip((audio.content_hash for audio in short), whisper_transcribe_batch(short) if short else []))
+    for audio in pending:
+        if audio.content_hash not in transcripts:
+            transcripts[audio.content_hash] = transcribe_audio(audio)
+
+    # Los audios más largos que una ventana se procesan por trozos; el resto, en una pasada con relleno
+    emissions = {}
+    in_batch = [audio for audio in audios if audio.duration <= chunked_forward.chunk_seconds]
+    if in_batch:
+        emissions.update(zip((id(audio) for audio in in_batch), ctc_emissions_batch(in_batch)))
+
+    results = []
+    for audio, hit in zip(audios, cached):
+        if hit:
+            transcript, normalized_text = hit
+        else:
+            transcript = transcripts[audio.content_hash]
+            normalized_text = process(transcript)
+            transcription_cache.put(audio.content_hash, asr_model, LANGUAGE, transcript, normalized_text)
+
+        try:
+            audio_emissions = emissions.get(id(audio)) or compute_emissions(audio)
+            alignments = compute_alignments(audio, normalized_text, audio_emissions)
+        except ValueError as e:
+            print(f"No se puede alinear {audio.path}: {e}")
+            alignments = []
+        results.append((transcript, normalized_text, alignments))
+
+    return results
+
+
+def audio_duration(path):
+    """
+    Duración en segundos leída de la cabecera del fichero, sin decodificar la señal.
+    """
+    info = sf.info(path)
+    return info.frames / info.samplerate
+
+
+def question_ids(csvfile):
+    """
+    id_pregunta de cada (timestamp, worker) del csv de transcripciones, para que las filas del lote se
+    puedan unir con las que escribió el sistema en directo.
+    """
+    if not os.path.exists(csvfile):
+        return {}
+    with open(csvfile, encoding='UTF8', newline='') as f:
+        return {(row['timestamp'], row['worker']): row['id_pregunta']
+                for row in csv.DictReader(f) if row.get('id_pregunta')}
+
+
+def transcription_row(audio, transcript, id_interaction=0, questions=None):
+    """
+    Fila del csv de transcripciones a partir del nombre del audio (<timestamp>_<worker>.wav).
+    El id_pregunta se busca en `questions` (ver question_ids); si no está, se escribe UNKNOWN_QUESTION.
+    """
+    name = os.path.basename(audio.path).removesuffix('.wav')
+    timestamp, _, worker = name.partition('_')
+    id_pregunta = (questions or {}).get((timestamp, worker), UNKNOWN_QUESTION)
+    return [timestamp, worker, id_pregunta, id_interaction, transcript.strip().lower()]
+
+
+def transcribe_files(audio_files, csvfile=TRANSCRIPTIONS_CSV, alignments_file=ALIGNMENTS_FILE,
+                     bucket_seconds=5, batch_size=8, id_interaction=0):
+    """
+    Transcribe y alinea una lista de audios por lotes, añadiendo las filas al csv tras cada lote.
+    Los lotes se forman con la duración de la cabecera y cada lote se decodifica justo antes de
+    procesarlo, así que solo hay un lote de señales en memoria.
+
+    Returns:
+        Diccionario con el número de audios, los segundos de audio, el tiempo empleado y el rendimiento
+        (segundos de audio por segundo real).
+    """
+    start = time.perf_counter()
+    durations = {audio_file: audio_duration(audio_file) for audio_file in audio_files}
+    audios, audio_seconds = 0, 0
+
+    os.makedirs(os.path.dirname(csvfile) or '.', exist_ok=True)
+    if not os.path.exists(csvfile):
+        write_csv(CSV_HEADER, csvfile, 'a')
+    questions = question_ids(csvfile)
+
+    for batch_files in length_buckets(sorted(audio_files), bucket_seconds, batch_size, duration=durations.get):
+        batch = [DecodedAudio.from_file(audio_file) for audio_file in batch_files]
+        audios += len(batch)
+        audio_seconds += sum(audio.duration for audio in batch)
+        results = transcribe_batch(batch)
+        write_csv_rows([transcription_row(audio, transcript, id_interaction, questions)
+                        for audio, (transcript, _, _) in zip(batch, results)], csvfile)
+
+        if alignments_file:
+            with open(alignments_file, 'a', encoding='utf-8') as f:
+                for audio, (transcript, normalized_text, alignments) in zip(batch, results):
+                    f.write(json.dumps({"file": os.path.basename(audio.path), "normalized": normalized_text,
+                                        "alignments": alignments}, ensure_ascii=False) + '\n')
+
+    elapsed = time.perf_counter() - start
+    return {
+        "audios": audios,
+        "audio_seconds": audio_seconds,
+        "elapsed_seconds": elapsed,
+        "audio_seconds_per_second": audio_seconds / elapsed if elapsed else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe y alinea por lotes una carpeta de ficheros .wav.")
+    parser.add_argument("audio_folder", help="Carpeta con los .wav a transcribir")
+    parser.add_argument("--csv", default=TRANSCRIPTIONS_CSV, help="csv de transcripciones al que se añaden las filas")
+    parser.add_argument("--alignments", default=ALIGNMENTS_FILE, help="Fichero JSON lines para los alineamientos por palabra")
+    parser.add_argument("--batch-size", type=int, default=8, help="Número máximo de audios por lote")
+    parser.add_argument("--bucket-seconds", type=float, default=5, help="Diferencia máxima de duración dentro de un lote")
+    parser.add_argument("--id-interaction", type=int, default=0, help="Valor de la columna id_interaction")
+    args = parser.parse_args()
+
+    audio_files = [os.path.join(args.audio_folder, audio_file) for audio_file in os.listdir(args.audio_folder)
+                   if audio_file.lower().endswith('.wav')]
+
+    report = transcribe_files(audio_files, args.csv, args.alignments, args.bucket_seconds, args.batch_size,
+                              args.id_interaction)
+
+    print(f"{report['audios']} audios ({report['audio_seconds']:.1f}s de audio) transcritos en "
+          f"{report['elapsed_seconds']:.1f}s -> {report['audio_seconds_per_second']:.2f} segundos de audio por segundo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+decoded_audio.py
+
+Audio decodificado una única vez y compartido por todas las etapas del pipeline
+(transcripción, alineamiento, características y modelos ONNX).
+La señal se guarda en float32 mono y se remuestrea como mucho una vez por cada frecuencia pedida.
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+import librosa
+import numpy as np
+
+
+class DecodedAudio:
+    """
+    Señal mono float32 junto a su frecuencia original y sus versiones remuestreadas.
+    """
+    def __init__(self, signal, sample_rate, path=None, content_hash=None):
+        self.sample_rate = sample_rate
+        self.path = path
+        self._content_hash = content_hash
+        self._signals = {sample_rate: np.ascontiguousarray(signal, dtype=np.float32)}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Lee el fichero una sola vez: los bytes sirven tanto para decodificar como para calcular el hash.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        return cls.from_bytes(data, path=path)
+
+    @classmethod
+    def from_bytes(cls, data, path=None):
+        signal, sample_rate = librosa.load(io.BytesIO(data), sr=None, mono=True)
+        return cls(signal, sample_rate, path=path, content_hash=hashlib.sha1(data).hexdigest())
+
+    @property
+    def content_hash(self):
+        """Hash del contenido del audio (de los bytes originales si se conocen)."""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha1(self.get_signal().tobytes()).hexdigest()
+        return self._content_hash
+
+    @property
+    def duration(self):
+        return len(self._signals[self.sample_rate]) / self.sample_rate
+
+    def get_signal(self, sample_rate=None):
+        """
+        Devuelve la señal a la frecuencia pedida (por defecto la original), remuestreando solo la primera vez.
+        """
+        if sample_rate is None or sample_rate == self.sample_rate:
+            return self._signals[self.sample_rate]
+
+        with self._lock:
+            if sample_rate not in self._signals:
+                resampled = librosa.resample(self._signals[self.sample_rate], orig_sr=self.sample_rate, target_sr=sample_rate)
+                self._signals[sample_rate] = np.ascontiguousarray(resampled, dtype=np.float32)
+            return self._signals[sample_rate]
+
+
+def load_audio(audio):
+    """
+    Acepta una ruta o un DecodedAudio y devuelve siempre un DecodedAudio.
+    """
+    if isinstance(audio, (str, os.PathLike)):
+        return DecodedAudio.from_file(audio)
+    return audio
@@ -25,6 +25,20 @@ def write_json(data, filename):
 
     with open(filename, 'w') as f:
         json.dump(datos, f, indent=4)
+
+
+def extend_json(data_list, filename):
+    # Same as write_json, but the file is read and written once for the whole list
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            datos = json.load(f)
+    else:
+        datos = []
+
+    datos.extend(data_list)
+
+    with open(filename, 'w') as f:
+        json.dump(datos, f, indent=4)
         
 
 def load_csv(filename):
@@ -40,6 +54,12 @@ def write_csv(data, filename, mode):
         writer.writerow(data)
 
 
+def write_csv_rows(rows, filename, mode='a'):
+    with open(filename, mode, encoding='UTF8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+
+
 def load_obj(filename):
     with open(filename, 'rb') as f:
         return pickle.load(f)
@@ -0,0 +1,89 @@
+"""
+job_persistance.py
+
+Persistencia de los trabajos asíncronos de inferencia en una base de datos SQLite local,
+de forma que los resultados sobreviven a los reinicios del servidor.
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+class JobsDataSQLite:
+    def __init__(self, db_path='resources/jobs.db'):
+        self.db_path = db_path
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    wav_path TEXT,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # Una conexión por operación: el almacén se usa desde varios hilos
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Crea un trabajo pendiente y devuelve su id (uno nuevo si no se indica)
+    def create_job(self, filename, wav_path, job_id=None):
+        job_id = job_id or new_job_id()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, filename, wav_path, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, filename, wav_path, PENDING, now, now))
+        return job_id
+
+    # Cambia el estado de un trabajo, guardando su resultado o su error si los hay
+    def update_job(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=float) if result is not None else None, error, time.time(), job_id))
+
+    # Devuelve un trabajo como diccionario, o None si no existe
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    # Trabajos que no terminaron (por ejemplo, por un reinicio) y deben volver a lanzarse
+    def get_unfinished_jobs(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (PENDING, RUNNING)).fetchall()
+        return [dict(row) for row in rows]
@@ -3,73 +3,279 @@ Módulo principal de persistencia. Encapsulado en una clase porque almacena en u
 los datos del fichero generado, que representan los datos de análisis de la aplicación.
 """
 
+import bisect
 import csv
+import heapq
+import math
 from datetime import datetime, time
 import os
+import threading
+import numpy as np
 import pandas as pd
 from flask import current_app
 
+from app.persistance.record_columns import (MergedUserIndex, RecordChain, RecordColumns, RecordList, TimestampedRecordList,
+                                            UserIndex, is_label_column, local_seconds_of_day)
+from app.persistance.record_snapshot import load_snapshot, save_snapshot
+from app.persistance.record_ingest import RECORD_COLUMNS, RecordWAL
+
+SECONDS_PER_DAY = 24 * 3600
+WAL_SUFFIX = '.wal'
+
 # Módulo principal de persistencia. Encapsulado en una clase porque almacena en una variable 
 # los datos del fichero generado, que representan los datos de análisis de la aplicación.
 class RecordDataCSV:
-    def __init__(self, file_path='resources/estocastic_data.csv'):
+    def __init__(self, file_path='resources/estocastic_data.csv', compact_records=5000):
         self.file_path = file_path
-        self.data, self.index, self.index_timestmap = self.load_records()
+        # Registros añadidos que se acumulan antes de consolidarlos en el CSV
+        self.compact_records = compact_records
+        self.wal = RecordWAL(file_path + WAL_SUFFIX)
+        self._lock = threading.RLock()
+        self._data, self._index, self._index_timestmap = self.load_records()
+
+        # Los registros añadidos y todavía no consolidados se recuperan del WAL
+        self._reset_delta()
+        self._insert_delta(self._new_records(self.wal.replay()))
 
     def load_records(self):
+        # Si el CSV no ha cambiado desde la última carga se abre su instantánea binaria, con los índices
+        # ya construidos; si no, se lee el CSV y se guarda una nueva instantánea para el siguiente arranque
+        snapshot = load_snapshot(self.file_path)
+        if snapshot is not None:
+            self.store, indexes = snapshot
+            self._set_indexes(**indexes)
+        else:
+            self.store = self._read_csv()
+            self._set_indexes(**self._build_indexes())
+            if len(self.store):
+                try:
+                    save_snapshot(self.file_path, self.store, self._indexes())
+                except Exception as e:
+                    print(f"No se pudo guardar la instantánea de {self.file_path}: {e}")
+        self._compiled_shifts = {}
+
+        # index contiene para cada un user_id, sus registros (CLAVE, VALORES).
+        # Los registros solo se convierten a diccionarios al acceder a ellos
+        index = UserIndex(self.store, self.user_positions)
+        index_timestmap = UserIndex(self.store, self.user_timestamped, list_type=TimestampedRecordList)
+        return RecordList(self.store), index, index_timestmap
+
+    def _read_csv(self):
         try:
-            # Lee el archivo CSV completo como un DataFrame de pandas
-            df = pd.read_csv(self.file_path, delimiter=';')
-            # Convierte el DataFrame a una lista de diccionarios, similar a la salida json
-            records = df.to_dict(orient='records')
-            
-             # Crear un índice para las búsquedas rápidas (diccionario de user_id -> registro)
-            index = {}
-            index_timestmap = {}
-            for record in records:
-                user_id = record['user_id']    # índice de user_id
-                timestamp = int(record['timestamp'])   # índice por fecha para agilizar la búsqueda por fechas
-
-                if user_id not in index:
-                    index[user_id] = []
-                index[user_id].append(record)
-
-                if user_id not in index_timestmap:
-                    index_timestmap[user_id] = []
-                if timestamp:
-                    index_timestmap[user_id].append((timestamp, record))  
-
-            # index contiene para cada un user_id, sus registros (CLAVE, VALORES)
-            return records, index, index_timestmap
+            # Lee el archivo CSV completo y lo guarda por columnas, con el tipo más pequeño de cada una
+            return RecordColumns.from_dataframe(self._read_dataframe())
         except FileNotFoundError:
             print(f"Archivo no encontrado.")
-            return []
         except Exception as e:
             print(f"Ocurrió un error al leer el archivo: {e}")
-            return []
+        return RecordColumns.empty()
+
+    def _read_dataframe(self):
+        # El lector de pyarrow usa varios hilos; si no está instalado o no acepta el fichero (p. ej. líneas
+        # en blanco con espacios al final) se usa el lector por defecto de pandas
+        try:
+            return pd.read_csv(self.file_path, delimiter=';', engine='pyarrow')
+        except (ImportError, ValueError):
+            return pd.read_csv(self.file_path, delimiter=';')
+
+    def _build_indexes(self):
+        # Índice para las búsquedas rápidas (user_id -> posiciones de sus registros)
+        user_positions = self.store.group_by_user()
+
+        # Índice por fecha para agilizar la búsqueda por fechas (sin los registros sin timestamp): las
+        # posiciones de cada usuario se ordenan una vez por timestamp y se guardan también sus timestamps,
+        # de forma que un rango de fechas se resuelve con una búsqueda binaria
+        timestamps = self.store.columns.get('timestamp', np.empty(0, dtype=np.int64))
+        timestamped = self.store.group_by_user(np.flatnonzero(timestamps != 0), sort_by='timestamp') if len(timestamps) else {}
+        empty = np.empty(0, dtype=np.int32)
+        user_timestamped = {user_id: timestamped.get(user_id, empty) for user_id in user_positions}
+
+        # Índice temporal global para los filtros por turno: las posiciones de todos los registros ordenadas
+        # por timestamp, sus timestamps y su hora local en segundos desde la medianoche
+        time_order = np.argsort(timestamps, kind='stable').astype(np.int32)
+        sorted_timestamps = timestamps[time_order]
+        return {
+            'user_positions': user_positions,
+            'user_timestamped': user_timestamped,
+            'user_timestamps': {user_id: timestamps[positions] for user_id, positions in user_timestamped.items()},
+            'time_order': time_order,
+            'sorted_timestamps': sorted_timestamps,
+            'seconds_of_day': local_seconds_of_day(sorted_timestamps).astype(np.int32),
+        }
+
+    def _set_indexes(self, user_positions, user_timestamped, user_timestamps, time_order, sorted_timestamps, seconds_of_day):
+        self.user_positions = user_positions
+        self.user_timestamped = user_timestamped
+        self.user_timestamps = user_timestamps
+        self.time_order = time_order
+        self.sorted_timestamps = sorted_timestamps
+        self.seconds_of_day = seconds_of_day
+
+    def _indexes(self):
+        return {
+            'user_positions': self.user_positions,
+            'user_timestamped': self.user_timestamped,
+            'user_timestamps': self.user_timestamps,
+            'time_order': self.time_order,
+            'sorted_timestamps': self.sorted_timestamps,
+            'seconds_of_day': self.seconds_of_day,
+        }
         
+    # Vistas de todos los registros, con los añadidos después de la carga (delta) detrás de los del CSV.
+    # Sin delta son las vistas perezosas sobre las columnas; con él, solo se copian los registros del delta
+    @property
+    def data(self):
+        with self._lock:
+            if not self.delta:
+                return self._data
+            return RecordChain(self._data, [dict(record) for record in self.delta])
+
+    @property
+    def index(self):
+        """user_id -> registros, en el orden del CSV y después en el orden en que se añadieron."""
+        with self._lock:
+            if not self.delta:
+                return self._index
+            delta = {user_id: [dict(self.delta[position]) for _, position in sorted(keys, key=lambda key: key[1])]
+                     for user_id, keys in self.delta_users.items()}
+            return MergedUserIndex(self._index, delta)
+
+    @property
+    def index_timestmap(self):
+        """user_id -> (timestamp, registro), ordenados por timestamp. Igual que en el índice de los registros
+        del CSV, se excluyen los que no tienen timestamp (0)."""
+        with self._lock:
+            if not self.delta:
+                return self._index_timestmap
+            delta = {user_id: [(timestamp, dict(self.delta[position])) for timestamp, position in keys if timestamp != 0]
+                     for user_id, keys in self.delta_users.items()}
+            return MergedUserIndex(self._index_timestmap, delta, key=lambda item: item[0])
+
+    def _reset_delta(self):
+        # Registros añadidos desde la última consolidación (delta) y sus índices: listas ordenadas de
+        # (timestamp, posición en el delta), global y por usuario
+        self.delta = []
+        self.delta_times = []
+        self.delta_users = {}
+        self.delta_keys = set()
+
+    def append_records(self, records):
+        """
+        Añade registros (diccionarios con las columnas del CSV) sin volver a cargar los datos. Se escriben
+        primero en el WAL y después se insertan con una búsqueda binaria en los índices del delta, de forma
+        que las consultas los devuelven junto al resto. Los registros ya presentes (mismo usuario, timestamp
+        y audio) se ignoran. Al llegar a `compact_records` registros el delta se consolida en el CSV.
+
+        Returns:
+            Número de registros añadidos.
+        """
+        with self._lock:
+            records = self._new_records(records)
+            if not records:
+                return 0
+            self.wal.append(records)
+            self._insert_delta(records)
+            if len(self.delta) >= self.compact_records:
+                self.compact()
+            return len(records)
+
+    def compact(self):
+        """
+        Consolida el delta: lo añade al CSV, vuelve a cargar los datos (y su instantánea) y vacía el WAL.
+        """
+        with self._lock:
+            if not self.delta:
+                return
+            self._append_to_csv(self.delta)
+            self._data, self._index, self._index_timestmap = self.load_records()
+            self.wal.clear()
+            self._reset_delta()
+
+    def _record_key(self, record):
+        return int(record['user_id']), int(record['timestamp']), record.get('file_name')
+
+    def _new_records(self, records):
+        """Registros que no están ni en el CSV ni en el delta."""
+        new_records, keys = [], set()
+        for record in records:
+            key = self._record_key(record)
+            if key not in keys and key not in self.delta_keys and not self._stored(*key):
+                keys.add(key)
+                new_records.append(record)
+        return new_records
+
+    def _stored(self, user_id, timestamp, file_name):
+        positions = self.user_timestamped.get(user_id)
+        if positions is None:
+            return False
+        timestamps = self.user_timestamps[user_id]
+        first, last = np.searchsorted(timestamps, [timestamp, timestamp + 1])
+        if 'file_name' not in self.store.columns:
+            return first < last
+        return file_name in self.store.column_values('file_name', positions[first:last])
+
+    def _insert_delta(self, records):
+        for record in records:
+            key = (int(record['timestamp']), len(self.delta))
+            self.delta.append(record)
+            self.delta_keys.add(self._record_key(record))
+            bisect.insort(self.delta_times, key)
+            bisect.insort(self.delta_users.setdefault(int(record['user_id']), []), key)
+
+    def _delta_range(self, keys, start, end):
+        """Claves (timestamp, posición) del delta con start <= timestamp <= end."""
+        first = bisect.bisect_left(keys, (start, -1))
+        last = bisect.bisect_left(keys, (end + 1, -1))
+        return keys[first:last]
+
+    def _merge_delta(self, records, keys):
+        # Ambas listas están ordenadas por timestamp; a igualdad, primero los registros del CSV
+        if not keys:
+            return records
+        delta = [dict(self.delta[position]) for _, position in keys]
+        return list(heapq.merge(records, delta, key=lambda record: record['timestamp']))
+
+    def _append_to_csv(self, records):
+        """Añade los registros al final del CSV con sus mismas columnas y lo sincroniza con el disco."""
+        columns = list(self.store.columns) or RECORD_COLUMNS
+        new_file = not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0
+        if not new_file:
+            with open(self.file_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                ends_with_newline = f.read(1) == b'\n'
+
+        with open(self.file_path, 'a', encoding='utf-8', newline='') as f:
+            if not new_file and not ends_with_newline:
+                f.write('\n')
+            writer = csv.writer(f, delimiter=';')
+            if new_file:
+                writer.writerow(columns)
+            writer.writerows([['' if record.get(name) is None else record.get(name) for name in columns]
+                              for record in records])
+            f.flush()
+            os.fsync(f.fileno())
+
     def get_user_ids(self):
-        return sorted(set(record['user_id'] for record in self.data if 'user_id' in record))
+        with self._lock:
+            return sorted(set(self.user_positions).union(self.delta_users))
     
     # Función que dado un user_id y un rango de fechas devuelve los datos asociados.
     # Proceso agilizado por la indexación de la función anterior.
     def filter_records_by_user_date(self, user_id,start_date, end_date):
-        filtered_records = []
-        
-        # Verificamos si el user_id existe en el índice
-        if user_id in self.index_timestmap:
-            user_records = self.index_timestmap[user_id]
-            
-            for timestamp, record in user_records:
-                record_date = datetime.fromtimestamp(timestamp)  # Convertir el timestamp a un objeto datetime
-
-                # Filtrar los registros por el rango de fechas
-                if start_date <= record_date <= end_date:
-                    print(record_date)
-                    filtered_records.append(record)
-        # Ordenar los registros por fecha de la más antigua a la más nueva
-
-        return filtered_records
+        start, end = math.ceil(start_date.timestamp()), math.floor(end_date.timestamp())
+        with self._lock:
+            records = []
+            # Verificamos si el user_id existe en el índice
+            if user_id in self.user_timestamped:
+                # Filtrar los registros por el rango de fechas con una búsqueda binaria sobre sus timestamps
+                # ordenados: el resultado sale ya ordenado de la más antigua a la más nueva
+                timestamps = self.user_timestamps[user_id]
+                first = np.searchsorted(timestamps, start, side='left')
+                last = np.searchsorted(timestamps, end, side='right')
+                records = self.store.records(self.user_timestamped[user_id][first:last])
+
+            # Registros añadidos después de la carga
+            return self._merge_delta(records, self._delta_range(self.delta_users.get(user_id, []), start, end))
     
     # Función que dado un turno y un rango de fechas devuelve los datos asociados.
     def filter_by_date_and_shift(self, start_date, end_date, shift):
@@ -83,39 +289,54 @@ class RecordDataCSV:
         if shift not in shifts:
             raise ValueError(f"No existe ese turno")
         
-        # shift_start, shift_end = shifts[shift]
-        shift_start, shift_end = [self._parse_time(t) for t in shifts[shift]]
-        filtered_records = []
-        
-        for record in self.data:
-            record_datetime = datetime.fromtimestamp(record['timestamp'])
-            
-            # Comprobación del rango de fechas
-            if start_date <= record_datetime <= end_date:
-                record_time = record_datetime.time()
-                
-                # Comprobación de que se encuentra en la franja horaria del turno
-                if shift == "noche":
-                    if (record_time >= shift_start and record_time < time(23, 59, 59)) or (record_time >= time(0, 0) and record_time < shift_end):
-                        filtered_records.append(record)
-                else:
-                    if shift_start <= record_time < shift_end:
-                        filtered_records.append(record)
-        
-        return filtered_records
+        intervals = self._shift_intervals(tuple(shifts[shift]))
+
+        start, end = math.ceil(start_date.timestamp()), math.floor(end_date.timestamp())
+        with self._lock:
+            # Comprobación del rango de fechas: una búsqueda binaria sobre todos los timestamps ordenados
+            first = np.searchsorted(self.sorted_timestamps, start, side='left')
+            last = np.searchsorted(self.sorted_timestamps, end, side='right')
+            records = self.store.records(self.time_order[first:last][self._in_shift(self.seconds_of_day[first:last], intervals)])
+
+            # Registros añadidos después de la carga
+            keys = self._delta_range(self.delta_times, start, end)
+            delta_time = local_seconds_of_day(np.array([timestamp for timestamp, _ in keys], dtype=np.int64))
+            in_shift = self._in_shift(delta_time, intervals)
+            return self._merge_delta(records, [key for key, selected in zip(keys, in_shift) if selected])
+
+    def _in_shift(self, record_time, intervals):
+        """Comprobación de que cada hora del día se encuentra en la franja horaria del turno."""
+        in_shift = np.zeros(len(record_time), dtype=bool)
+        for interval_start, interval_end in intervals:
+            in_shift |= (interval_start <= record_time) & (record_time < interval_end)
+        return in_shift
+
+    def _shift_intervals(self, bounds):
+        """
+        Convierte un turno ["hh:mm", "hh:mm"] de la configuración en intervalos [inicio, fin) de segundos
+        desde la medianoche. Los turnos que pasan por la medianoche (p. ej. la noche) se dividen en dos.
+        Cada turno se compila una sola vez.
+        """
+        if bounds not in self._compiled_shifts:
+            shift_start, shift_end = [self._seconds_of_day(self._parse_time(t)) for t in bounds]
+            if shift_start <= shift_end:
+                self._compiled_shifts[bounds] = [(shift_start, shift_end)]
+            else:
+                self._compiled_shifts[bounds] = [(shift_start, SECONDS_PER_DAY), (0, shift_end)]
+        return self._compiled_shifts[bounds]
     
     def _parse_time(self, time_str):
         """Convierte una cadena de tiempo en un objeto `time`."""
         hours, minutes = map(int, time_str.split(":"))
         return time(hours, minutes)
+
+    def _seconds_of_day(self, value):
+        """Segundos desde la medianoche de un objeto `time`."""
+        return value.hour * 3600 + value.minute * 60 + value.second
     
     def get_emotions(self):
-        emotions = set()  
-
-        for record in self.data:
-            emotions.add(record.get('Emotion_1_label', '').strip())
-            emotions.add(record.get('Emotion_2_label', '').strip())
-            emotions.add(record.get('Emotion_3_label', '').strip())
-            
-        return sorted(list(emotions))
+        with self._lock:
+            labels = set(self.store.used_labels())
+            labels.update(value for record in self.delta for name, value in record.items() if is_label_column(name) and value)
+        return sorted(set(label.strip() for label in labels))
     
@@ -0,0 +1,272 @@
+"""
+record_columns.py
+
+Almacenamiento columnar en memoria de los registros de análisis emocional.
+Cada columna del CSV se guarda en un array de numpy con el tipo más pequeño que la representa
+(timestamps int64, user_id int32, etiquetas de emoción como códigos uint8 de una categoría común
+y medias, desviaciones y valores VAD en float32). Los registros solo se convierten en diccionarios
+cuando se serializan, a través de las vistas perezosas RecordList y UserIndex.
+"""
+
+import heapq
+import itertools
+import time
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Código de las etiquetas que faltan en el CSV
+MISSING_LABEL = 255
+
+# Registros que se convierten a diccionarios de una vez al recorrer una vista
+MATERIALIZE_BATCH = 4096
+
+INTEGER_COLUMNS = {'timestamp': np.int64, 'user_id': np.int32}
+FLOAT_COLUMNS = ('_mean', '_std', 'valence', 'arousal', 'dominance')
+
+# Cifras significativas de los valores float32 al convertirlos a float (las que float32 garantiza)
+FLOAT_DIGITS = 7
+
+
+def is_label_column(name):
+    return name.startswith('Emotion_') and name.endswith('_label')
+
+
+def float32_to_python(values):
+    """
+    Convierte un array float32 en floats de Python redondeados a FLOAT_DIGITS cifras significativas,
+    para que se serialicen como en el CSV (0.61 y no 0.6100000143051147).
+    """
+    values = values.astype(np.float64)
+    finite = np.isfinite(values) & (values != 0)
+    magnitude = np.floor(np.log10(np.abs(values), where=finite, out=np.zeros_like(values)))
+    scale = 10.0 ** (FLOAT_DIGITS - 1 - magnitude)
+    return np.where(finite, np.round(values * scale) / scale, values).tolist()
+
+
+def local_seconds_of_day(timestamps):
+    """
+    Segundos desde la medianoche, en hora local, de un array de timestamps. El desfase horario se
+    calcula una vez por cada hora distinta (los cambios de hora se producen en horas en punto).
+    """
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype=np.int64)
+    return (timestamps + offsets[inverse]) % 86400
+
+
+class RecordColumns:
+    """
+    Columnas de los registros. Las etiquetas de las distintas columnas de emoción comparten
+    una misma lista de categorías (`labels`).
+    """
+    def __init__(self, columns, labels, nulls=None):
+        self.columns = columns     # nombre -> array, en el orden del CSV
+        self.labels = labels       # código -> etiqueta
+        self.nulls = nulls or {}   # nombre -> máscara de valores vacíos de las columnas de texto que los tienen
+
+    @classmethod
+    def from_dataframe(cls, df):
+        label_columns = [name for name in df.columns if is_label_column(name)]
+        labels = sorted(set().union(*(df[name].dropna().unique() for name in label_columns))) if label_columns else []
+        label_codes = {label: code for code, label in enumerate(labels)}
+        if len(labels) >= MISSING_LABEL:
+            raise ValueError(f"Demasiadas etiquetas de emoción distintas: {len(labels)}")
+
+        columns, nulls = {}, {}
+        for name in df.columns:
+            values = df[name]
+            if name in INTEGER_COLUMNS:
+                columns[name] = values.to_numpy(dtype=INTEGER_COLUMNS[name])
+            elif name in label_columns:
+                columns[name] = values.map(label_codes).fillna(MISSING_LABEL).to_numpy(dtype=np.uint8)
+            elif name.endswith(FLOAT_COLUMNS) or pd.api.types.is_float_dtype(values):
+                columns[name] = values.to_numpy(dtype=np.float32)
+            elif pd.api.types.is_integer_dtype(values):
+                columns[name] = values.to_numpy(dtype=np.int64)
+            else:
+                # Texto (p. ej. file_name) en UTF-8 de ancho fijo en lugar de un objeto str por fila;
+                # los valores vacíos se guardan como b'' y se marcan en una máscara aparte
+                missing = values.isna().to_numpy()
+                text = values.where(~missing, '').astype(str).str.encode('utf-8')
+                columns[name] = np.array(text.tolist(), dtype=np.bytes_)
+                if missing.any():
+                    nulls[name] = missing
+        return cls(columns, labels, nulls)
+
+    @classmethod
+    def empty(cls):
+        return cls({}, [])
+
+    def __len__(self):
+        return len(self.columns['timestamp']) if 'timestamp' in self.columns else 0
+
+    def nbytes(self):
+        """Memoria ocupada por los arrays."""
+        return sum(values.nbytes for values in self.columns.values()) + sum(mask.nbytes for mask in self.nulls.values())
+
+    def column_values(self, name, indices):
+        values = self.columns[name][indices]
+        if is_label_column(name):
+            labels = np.array(self.labels + [None], dtype=object)
+            return labels[np.minimum(values, len(self.labels))].tolist()
+        if values.dtype.kind == 'S':
+            if name in self.nulls:
+                return [None if missing else value.decode('utf-8')
+                        for value, missing in zip(values.tolist(), self.nulls[name][indices].tolist())]
+            return [value.decode('utf-8') for value in values.tolist()]
+        if values.dtype == np.float32:
+            return float32_to_python(values)
+        return values.tolist()
+
+    def records(self, indices):
+        """
+        Convierte en diccionarios los registros de las posiciones indicadas.
+        """
+        names = list(self.columns)
+        values = [self.column_values(name, indices) for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def used_labels(self):
+        """Etiquetas que aparecen en alguna de las columnas de emoción."""
+        codes = set()
+        for name in self.columns:
+            if is_label_column(name):
+                codes.update(np.unique(self.columns[name]).tolist())
+        return [self.labels[code] for code in sorted(codes) if code < len(self.labels)]
+
+    def group_by_user(self, positions=None, sort_by=None):
+        """
+        Posiciones de los registros de cada user_id (de entre `positions`, por defecto todos), en el
+        orden del CSV o, si se indica `sort_by`, ordenadas por esa columna.
+        """
+        if 'user_id' not in self.columns:
+            return {}
+        user_ids = self.columns['user_id']
+        positions = np.arange(len(user_ids)) if positions is None else positions
+        keys = (user_ids[positions],) if sort_by is None else (self.columns[sort_by][positions], user_ids[positions])
+        # lexsort es estable: a igualdad de clave se mantiene el orden del CSV
+        order = positions[np.lexsort(keys)].astype(np.int32 if len(user_ids) < 2 ** 31 else np.int64)
+        users, starts = np.unique(user_ids[order], return_index=True)
+        return dict(zip(users.tolist(), np.split(order, starts[1:])))
+
+
+class RecordList(Sequence):
+    """
+    Lista de solo lectura de registros (diccionarios) que se crean al acceder a ellos.
+    """
+    def __init__(self, store, indices=None):
+        self.store = store
+        self.indices = np.arange(len(store)) if indices is None else indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return RecordList(self.store, self.indices[position])
+        return self.store.records(self.indices[[position]])[0]
+
+    def __iter__(self):
+        for start in range(0, len(self.indices), MATERIALIZE_BATCH):
+            yield from self.store.records(self.indices[start:start + MATERIALIZE_BATCH])
+
+    def to_list(self):
+        return self.store.records(self.indices)
+
+
+class TimestampedRecordList(RecordList):
+    """
+    Igual que RecordList, pero cada elemento es la tupla (timestamp, registro).
+    """
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return TimestampedRecordList(self.store, self.indices[position])
+        record = super().__getitem__(position)
+        return int(record['timestamp']), record
+
+    def __iter__(self):
+        for record in super().__iter__():
+            yield int(record['timestamp']), record
+
+
+class UserIndex(Mapping):
+    """
+    Índice user_id -> registros del usuario, sin duplicar los registros.
+    """
+    def __init__(self, store, groups, list_type=RecordList):
+        self.store = store
+        self.groups = groups  # user_id -> posiciones
+        self.list_type = list_type
+
+    def __getitem__(self, user_id):
+        return self.list_type(self.store, self.groups[user_id])
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __contains__(self, user_id):
+        return user_id in self.groups
+
+
+class RecordChain(Sequence):
+    """
+    Concatenación de solo lectura de varias listas de registros, p. ej. los del CSV seguidos de los
+    añadidos en memoria.
+    """
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        for part in self.parts:
+            if 0 <= position < len(part):
+                return part[position]
+            position -= len(part)
+        raise IndexError(position)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.parts)
+
+    def to_list(self):
+        return [record for part in self.parts for record in (part.to_list() if hasattr(part, 'to_list') else part)]
+
+
+class MergedUserIndex(Mapping):
+    """
+    Índice user_id -> registros que une un UserIndex con registros añadidos en memoria (`extra`,
+    user_id -> lista). Con `key`, ambas listas están ordenadas por esa clave y se mezclan en orden;
+    sin ella, los añadidos van detrás.
+    """
+    def __init__(self, index, extra, key=None):
+        self.index = index
+        self.extra = extra
+        self.key = key
+
+    def __getitem__(self, user_id):
+        extra = self.extra.get(user_id)
+        if extra is None:
+            return self.index[user_id]
+        records = self.index[user_id] if user_id in self.index else []
+        if self.key is None:
+            return RecordChain(records, extra)
+        return list(heapq.merge(records, extra, key=self.key))
+
+    def __iter__(self):
+        yield from self.index
+        yield from (user_id for user_id in self.extra if user_id not in self.index)
+
+    def __len__(self):
+        return len(self.index) + sum(user_id not in self.index for user_id in self.extra)
+
+    def __contains__(self, user_id):
+        return user_id in self.index or user_id in self.extra
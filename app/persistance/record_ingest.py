@@ -0,0 +1,220 @@
+"""
+record_ingest.py
+
+Ingesta incremental de los resultados de inferencia en el almacén de registros.
+Los csv de salida de la inferencia (data/output-predict-emotions/*-output.csv, separados por comas) se
+siguen desde la última posición leída y cada fila nueva se convierte al esquema de registros y se añade
+al RecordDataCSV en memoria, que la escribe antes en su registro de escritura anticipada (WAL) para no
+perderla si el proceso se cae antes de consolidarla en su CSV.
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+
+import numpy as np
+
+from app.persistance.record_columns import is_label_column
+
+# Columnas del CSV de registros (resources/estocastic_data.csv) si todavía no existe
+RECORD_COLUMNS = ['file_name', 'timestamp', 'user_id',
+                  'Emotion_1_mean', 'Emotion_1_std', 'Emotion_1_label',
+                  'Emotion_2_mean', 'Emotion_2_std', 'Emotion_2_label',
+                  'Emotion_3_mean', 'Emotion_3_std', 'Emotion_3_label',
+                  'arousal', 'valence', 'dominance']
+
+OUTPUT_FOLDER = 'data/output-predict-emotions'
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def output_row_to_record(row, columns=RECORD_COLUMNS):
+    """
+    Convierte una fila de un csv de salida de la inferencia (diccionario columna -> texto) en un registro.
+    El timestamp y el user_id se toman de sus columnas o, si están vacías, del nombre del audio
+    (<timestamp>_<worker>.wav).
+
+    Returns:
+        El registro, o None si no se puede saber a qué usuario y momento corresponde.
+    """
+    name = os.path.basename((row.get('file_name') or '').replace('\\', '/')).removesuffix('.wav')
+    file_timestamp, _, file_worker = name.partition('_')
+    timestamp = parse_int(row.get('timestamp')) or parse_int(file_timestamp)
+    user_id = parse_int(row.get('user_id'))
+    if user_id is None:
+        user_id = parse_int(file_worker)
+    if not timestamp or user_id is None:
+        return None
+
+    record = {}
+    for column in columns:
+        value = row.get(column)
+        if column == 'timestamp':
+            record[column] = timestamp
+        elif column == 'user_id':
+            record[column] = user_id
+        elif value in (None, ''):
+            record[column] = None
+        elif is_label_column(column) or column == 'file_name':
+            record[column] = value.strip()
+        else:
+            # Misma precisión que las columnas float32 del almacén
+            try:
+                record[column] = float(np.float32(value))
+            except ValueError:
+                record[column] = value
+    return record
+
+
+class RecordWAL:
+    """
+    Registro de escritura anticipada: un fichero JSON Lines con los registros añadidos que todavía
+    no se han consolidado en el CSV. Cada escritura se sincroniza con el disco (fsync) antes de volver.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, records):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay(self):
+        """Registros pendientes del WAL. Una última línea incompleta (escritura interrumpida) se descarta."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    print(f"Línea del WAL {self.path} descartada: {line[:80]!r}")
+        return records
+
+    def clear(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class OutputCSVFollower:
+    """
+    Hilo que sigue los csv de salida de la inferencia, como `tail -f`, y entrega las filas nuevas
+    (ya convertidas en registros) a `on_records`. La posición leída de cada fichero se guarda en
+    `state_path` después de entregarlas, de forma que tras un reinicio se continúa donde se quedó.
+    Los ficheros que ya existían la primera vez que se siguen se empiezan a leer desde su final.
+
+    `source` es una lista de ficheros o una carpeta; en ese caso sus csv de salida se buscan de nuevo en
+    cada lectura (la carpeta puede no existir todavía) y los que aparecen después se leen desde el principio.
+    """
+    def __init__(self, source, on_records, state_path='data/cache/ingestion_offsets.json', interval=2.0):
+        self.folder = source if isinstance(source, str) else None
+        self.paths = output_csvs(self.folder) if self.folder is not None else list(source)
+        self.on_records = on_records    # función que recibe la lista de registros nuevos
+        self.state_path = state_path
+        self.interval = interval
+        self.offsets = self._load_offsets()
+        for path in self.paths:
+            self.offsets.setdefault(path, os.path.getsize(path) if os.path.exists(path) else 0)
+        self.skipped = 0                # filas sin usuario o timestamp válidos
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='record-ingest', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error al leer los resultados de inferencia: {e}")
+            self._stop.wait(self.interval)
+
+    def poll(self):
+        """
+        Lee las líneas completas añadidas a cada fichero desde la última vez.
+
+        Returns:
+            Número de registros entregados.
+        """
+        delivered = 0
+        if self.folder is not None:
+            for path in output_csvs(self.folder):
+                if path not in self.offsets:
+                    self.offsets[path] = 0
+                if path not in self.paths:
+                    self.paths.append(path)
+
+        for path in self.paths:
+            if not os.path.exists(path):
+                continue
+            offset = self.offsets.get(path, 0)
+            size = os.path.getsize(path)
+            if size < offset:
+                # Fichero truncado o sustituido: se vuelve a leer desde el principio
+                offset = 0
+
+            with open(path, 'rb') as f:
+                header = f.readline()
+                if not header.endswith(b'\n'):
+                    continue
+                f.seek(max(offset, len(header)))
+                data = f.read(size - f.tell())
+            # Solo líneas completas: la última puede estar escribiéndose todavía
+            data = data[:data.rfind(b'\n') + 1]
+            if data:
+                reader = csv.DictReader(io.StringIO(data.decode('utf-8')),
+                                        fieldnames=next(csv.reader([header.decode('utf-8-sig')])))
+                records = [output_row_to_record(row) for row in reader]
+                self.skipped += sum(record is None for record in records)
+                records = [record for record in records if record is not None]
+                if records:
+                    self.on_records(records)
+                    delivered += len(records)
+            offset = max(offset, len(header)) + len(data)
+            if self.offsets.get(path) != offset:
+                self.offsets[path] = offset
+                self._save_offsets()
+        return delivered
+
+    def _load_offsets(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_offsets(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.offsets, f)
+        os.replace(tmp_path, self.state_path)
+
+
+def output_csvs(folder=OUTPUT_FOLDER):
+    """csv de salida de la inferencia: volcado-output.csv y <modelo>-output.csv."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('-output.csv'))
@@ -0,0 +1,119 @@
+"""
+record_snapshot.py
+
+Instantánea binaria de un CSV de registros junto a sus índices, para no volver a leer el CSV en cada
+arranque o cambio de fuente de datos. Se guarda en la carpeta `<csv>.snapshot/` con un fichero .npy por
+columna y por índice y un meta.json con el tamaño y la fecha de modificación del CSV: si cambian, la
+instantánea se descarta y se vuelve a generar. Los arrays se abren con memory-map, así que cargarla
+cuesta milisegundos y las páginas solo se leen del disco al usarse. Ningún fichero usa pickle: el texto con
+valores vacíos se guarda como bytes de ancho fijo más una máscara de vacíos.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from app.persistance.record_columns import RecordColumns
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_SUFFIX = '.snapshot'
+META_FILE = 'meta.json'
+
+
+def snapshot_path(csv_path):
+    return csv_path + SNAPSHOT_SUFFIX
+
+
+def source_signature(csv_path):
+    """
+    Identifica la versión del CSV (tamaño y fecha de modificación) y la zona horaria con la que se
+    calcularon las horas locales de los registros.
+    """
+    stat = os.stat(csv_path)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "timezone": [list(time.tzname), time.timezone, time.altzone],
+    }
+
+
+def save_snapshot(csv_path, store, indexes):
+    """
+    Guarda las columnas y los índices. Los índices son arrays o diccionarios user_id -> array, que se
+    guardan concatenados junto a sus claves y desplazamientos.
+    """
+    folder = snapshot_path(csv_path)
+    tmp_folder = folder + '.tmp'
+    shutil.rmtree(tmp_folder, ignore_errors=True)
+    os.makedirs(tmp_folder)
+
+    meta = dict(source_signature(csv_path), columns=list(store.columns), labels=store.labels, indexes={},
+                nulls=list(store.nulls))
+    for i, (name, values) in enumerate(store.columns.items()):
+        np.save(os.path.join(tmp_folder, f'column_{i}.npy'), values, allow_pickle=False)
+        if name in store.nulls:
+            np.save(os.path.join(tmp_folder, f'column_{i}.nulls.npy'), store.nulls[name], allow_pickle=False)
+
+    for name, index in indexes.items():
+        if isinstance(index, dict):
+            keys = np.array(list(index), dtype=np.int64)
+            lengths = [len(values) for values in index.values()]
+            offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+            values = np.concatenate(list(index.values())) if index else np.empty(0, dtype=np.int32)
+            np.save(os.path.join(tmp_folder, f'{name}.keys.npy'), keys)
+            np.save(os.path.join(tmp_folder, f'{name}.offsets.npy'), offsets)
+            np.save(os.path.join(tmp_folder, f'{name}.npy'), values)
+            meta["indexes"][name] = "grouped"
+        else:
+            np.save(os.path.join(tmp_folder, f'{name}.npy'), index)
+            meta["indexes"][name] = "array"
+
+    # meta.json se escribe el último: una carpeta sin él no es una instantánea válida
+    with open(os.path.join(tmp_folder, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp_folder, folder)
+
+
+def load_snapshot(csv_path):
+    """
+    Abre la instantánea del CSV si existe y corresponde a su versión actual.
+
+    Returns:
+        (RecordColumns, índices) o None si hay que volver a leer el CSV.
+    """
+    folder = snapshot_path(csv_path)
+    try:
+        with open(os.path.join(folder, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        signature = source_signature(csv_path)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(key) != value for key, value in signature.items()):
+        return None
+
+    def load(filename):
+        return np.load(os.path.join(folder, filename), mmap_mode='r', allow_pickle=False)
+
+    try:
+        columns = {name: load(f'column_{i}.npy') for i, name in enumerate(meta["columns"])}
+        nulls = {name: load(f'column_{i}.nulls.npy') for i, name in enumerate(meta["columns"]) if name in meta["nulls"]}
+        indexes = {}
+        for name, kind in meta["indexes"].items():
+            values = load(f'{name}.npy')
+            if kind == "grouped":
+                keys = load(f'{name}.keys.npy').tolist()
+                offsets = load(f'{name}.offsets.npy')
+                indexes[name] = dict(zip(keys, np.split(values, offsets[1:-1])))
+            else:
+                indexes[name] = values
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Instantánea de {csv_path} no válida, se vuelve a leer el CSV: {e}")
+        return None
+
+    return RecordColumns(columns, meta["labels"], nulls), indexes
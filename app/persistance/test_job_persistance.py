@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import pytest
+
+from job_persistance import DONE, FAILED, PENDING, RUNNING, JobsDataSQLite
+
+
+@pytest.fixture
+def jobs_store():
+    """Crea un almacén de trabajos en una carpeta temporal."""
+    folder = tempfile.mkdtemp()
+    return JobsDataSQLite(db_path=os.path.join(folder, 'jobs.db'))
+
+def test_create_and_get_job(jobs_store):
+    """Un trabajo nuevo queda pendiente y sin resultado."""
+    job_id = jobs_store.create_job('audio.wav', 'resources/audios/audio.wav')
+    job = jobs_store.get_job(job_id)
+
+    assert job['status'] == PENDING
+    assert job['filename'] == 'audio.wav'
+    assert job['result'] is None
+
+def test_update_job_result(jobs_store):
+    """El resultado se guarda como JSON y se recupera como diccionario."""
+    job_id = jobs_store.create_job('audio.wav', 'resources/audios/audio.wav')
+    jobs_store.update_job(job_id, DONE, result={'emotions': {'happiness': 0.7}})
+
+    job = jobs_store.get_job(job_id)
+    assert job['status'] == DONE
+    assert job['result'] == {'emotions': {'happiness': 0.7}}
+
+def test_unfinished_jobs_survive_restart(jobs_store):
+    """Tras reabrir la base de datos siguen disponibles los trabajos sin terminar."""
+    pending_id = jobs_store.create_job('a.wav', 'a.wav')
+    running_id = jobs_store.create_job('b.wav', 'b.wav')
+    failed_id = jobs_store.create_job('c.wav', 'c.wav')
+    jobs_store.update_job(running_id, RUNNING)
+    jobs_store.update_job(failed_id, FAILED, error='boom')
+
+    reopened = JobsDataSQLite(db_path=jobs_store.db_path)
+    unfinished = [job['id'] for job in reopened.get_unfinished_jobs()]
+
+    assert unfinished == [pending_id, running_id]
+    assert reopened.get_job(failed_id)['error'] == 'boom'
+
+def test_get_missing_job(jobs_store):
+    assert jobs_store.get_job('unknown') is None
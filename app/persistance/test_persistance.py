@@ -1,10 +1,16 @@
 import pytest
+import numpy as np
 import pandas as pd
+from flask import Flask
 import tempfile
+import json
 import os
+import shutil
 from datetime import datetime
 
 from persistance import RecordDataCSV
+from record_snapshot import snapshot_path
+from record_ingest import OutputCSVFollower
 
 
 @pytest.fixture
@@ -52,8 +58,237 @@ def test_get_emotions(record_data_instance):
     expected_emotions = ["angry", "happy", "neutral", "sad"]
     assert set(emotions) == set(expected_emotions)  # Las emociones deben coincidir
 
+def test_columnar_store(record_data_instance):
+    """Los registros se guardan por columnas con tipos compactos y se crean al acceder a ellos."""
+    columns = record_data_instance.store.columns
+    assert columns['timestamp'].dtype == np.int64
+    assert columns['user_id'].dtype == np.int32
+    assert columns['Emotion_1_label'].dtype == np.uint8
+
+    assert record_data_instance.data[2] == {"user_id": 2, "timestamp": 1706726400, "Emotion_1_label": "angry",
+                                            "Emotion_2_label": "neutral", "Emotion_3_label": "happy"}
+    assert [record['timestamp'] for record in record_data_instance.index[1]] == [1706640000, 1706726400]
+    assert [timestamp for timestamp, _ in record_data_instance.index_timestmap[2]] == [1706726400, 1706812800]
+    assert record_data_instance.index.get(3, []) == []
+    assert record_data_instance.get_user_ids() == [1, 2]
+
+def test_float_columns_serialize_like_the_csv(tmp_path):
+    """Los valores float32 se devuelven con las cifras del CSV, sin el ruido de la conversión a float."""
+    csv_path = tmp_path / "records.csv"
+    csv_path.write_text("user_id;timestamp;Emotion_1_mean;valence\n1;1706640000;0.61;-0.000123\n1;1706640001;0;12.5\n")
+    records = RecordDataCSV(file_path=str(csv_path))
+    assert records.store.columns['Emotion_1_mean'].dtype == np.float32
+
+    assert [(record['Emotion_1_mean'], record['valence']) for record in records.data] == [(0.61, -0.000123), (0.0, 12.5)]
+    assert json.dumps(records.index[1].to_list()[0]["Emotion_1_mean"]) == "0.61"
+
+
+def test_filter_records_by_user_date_sorted_by_time(tmp_path):
+    """El rango de fechas se resuelve sobre los timestamps ordenados y el resultado sale ordenado."""
+    csv_file = tmp_path / "unsorted.csv"
+    csv_file.write_text("user_id;timestamp;Emotion_1_label\n"
+                        "1;1706812800;sad\n1;1706640000;happy\n2;1706700000;angry\n1;0;neutral\n1;1706726400;sad\n")
+    records = RecordDataCSV(file_path=str(csv_file))
+
+    filtered = records.filter_records_by_user_date(1, datetime.fromtimestamp(1706640000), datetime.fromtimestamp(1706726400))
+    assert [record['timestamp'] for record in filtered] == [1706640000, 1706726400]
+    assert [timestamp for timestamp, _ in records.index_timestmap[1]] == [1706640000, 1706726400, 1706812800]
+    assert records.filter_records_by_user_date(1, datetime(2030, 1, 1), datetime(2031, 1, 1)) == []
+    assert records.filter_records_by_user_date(3, datetime(2024, 1, 1), datetime(2025, 1, 1)) == []
+
+def test_filter_by_night_shift(record_data_instance):
+    """El turno de noche incluye las horas anteriores a su fin del día siguiente."""
+    app = Flask(__name__)
+    app.config['SHIFTS'] = {"noche": ["22:00", "06:00"], "mañana": ["06:00", "14:00"]}
+    timestamps = record_data_instance.store.columns['timestamp']
+    with app.app_context():
+        night = record_data_instance.filter_by_date_and_shift(datetime(2024, 1, 30), datetime(2024, 2, 2), "noche")
+        morning = record_data_instance.filter_by_date_and_shift(datetime(2024, 1, 30), datetime(2024, 2, 2), "mañana")
+
+    expected_night = [int(ts) for ts in timestamps if datetime(2024, 1, 30) <= datetime.fromtimestamp(ts) <= datetime(2024, 2, 2)
+                      and (datetime.fromtimestamp(ts).hour >= 22 or datetime.fromtimestamp(ts).hour < 6)]
+    assert [record['timestamp'] for record in night] == expected_night
+    assert len(night) + len(morning) <= 4
+
+def test_shift_intervals(record_data_instance):
+    """Los turnos se compilan a intervalos de segundos del día; los que cruzan la medianoche, en dos."""
+    assert record_data_instance._shift_intervals(("06:00", "14:00")) == [(6 * 3600, 14 * 3600)]
+    assert record_data_instance._shift_intervals(("22:00", "06:00")) == [(22 * 3600, 24 * 3600), (0, 6 * 3600)]
+
+def test_snapshot_reused_until_csv_changes(tmp_path, capsys):
+    """La segunda carga abre la instantánea binaria; si el CSV cambia se vuelve a leer."""
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("user_id;timestamp;file_name;Emotion_1_label\n"
+                        "1;1706640000;a.wav;happy\n2;1706726400;b.wav;sad\n1;1706700000;c.wav;neutral\n")
+    first = RecordDataCSV(file_path=str(csv_file))
+    assert os.path.exists(snapshot_path(str(csv_file)) + "/meta.json")
+
+    second = RecordDataCSV(file_path=str(csv_file))
+    assert isinstance(second.store.columns['timestamp'], np.memmap)
+    assert second.data.to_list() == first.data.to_list()
+    assert [ts for ts, _ in second.index_timestmap[1]] == [1706640000, 1706700000]
+    assert second.get_user_ids() == [1, 2]
+    assert second.get_emotions() == ["happy", "neutral", "sad"]
+
+    with open(csv_file, "a") as f:
+        f.write("3;1706800000;d.wav;angry\n")
+    third = RecordDataCSV(file_path=str(csv_file))
+    assert not isinstance(third.store.columns['timestamp'], np.memmap)
+    assert third.get_user_ids() == [1, 2, 3]
+    assert RecordDataCSV(file_path=str(csv_file)).data[3]["file_name"] == "d.wav"
+    assert "instantánea" not in capsys.readouterr().out
+
+def test_snapshot_nullable_text_without_pickle(tmp_path):
+    """El texto con valores vacíos se guarda como bytes y una máscara, y la instantánea se abre sin pickle."""
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("user_id;timestamp;file_name;comment\n"
+                        "1;1706640000;a.wav;hola\n2;1706726400;b.wav;\n1;1706700000;c.wav;adiós\n")
+    first = RecordDataCSV(file_path=str(csv_file))
+    assert [record["comment"] for record in first.data] == ["hola", None, "adiós"]
+
+    folder = snapshot_path(str(csv_file))
+    for filename in os.listdir(folder):
+        if filename.endswith(".npy"):
+            np.load(os.path.join(folder, filename), allow_pickle=False)
+
+    second = RecordDataCSV(file_path=str(csv_file))
+    assert isinstance(second.store.columns["comment"], np.memmap)
+    assert isinstance(second.store.nulls["comment"], np.memmap)
+    assert second.data.to_list() == first.data.to_list()
+
+def test_corrupt_snapshot_falls_back_to_csv(tmp_path):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("user_id;timestamp;Emotion_1_label\n1;1706640000;happy\n")
+    RecordDataCSV(file_path=str(csv_file))
+    os.remove(snapshot_path(str(csv_file)) + "/column_0.npy")
+    assert RecordDataCSV(file_path=str(csv_file)).data.to_list() == [{"user_id": 1, "timestamp": 1706640000, "Emotion_1_label": "happy"}]
+
+def test_append_records_visible_without_reload(tmp_path):
+    """Los registros añadidos aparecen en las consultas, ordenados, y sobreviven a un reinicio gracias al WAL."""
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("user_id;timestamp;file_name;Emotion_1_label\n"
+                        "1;1706640000;a.wav;happy\n1;1706726400;b.wav;sad\n")
+    records = RecordDataCSV(file_path=str(csv_file))
+    new = [{"user_id": 1, "timestamp": 1706700000, "file_name": "c.wav", "Emotion_1_label": "fear"},
+           {"user_id": 3, "timestamp": 1706700000, "file_name": "d.wav", "Emotion_1_label": "happy"}]
+    assert records.append_records(new) == 2
+    # Repetidos: ya están en el delta o en el CSV
+    assert records.append_records(new + [{"user_id": 1, "timestamp": 1706640000, "file_name": "a.wav"}]) == 0
+
+    filtered = records.filter_records_by_user_date(1, datetime.fromtimestamp(1706600000), datetime.fromtimestamp(1706800000))
+    assert [record['file_name'] for record in filtered] == ["a.wav", "c.wav", "b.wav"]
+    assert records.get_user_ids() == [1, 3]
+    assert records.get_emotions() == ["fear", "happy", "sad"]
+
+    app = Flask(__name__)
+    app.config['SHIFTS'] = {"todos": ["00:00", "23:59"]}
+    with app.app_context():
+        everything = records.filter_by_date_and_shift(datetime.fromtimestamp(1706600000), datetime.fromtimestamp(1706800000), "todos")
+    assert [record['timestamp'] for record in everything] == sorted(record['timestamp'] for record in everything)
+    assert {record['file_name'] for record in everything} == {"a.wav", "b.wav", "c.wav", "d.wav"}
+
+    # Sin consolidar, un reinicio los recupera del WAL
+    restarted = RecordDataCSV(file_path=str(csv_file))
+    assert [record['file_name'] for record in restarted.filter_records_by_user_date(
+        3, datetime.fromtimestamp(1706600000), datetime.fromtimestamp(1706800000))] == ["d.wav"]
+
+def test_appended_records_in_data_and_indexes(tmp_path):
+    """data, index e index_timestmap incluyen los registros añadidos sin esperar a la consolidación."""
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("user_id;timestamp;file_name;Emotion_1_label\n"
+                        "1;1706640000;a.wav;happy\n1;1706726400;b.wav;sad\n2;1706700000;c.wav;fear\n")
+    records = RecordDataCSV(file_path=str(csv_file))
+    records.append_records([{"user_id": 1, "timestamp": 1706700000, "file_name": "d.wav", "Emotion_1_label": "fear"},
+                            {"user_id": 3, "timestamp": 1706650000, "file_name": "e.wav", "Emotion_1_label": "happy"},
+                            {"user_id": 1, "timestamp": 1706600000, "file_name": "f.wav", "Emotion_1_label": "sad"}])
+
+    assert len(records.data) == 6
+    assert [record["file_name"] for record in records.data] == ["a.wav", "b.wav", "c.wav", "d.wav", "e.wav", "f.wav"]
+    assert records.data[-1]["file_name"] == "f.wav" and [r["file_name"] for r in records.data[2:4]] == ["c.wav", "d.wav"]
+
+    assert [record["file_name"] for record in records.index[1]] == ["a.wav", "b.wav", "d.wav", "f.wav"]
+    assert [record["file_name"] for record in records.index[3]] == ["e.wav"]
+    assert sorted(records.index) == [1, 2, 3] and 3 in records.index and len(records.index) == 3
+    assert [ts for ts, _ in records.index_timestmap[1]] == [1706600000, 1706640000, 1706700000, 1706726400]
+    assert records.index_timestmap[2][0][1]["file_name"] == "c.wav"
+    assert records.index.get(4, []) == []
+
+    # Sin timestamp: en index sí, en index_timestmap no (como los registros del CSV)
+    records.append_records([{"user_id": 1, "timestamp": 0, "file_name": "g.wav", "Emotion_1_label": "sad"},
+                            {"user_id": 4, "timestamp": 0, "file_name": "h.wav", "Emotion_1_label": "sad"}])
+    assert [record["file_name"] for record in records.index[1]][-1] == "g.wav"
+    assert [ts for ts, _ in records.index_timestmap[1]] == [1706600000, 1706640000, 1706700000, 1706726400]
+    assert records.index_timestmap[4] == []
+
+def test_compaction_writes_csv_and_clears_wal(tmp_path):
+    csv_file = tmp_path / "records.csv"
+    csv_file.write_text("user_id;timestamp;file_name;Emotion_1_label;valence\n1;1706640000;a.wav;happy;0.5\n   ")
+    records = RecordDataCSV(file_path=str(csv_file), compact_records=2)
+    records.append_records([{"user_id": 2, "timestamp": 1706700000, "file_name": "b.wav", "Emotion_1_label": "sad", "valence": 0.25}])
+    assert os.path.getsize(str(csv_file) + ".wal") > 0
+    records.append_records([{"user_id": 2, "timestamp": 1706710000, "file_name": "c.wav", "Emotion_1_label": None, "valence": None}])
+
+    assert records.delta == [] and os.path.getsize(str(csv_file) + ".wal") == 0
+    assert len(records.data) == 3
+    assert records.index[2][0] == {"user_id": 2, "timestamp": 1706700000, "file_name": "b.wav", "Emotion_1_label": "sad", "valence": 0.25}
+    assert records.index[2][1]["Emotion_1_label"] is None
+    reloaded = RecordDataCSV(file_path=str(csv_file))
+    assert [record['file_name'] for record in reloaded.data] == ["a.wav", "b.wav", "c.wav"]
+    assert reloaded.data[1] == records.index[2][0]
+
+def test_follower_ingests_new_output_rows(tmp_path):
+    """El seguidor solo entrega las líneas completas nuevas de los csv de salida de la inferencia."""
+    output_csv = tmp_path / "volcado-output.csv"
+    header = ("file_name,Emotion_1_label,Emotion_1_mean,Emotion_1_std,Emotion_2_label,Emotion_2_mean,Emotion_2_std,"
+              "Emotion_3_label,Emotion_3_mean,Emotion_3_std,valence,arousal,dominance,user_id,timestamp\n")
+    output_csv.write_text(header + "old.wav,sadness,0.5,0.1,happiness,0.2,0.04,fear,0.1,0.02,0.3,0.2,0.3,,audios\\old.wav\n")
+    received = []
+    follower = OutputCSVFollower([str(output_csv)], received.extend, state_path=str(tmp_path / "offsets.json"))
+
+    with open(output_csv, "a") as f:
+        f.write("1706640000_7.wav,happiness,0.6,0.1,neutral,0.2,0.04,fear,0.1,0.02,0.5,0.4,0.3,,1706640000\n"
+                "recording1.wav,sadness,0.5,0.1,happiness,0.2,0.04,fear,0.1,0.02,0.3,0.2,0.3,,audios\\recording1.wav\n"
+                "1706650000_8.wav,fear,0.7")
+    assert follower.poll() == 1
+    assert received[0]["user_id"] == 7 and received[0]["timestamp"] == 1706640000
+    assert received[0]["Emotion_1_label"] == "happiness" and received[0]["Emotion_1_mean"] == pytest.approx(0.6)
+    assert follower.skipped == 1
+
+    with open(output_csv, "a") as f:
+        f.write(",0.1,neutral,0.2,0.04,fear,0.1,0.02,0.5,0.4,0.3,8,\n")
+    # Tras un reinicio se continúa desde la posición guardada
+    follower = OutputCSVFollower([str(output_csv)], received.extend, state_path=str(tmp_path / "offsets.json"))
+    assert follower.poll() == 1
+    assert received[1]["user_id"] == 8 and received[1]["timestamp"] == 1706650000
+    assert follower.poll() == 0
+
+def test_follower_finds_output_csvs_created_later(tmp_path):
+    """Siguiendo una carpeta, los csv que aparecen después de arrancar (o la propia carpeta) se leen enteros."""
+    folder = tmp_path / "output-predict-emotions"
+    header = "file_name,Emotion_1_label,Emotion_1_mean,Emotion_1_std,user_id,timestamp\n"
+    received = []
+    follower = OutputCSVFollower(str(folder), received.extend, state_path=str(tmp_path / "offsets.json"))
+    assert follower.poll() == 0
+
+    folder.mkdir()
+    (folder / "volcado-output.csv").write_text(header + "1706640000_7.wav,happiness,0.6,0.1,,\n")
+    (folder / "notas.csv").write_text(header + "1706640001_7.wav,happiness,0.6,0.1,,\n")
+    assert follower.poll() == 1
+    assert received[0]["user_id"] == 7 and received[0]["timestamp"] == 1706640000
+
+    (folder / "ours-output.csv").write_text(header + "1706650000_8.wav,fear,0.7,0.1,,\n")
+    with open(folder / "volcado-output.csv", "a") as f:
+        f.write("1706640100_7.wav,sadness,0.5,0.1,,\n")
+    assert follower.poll() == 2
+    assert sorted(record["timestamp"] for record in received[1:]) == [1706640100, 1706650000]
+
+    # Tras un reinicio, los ficheros ya conocidos continúan desde su posición guardada
+    follower = OutputCSVFollower(str(folder), received.extend, state_path=str(tmp_path / "offsets.json"))
+    assert follower.poll() == 0
+
 @pytest.fixture(scope="function", autouse=True)
 def cleanup(sample_csv):
     """Elimina el archivo temporal después de ejecutar las pruebas."""
     yield
     os.remove(sample_csv)
+    shutil.rmtree(snapshot_path(sample_csv), ignore_errors=True)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+from transcription_persistance import TranscriptionCacheSQLite
+
+
+@pytest.fixture
+def cache():
+    """Crea una caché de transcripciones en una carpeta temporal."""
+    folder = tempfile.mkdtemp()
+    return TranscriptionCacheSQLite(db_path=os.path.join(folder, 'transcriptions.db'), max_entries=10)
+
+def test_get_after_put(cache):
+    """La transcripción se recupera con el mismo audio, modelo e idioma."""
+    assert cache.get('abc', 'base', 'es') is None
+    cache.put('abc', 'base', 'es', 'Hola, ¿qué tal?', 'hola que tal')
+
+    assert cache.get('abc', 'base', 'es') == ('Hola, ¿qué tal?', 'hola que tal')
+    # Otro modelo u otro idioma no comparten la entrada
+    assert cache.get('abc', 'small', 'es') is None
+    assert cache.get('abc', 'base', 'en') is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 3
+    assert stats['hit_rate'] == 0.25
+
+def test_entries_survive_restart(cache):
+    cache.put('abc', 'base', 'es', 'Hola', 'hola')
+
+    reopened = TranscriptionCacheSQLite(db_path=cache.db_path)
+    assert reopened.get('abc', 'base', 'es') == ('Hola', 'hola')
+
+def test_least_recently_used_evicted(cache):
+    for i in range(10):
+        cache.put(f'audio{i}', 'base', 'es', 'texto', 'texto')
+    cache.get('audio0', 'base', 'es')  # audio0 pasa a ser el más reciente
+    cache.put('audio10', 'base', 'es', 'texto', 'texto')
+
+    assert cache.stats()['entries'] == 9
+    assert cache.get('audio0', 'base', 'es') is not None
+    assert cache.get('audio1', 'base', 'es') is None
@@ -0,0 +1,112 @@
+"""
+transcription_persistance.py
+
+Caché persistente de transcripciones en una base de datos SQLite local.
+Cada entrada se identifica por el hash del contenido del audio, el modelo de ASR y el idioma,
+y guarda la transcripción junto a su texto normalizado. Cuando se supera el número máximo de
+entradas se eliminan las usadas hace más tiempo.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TranscriptionCacheSQLite:
+    def __init__(self, db_path='resources/transcriptions.db', max_entries=10000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _create_table(self):
+        folder = os.path.dirname(self.db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS transcriptions (
+                        audio_hash TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        language TEXT NOT NULL,
+                        transcript TEXT NOT NULL,
+                        normalized TEXT NOT NULL,
+                        accessed_at REAL NOT NULL,
+                        PRIMARY KEY (audio_hash, model, language)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS transcriptions_accessed ON transcriptions (accessed_at)")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _connect(self):
+        # La tabla se crea en el primer uso, no al importar el módulo
+        with self._lock:
+            if not self._ready:
+                self._create_table()
+                self._ready = True
+
+        # Una conexión por operación: la caché se usa desde varios hilos
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Devuelve (transcripción, texto normalizado) o None si el audio no se ha transcrito con ese modelo
+    def get(self, audio_hash, model, language):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT transcript, normalized FROM transcriptions WHERE audio_hash = ? AND model = ? AND language = ?",
+                (audio_hash, model, language)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE transcriptions SET accessed_at = ? WHERE audio_hash = ? AND model = ? AND language = ?",
+                    (time.time(), audio_hash, model, language))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return tuple(row) if row is not None else None
+
+    def put(self, audio_hash, model, language, transcript, normalized):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcriptions VALUES (?, ?, ?, ?, ?, ?)",
+                (audio_hash, model, language, transcript, normalized, time.time()))
+
+            count = conn.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+            if count > self.max_entries:
+                # Se eliminan las entradas usadas hace más tiempo hasta quedar en el 90% del máximo
+                conn.execute(
+                    "DELETE FROM transcriptions WHERE rowid IN "
+                    "(SELECT rowid FROM transcriptions ORDER BY accessed_at LIMIT ?)",
+                    (count - int(self.max_entries * 0.9),))
+
+    def stats(self):
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0,
+                "entries": entries,
+                "max_entries": self.max_entries,
+            }
+
+
+# Caché compartida por todo el proceso
+transcription_cache = TranscriptionCacheSQLite()
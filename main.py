@@ -7,6 +7,7 @@ import pandas as pd
 from datetime import datetime
 from flask import Flask, request, render_template, jsonify, send_from_directory, Blueprint
 from app.config.config import Config
+from app.config.startup import model_warmup, startup_report
 import atexit
 import os
  
@@ -26,13 +27,20 @@ CORS(app)
 bcrypt = Bcrypt(app)
 jwt = JWTManager(app)
 
-# Importar módulos
-from app.auth.auth_controller import auth_bp
-from app.module_analysis.analysis_controller import analysis_bp
-from app.module_workers.worker_controller import workers_bp
-from app.module_inference.audio_controller import audio_bp
-from app.module_graphic.graphic_controller import graphic_bp
-from app.config.config_controller import config_bp
+# Importar módulos (se mide lo que cuesta cada uno para el informe de arranque).
+# Los modelos de inferencia no se cargan aquí: se cargan en su primer uso o en la precarga.
+with startup_report.timed("app.auth.auth_controller"):
+    from app.auth.auth_controller import auth_bp
+with startup_report.timed("app.module_analysis.analysis_controller"):
+    from app.module_analysis.analysis_controller import analysis_bp
+with startup_report.timed("app.module_workers.worker_controller"):
+    from app.module_workers.worker_controller import workers_bp
+with startup_report.timed("app.module_inference.audio_controller"):
+    from app.module_inference.audio_controller import audio_bp
+with startup_report.timed("app.module_graphic.graphic_controller"):
+    from app.module_graphic.graphic_controller import graphic_bp
+with startup_report.timed("app.config.config_controller"):
+    from app.config.config_controller import config_bp
 
 # Registrar Blueprints 
 app.register_blueprint(auth_bp)
@@ -44,7 +52,12 @@ app.register_blueprint(config_bp)
 
 from app.module_graphic.graphic_controller import load_default_data
 # Cargar datos por defecto una vez al iniciar la app
-load_default_data()
+with startup_report.timed("load_default_data"):
+    load_default_data()
+
+# Precarga opcional de modelos en segundo plano (sección WARMUP de la configuración)
+model_warmup.start(app.config.get("WARMUP", {}))
+startup_report.report()
 
 @atexit.register
 def cleanup_config():